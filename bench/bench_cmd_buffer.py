@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Long run check of the Leg command table
+# Runs the two_d_leg_class.main loop (set_motor_kn_cmds, set_motor_hp_cmds,
+# send_motor_cmds) against the simulated pi3hat transport, as fast as
+# possible, and reports the resident memory of the process and the size of
+# the batch sent through transport.cycle along the run. Both should stay flat.
+# Exits 1 when a batch ever held another number of commands than there are
+# servos, or when the resident memory grew by more than MAX_GROWTH_KB from
+# the first to the last sample.
+#
+# USAGE: python3 bench/bench_cmd_buffer.py [ticks, default 1000000]
+#
+
+import asyncio
+import math
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from monopod.moteus_ctrlr.two_d_leg_class import Leg, MAX_POS_KN, MIN_POS_KN, MAX_POS_HP, MIN_POS_HP
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+
+SERVOS = 2
+MAX_GROWTH_KB = 1024 # allocator noise, a leak of one object per tick is far more
+
+
+# current resident set size [kB], peak rss where /proc is not available
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# records the size of every batch sent
+class CountingTransport(SimPi3HatRouter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.min_batch = math.inf
+        self.max_batch = 0
+
+    async def cycle(self, commands, **kwargs):
+        n = len(commands)
+        if n < self.min_batch:
+            self.min_batch = n
+        if n > self.max_batch:
+            self.max_batch = n
+        return await super().cycle(commands, **kwargs)
+
+
+async def run(ticks, report_every):
+    transport = CountingTransport(servo_bus_map = {1:[1], 2:[2]},
+                                  fixed_dt=0.0005, sim_dt=0.0005)
+    monopod = Leg(1, 2, transport)
+    kn_half = (MAX_POS_KN - MIN_POS_KN) / 2
+    hp_half = (MAX_POS_HP - MIN_POS_HP) / 2
+
+    await monopod.stop_all_motors()
+
+    base = None
+    t0 = time.perf_counter()
+    print(f"{'tick':>10}{'mem [kB]':>12}{'growth [kB]':>14}{'batch':>8}{'ticks/s':>10}")
+    for tick in range(1, ticks + 1):
+        now = tick * 0.0005
+        await monopod.set_motor_kn_cmds(math.nan, 0.5, 2.0, MIN_POS_KN + kn_half + math.sin(now) * kn_half, -0.01, math.nan, True)
+        await monopod.set_motor_hp_cmds(math.nan, 0.5, 2.0, MIN_POS_HP + hp_half + math.sin(now + 1) * hp_half, -0.01, math.nan, True)
+        await monopod.send_motor_cmds()
+
+        if tick % report_every == 0:
+            mem = rss_kb()
+            if base is None:
+                base = mem
+            rate = tick / (time.perf_counter() - t0)
+            print(f"{tick:>10}{mem:>12.1f}{mem - base:>14.1f}{len(monopod.commands):>8}{rate:>10.0f}")
+
+    growth = mem - base
+    ok_batch = transport.min_batch == transport.max_batch == SERVOS
+    ok_mem = growth <= MAX_GROWTH_KB
+    print(f"batch size sent: min {transport.min_batch} max {transport.max_batch}"
+          f"{'' if ok_batch else f'  FAIL, expected {SERVOS}'}")
+    print(f"memory growth: {growth:.1f} kB"
+          f"{'' if ok_mem else f'  FAIL, more than {MAX_GROWTH_KB} kB'}")
+    return ok_batch and ok_mem
+
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    ok = asyncio.run(run(ticks, max(1, ticks // 10)))
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Benchmark of the ik solvers of sinIkHopCtrlr
+# Compares calls per second (and worst case call time) of the iterative
+# P-loop against the direct closed-form solver and the precomputed lookup
+# table (falling back to the direct solver off-table) over the crouch/extend
+# foot points used in jumping.py and a sinusoidal foot sweep
+#
+# USAGE: python3 bench/bench_ik.py [seconds per case]
+#
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.ctrlrs.ik.ik_lut import IkLookupTable
+from monopod.ctrlrs.traj.traj_compiler import CROUCH, EXTEND
+
+
+# foot set points, crouch & extend from jumping.py + a vertical sine sweep
+def make_targets(n=200):
+    crouch_extend = [CROUCH, EXTEND] * (n // 2)
+    sweep = [(0.0, 0.05 * np.sin(2 * np.pi * k / n) - 0.18) for k in range(n)]
+    return crouch_extend, sweep
+
+
+def bench(ik_mode, targets, duration):
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, ik_mode)
+    if ik_mode == 'lut':
+        ctrlr.use_lut(IkLookupTable(ctrlr))
+    theta0 = theta1 = 0.0
+    calls = 0
+    worst = 0.0
+    n = len(targets)
+    t_end = time.perf_counter() + duration
+    while time.perf_counter() < t_end:
+        ctrlr.q[0], ctrlr.q[1] = targets[calls % n]
+        t0 = time.perf_counter()
+        theta0, theta1 = ctrlr.two_link_leg_ik(
+            des_eps=0.1, theta0=theta0, theta1=theta1)
+        dt = time.perf_counter() - t0
+        if dt > worst:
+            worst = dt
+        calls += 1
+    return calls / duration, worst
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    crouch_extend, sweep = make_targets()
+
+    print(f"{'case':<16}{'mode':<8}{'calls/s':>12}{'worst [us]':>14}")
+    for name, targets in [("crouch/extend", crouch_extend), ("sine sweep", sweep)]:
+        rates = {}
+        for ik_mode in ['iter', 'direct', 'lut']:
+            rate, worst = bench(ik_mode, targets, duration)
+            rates[ik_mode] = rate
+            print(f"{name:<16}{ik_mode:<8}{rate:>12.0f}{worst * 1e6:>14.1f}")
+        for ik_mode in ['direct', 'lut']:
+            print(f"{'':<16}{'speedup':<8}{rates[ik_mode] / rates['iter']:>12.1f}x  ({ik_mode})")
+
+
+if __name__ == "__main__":
+    main()
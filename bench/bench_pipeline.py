@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Serial vs pipelined control loop, throughput and latency
+# Runs the jumping.py loop (goal -> ik -> encoder conversion -> position
+# commands -> transport.cycle) against the simulated pi3hat transport, once
+# serial and once pipelined, i.e. computing the next cycle while the transfer
+# is in flight (moteus_ctrlr/loop_rate.py). The bus time of a cycle is waited
+# for in a thread, like the pi3hat transfer, so the event loop is free
+# meanwhile (the sim's own latency is an asyncio.sleep, which the epoll
+# timeout rounds up to 1 ms).
+#   free run     the loop w/o a deadline: the highest loop rate it sustains
+#   fixed rate   the loop at --rate: the latency from sampling the inputs of
+#                the commands to the end of the transfer that carries them
+#
+# USAGE: python3 bench/bench_pipeline.py [--latency 0.0002 0.0005 0.001]
+#                                        [--ik iter|direct] [--rate 500] [--seconds 2]
+#
+
+import argparse
+import asyncio
+import concurrent.futures
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+import moteus
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.moteus_ctrlr.cmd_template import PositionTemplate
+from monopod.moteus_ctrlr.loop_rate import FixedRateLoop
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+
+
+def sleep_until(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining > 0.0:
+        time.sleep(remaining)
+
+
+# the transfer of a cycle ends bus_time after it was submitted, waited for in
+# a worker thread. The worker sleeps until that deadline rather than for
+# bus_time, since it only gets the GIL once the loop waits (the pi3hat's C++
+# transfer thread does not need it at all)
+class BusTimeTransport(SimPi3HatRouter):
+    def __init__(self, *args, bus_time=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bus_time = bus_time
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    async def cycle(self, commands, **kwargs):
+        deadline = time.monotonic() + self.bus_time
+        results = await super().cycle(commands, **kwargs)
+        await asyncio.get_running_loop().run_in_executor(self.executor, sleep_until, deadline)
+        return results
+
+
+async def loop(transport, rate, pipelined, ik_mode, seconds):
+    servos = {servo_id : moteus.Controller(id=servo_id, transport=transport)
+              for servo_id in [1, 2]}
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, ik_mode)
+    kn_cmd, hp_cmd = [PositionTemplate(servos[servo_id], ('position',),
+        buffers = 2,
+        velocity = 2.0,
+        maximum_torque = 0.5,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True) for servo_id in [1, 2]]
+    theta = [0.0, 0.0]
+
+    # foot goal at time t -> ik -> commands
+    def compute(t):
+        ctrlr.q[0] = 0.0
+        ctrlr.q[1] = 0.03 * np.sin(2 * np.pi * t) - 0.18
+        theta[0], theta[1] = ctrlr.two_link_leg_ik(des_eps=0.1, theta0=theta[0], theta1=theta[1])
+        return [kn_cmd.make(ctrlr.convert_rad_enc_kn(theta[1])),
+                hp_cmd.make(ctrlr.convert_rad_enc_hp(theta[0]))]
+
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    t_end = time.monotonic() + seconds
+    t_cmds = rate.clock()
+    commands = compute(time.monotonic())
+    while time.monotonic() < t_end:
+        if pipelined:
+            inflight = await rate.start_io(transport.cycle(commands), stamp=t_cmds)
+            t_cmds = rate.clock()
+            commands = compute(time.monotonic() + rate.period)
+            await rate.io(inflight)
+        else:
+            t_cmds = rate.clock()
+            commands = compute(time.monotonic())
+            await rate.io(transport.cycle(commands), stamp=t_cmds)
+        await rate.sleep()
+
+
+def run(latency, pipelined, ik_mode, rate_hz, seconds):
+    transport = BusTimeTransport(servo_bus_map = {1:[1], 2:[2]}, bus_time=latency,
+                                 fixed_dt=0.0005)
+    rate = FixedRateLoop(rate_hz, history=1 << 16)
+    t0 = time.monotonic()
+    asyncio.run(loop(transport, rate, pipelined, ik_mode, seconds))
+    r = rate.report()
+    r['throughput'] = rate.cycle / (time.monotonic() - t0)
+    transport.executor.shutdown()
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.0002, 0.0005, 0.001],
+                        help='simulated bus time per cycle [s]')
+    parser.add_argument('--ik', default='iter', choices=['iter', 'direct'])
+    parser.add_argument('--rate', type=float, default=500.0,
+                        help='loop rate of the fixed rate runs [Hz]')
+    parser.add_argument('--seconds', type=float, default=2.0)
+    args = parser.parse_args()
+
+    ms = 1e3
+    print(f"ik {args.ik}, fixed rate runs at {args.rate:g} Hz")
+    print(f"{'bus [ms]':>9}{'mode':>11}{'free run [Hz]':>15}{'compute [ms]':>14}"
+          f"{'latency p50':>13}{'p99 [ms]':>10}{'missed':>8}")
+    for latency in args.latency:
+        for pipelined in [False, True]:
+            free = run(latency, pipelined, args.ik, 1e6, args.seconds)
+            fixed = run(latency, pipelined, args.ik, args.rate, args.seconds)
+            print(f"{latency * ms:>9.2f}{'pipelined' if pipelined else 'serial':>11}"
+                  f"{free['throughput']:>15.0f}{fixed['compute_p50'] * ms:>14.3f}"
+                  f"{fixed['latency_p50'] * ms:>13.3f}{fixed['latency_p99'] * ms:>10.3f}"
+                  f"{fixed['missed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
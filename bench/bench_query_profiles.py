@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# Bus time of the leg's query profiles
+# For every query profile (moteus_ctrlr/query_profiles.py) sends the Leg's
+# position commands through the simulated pi3hat transport and reports the
+# size of the command and the reply frames, the CAN-FD bus time they take
+# per cycle and the loop rate the bus alone would allow, plus the time of
+# the sim tick itself (Python side).
+#
+# The bus time is an estimate of the frames on the wire, as on the pi3hat
+# w/ its default 1 Mbit/s arbitration and 5 Mbit/s data rate:
+#   arbitration phase  ~54 bit (29 bit id, control, ack, eof, ifs) at 1 Mbit/s
+#   data phase         ~30 bit (dlc, crc, stuffing) + data padded to the next
+#                      CAN-FD length (8, 12, 16, 20, 24, 32, 48, 64 bytes) at 5 Mbit/s
+# the knee & hip are on separate buses, which run in parallel, so a cycle
+# takes the bus time of a single servo.
+#
+# USAGE: python3 bench/bench_query_profiles.py [--cycles 20000] [--diag-every 10]
+#
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from monopod.moteus_ctrlr.two_d_leg_class import Leg, MAX_POS_KN, MIN_POS_KN, MAX_POS_HP, MIN_POS_HP
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+from monopod.moteus_ctrlr.query_profiles import QUERY_PROFILES
+
+NOMINAL_BPS = 1e6
+DATA_BPS = 5e6
+FD_SIZES = [0, 1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 32, 48, 64]
+
+
+def frame_time(n_bytes):
+    padded = next(size for size in FD_SIZES if size >= n_bytes)
+    return 54 / NOMINAL_BPS + (30 + 8 * padded) / DATA_BPS
+
+
+# records the frames of every cycle
+class MeasuringTransport(SimPi3HatRouter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.bus_time = 0.0
+        self.cmd_bytes = 0
+        self.reply_bytes = 0
+
+    async def cycle(self, commands, **kwargs):
+        results = await super().cycle(commands, **kwargs)
+        # per bus: command frame + reply frame of its (single) servo
+        busy = {}
+        for command in commands:
+            bus = self.bus_of[command.destination]
+            busy[bus] = busy.get(bus, 0.0) + frame_time(len(command.data))
+            self.cmd_bytes += len(command.data)
+        for result in results:
+            n = len(result.data) if hasattr(result, 'data') else 0
+            bus = self.bus_of[result.id]
+            busy[bus] = busy.get(bus, 0.0) + frame_time(n)
+            self.reply_bytes += n
+        self.bus_time += max(busy.values(), default=0.0)
+        return results
+
+
+async def run(query, diag_every, cycles):
+    transport = MeasuringTransport(servo_bus_map = {1:[1], 2:[2]},
+                                   fixed_dt=0.0005, sim_dt=0.0005)
+    monopod = Leg(1, 2, transport, query=query, diag_every=diag_every)
+    kn_half = (MAX_POS_KN - MIN_POS_KN) / 2
+    hp_half = (MAX_POS_HP - MIN_POS_HP) / 2
+
+    await monopod.stop_all_motors()
+    transport.bus_time = 0.0
+    transport.cmd_bytes = transport.reply_bytes = 0
+
+    replies = 0
+    t0 = time.perf_counter()
+    for tick in range(cycles):
+        now = tick * 0.0005
+        await monopod.set_motor_kn_cmds(math.nan, 0.5, 2.0, MIN_POS_KN + kn_half + math.sin(now) * kn_half, -0.01, math.nan, True)
+        await monopod.set_motor_hp_cmds(math.nan, 0.5, 2.0, MIN_POS_HP + hp_half + math.sin(now + 1) * hp_half, -0.01, math.nan, True)
+        replies += len(await monopod.send_motor_cmds())
+    tick_time = (time.perf_counter() - t0) / cycles
+
+    return {
+        'cmd': transport.cmd_bytes / (2 * cycles),
+        'reply': transport.reply_bytes / max(replies, 1),
+        'bus': transport.bus_time / cycles,
+        'tick': tick_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cycles', type=int, default=20000)
+    parser.add_argument('--diag-every', type=int, default=10)
+    args = parser.parse_args()
+
+    cases = [(query, 0) for query in QUERY_PROFILES]
+    cases.append(('control', args.diag_every))
+
+    print(f"{'profile':<22}{'cmd [B]':>9}{'reply [B]':>11}{'bus [us]':>10}"
+          f"{'bus max rate [Hz]':>19}{'sim tick [us]':>15}")
+    for query, diag_every in cases:
+        r = asyncio.run(run(query, diag_every, args.cycles))
+        name = query + (f" + diag/{diag_every}" if diag_every else "")
+        print(f"{name:<22}{r['cmd']:>9.1f}{r['reply']:>11.1f}{r['bus'] * 1e6:>10.1f}"
+              f"{1.0 / r['bus']:>19.0f}{r['tick'] * 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+# Raibert controller vs a point mass spring leg
+# Hops ctrlrs/SLIP/raibert_ctrlr.py on the simplest model it is written for:
+# a point mass on a massless spring leg (stiffness, damping, rest length set
+# by the controller every tick), ballistic in flight, the foot pinned to the
+# ground in stance. The phases come from the model (touchdown, compression
+# while the leg shortens, thrust, liftoff), the joint angles the controller
+# reads are the model's foot through sinIkHopCtrlr.ik_direct, the leg length
+# it commands goes back through convert_enc_rad_* & fwrd_kinematics.
+#
+# For every target apex height it reports the apex of the last hops and the
+# forward speed left of an initial push, plus the controller's time per tick.
+# Exits 1 when an apex misses its target by more than --tolerance, so it
+# doubles as a check of the controller.
+#
+# USAGE: python3 bench/bench_raibert_hop.py [--heights 0.26 0.3 0.34] [--hops 30]
+#                                           [--mass-error 0.1] [--tolerance 0.005]
+#
+
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.ctrlrs.SLIP.hop_phase import FLIGHT, TOUCHDOWN, COMPRESSION, THRUST, LIFTOFF
+from monopod.ctrlrs.SLIP.raibert_ctrlr import RaibertCtrlr, GRAVITY
+
+MASS = 0.95       # [kg]
+STIFFNESS = 1000.0 # [N/m]
+DAMPING = 3.0     # leg losses [N s/m]
+REST = 0.2        # [m]
+TICK = 0.002      # controller period [s]
+SUBSTEPS = 20     # model steps per tick
+
+
+# foot w.r.t. the hip [m] of the leg set points [rev]
+def commanded_foot(ctrlr, kn_pos, hp_pos):
+    x, y = ctrlr.fwrd_kinematics(ctrlr.convert_enc_rad_hp(hp_pos),
+                                 ctrlr.convert_enc_rad_kn(kn_pos))
+    return float(x), float(y)
+
+
+def hop(h_des, hops, mass_error, vx0):
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+    raibert = RaibertCtrlr(ctrlr, h_des=h_des, mass=MASS * (1.0 + mass_error),
+                           k=STIFFNESS, r0=REST, dt=TICK)
+    dt = TICK / SUBSTEPS
+
+    # hip position & velocity, dropped from the target height w/ a push
+    bx, bz, vx, vz = 0.0, h_des, vx0, 0.0
+    fx, fy = 0.0, -REST # foot w.r.t. the hip
+    stance = False
+    phase = FLIGHT
+    apexes = []
+    speeds = []
+    tick_time = 0.0
+    ticks = 0
+    kn_pos, hp_pos = raibert.update(phase, *ctrlr.ik_direct(fx, fy))
+
+    while raibert.hops < hops and ticks < hops * 2000:
+        rest = raibert.r_cmd
+        for _ in range(SUBSTEPS):
+            if not stance:
+                vz -= GRAVITY * dt
+                bx += vx * dt
+                bz += vz * dt
+                if bz + fy <= 0.0 and vz < 0.0:
+                    stance = True
+                    foot_x = bx + fx
+            else:
+                dx = bx - foot_x
+                r = math.hypot(dx, bz)
+                ux, uz = dx / r, bz / r
+                dr = ux * vx + uz * vz
+                force = STIFFNESS * (rest - r) - DAMPING * dr
+                if force <= 0.0 and dr > 0.0:
+                    stance = False
+                    continue
+                vx += force / MASS * ux * dt
+                vz += (force / MASS * uz - GRAVITY) * dt
+                bx += vx * dt
+                bz += vz * dt
+
+        # phase & joint angles seen by the controller
+        if stance:
+            dx = bx - foot_x
+            r = math.hypot(dx, bz)
+            dr = (dx * vx + bz * vz) / r
+            if phase in (FLIGHT, LIFTOFF):
+                phase = TOUCHDOWN
+            elif phase == TOUCHDOWN or (phase == COMPRESSION and dr < 0.0):
+                phase = COMPRESSION
+            else:
+                phase = THRUST
+            theta0, theta1 = ctrlr.ik_direct(-dx, -bz)
+        else:
+            if phase in (TOUCHDOWN, COMPRESSION, THRUST):
+                phase = LIFTOFF
+                speeds.append(vx)
+                # apex of this flight
+                apexes.append(bz + max(vz, 0.0) ** 2 / (2 * GRAVITY))
+            else:
+                phase = FLIGHT
+            theta0, theta1 = ctrlr.ik_direct(fx, fy)
+
+        t0 = time.perf_counter()
+        kn_pos, hp_pos = raibert.update(phase, theta0, theta1)
+        tick_time += time.perf_counter() - t0
+        ticks += 1
+        if not stance:
+            fx, fy = commanded_foot(ctrlr, kn_pos, hp_pos)
+
+    return apexes, speeds, tick_time / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--heights', type=float, nargs='+', default=[0.26, 0.30, 0.34],
+                        help='target apex heights of the hip [m]')
+    parser.add_argument('--hops', type=int, default=30)
+    parser.add_argument('--mass-error', type=float, default=0.1,
+                        help='relative error of the controller\'s mass estimate')
+    parser.add_argument('--push', type=float, default=0.2,
+                        help='initial forward speed [m/s]')
+    parser.add_argument('--tolerance', type=float, default=0.005,
+                        help='largest apex error of the last 5 hops [m]')
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'target [m]':>11}{'last 5 apexes [m]':>36}{'max err [mm]':>14}"
+          f"{'speed [m/s]':>13}{'tick [us]':>11}")
+    for h_des in args.heights:
+        apexes, speeds, tick = hop(h_des, args.hops, args.mass_error, args.push)
+        last = apexes[-5:]
+        err = max(abs(h - h_des) for h in last) if last else math.inf
+        ok = len(apexes) >= args.hops and err <= args.tolerance
+        failed |= not ok
+        print(f"{h_des:>11.3f}{' '.join(f'{h:.4f}' for h in last):>36}{err * 1e3:>14.2f}"
+              f"{speeds[-1] if speeds else math.nan:>13.4f}{tick * 1e6:>11.1f}"
+              f"{'' if ok else '  FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
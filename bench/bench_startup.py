@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Startup time of the control programs
+# Launches monopod.jumping (or monopod.read_pos) against the simulated pi3hat transport
+# in a fresh interpreter and measures the time from the process launch to its
+# first transport.cycle, i.e. how fast the robot is back in control after a
+# restart. The child stops right at that first cycle. Reported per run:
+#   python   interpreter start up to the first line of the child
+#   imports  importing the program and its modules
+#   setup    from there to the first transport.cycle
+#   total    launch to the first transport.cycle
+#
+# USAGE: python3 bench/bench_startup.py [--runs 10] [--target jumping|read_pos]
+#                                       [--with-matplotlib]
+#
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+# runs in the child, prints: first line, imported, first cycle (time.time())
+CHILD = r'''
+import time
+t_first_line = time.time()
+import asyncio, os, sys
+sys.path.insert(0, {src!r})
+if {with_matplotlib}:
+    import matplotlib.pyplot
+
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+
+async def first_cycle(self, commands, **kwargs):
+    print(t_first_line, t_imported, time.time(), flush=True)
+    os._exit(0)
+SimPi3HatRouter.cycle = first_cycle
+
+import monopod.{target} as program
+t_imported = time.time()
+if {target!r} == 'jumping':
+    program.setup(sim=True)
+    asyncio.run(program.main_bare())
+else:
+    asyncio.run(program.main(sim=True))
+'''
+
+
+def run_once(target, with_matplotlib):
+    code = CHILD.format(src=SRC, target=target, with_matplotlib=with_matplotlib)
+    t_launch = time.time()
+    out = subprocess.run([sys.executable, '-c', code], check=True,
+                         capture_output=True, text=True).stdout
+    t_first_line, t_imported, t_cycle = (float(x) for x in out.split())
+    return {
+        'python': t_first_line - t_launch,
+        'imports': t_imported - t_first_line,
+        'setup': t_cycle - t_imported,
+        'total': t_cycle - t_launch,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--target', default='jumping', choices=['jumping', 'read_pos'])
+    parser.add_argument('--with-matplotlib', action='store_true',
+                        help='also import matplotlib.pyplot, the cost before it was made lazy')
+    args = parser.parse_args()
+
+    run_once(args.target, args.with_matplotlib) # warm the file cache
+    runs = [run_once(args.target, args.with_matplotlib) for _ in range(args.runs)]
+
+    print(f"{args.target}: launch to first transport.cycle over {args.runs} runs [ms]")
+    print(f"{'':<10}{'median':>10}{'min':>10}{'max':>10}")
+    for name in ['python', 'imports', 'setup', 'total']:
+        values = [r[name] * 1e3 for r in runs]
+        print(f"{name:<10}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
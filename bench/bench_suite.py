@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+
+# Microbenchmark suite of the control loop building blocks
+# Times the ik solvers (two_link_leg_ik, iterative and direct), fwrd_kinematics,
+# lin_conv and the convert_* encoder mappings, moteus.Controller.make_position
+# vs the pre-encoded PositionTemplate, a compiled trajectory lookup
+# (ctrlrs/traj/traj_compiler.py), and a full loop tick (commands built and
+# sent through the simulated pi3hat transport, replies parsed) and the
+# per cycle telemetry write with fixed inputs, so runs on different commits
+# can be compared. Each case is calibrated to ~TARGET seconds per repeat and
+# timed over several repeats with the gc off, like timeit. The per call
+# median / min / max go to stdout and, with --out, to a JSON file together
+# with the commit and the versions it was measured with.
+#
+# --compare BASE.json [NEW.json] compares two result files (or BASE against
+# a fresh run) and flags the cases that got slower than --threshold, in both
+# the median and the min so one noisy repeat does not count. The exit status
+# is 1 if any case regressed.
+#
+# USAGE: python3 bench/bench_suite.py [--out results.json] [--repeats 7]
+#                                     [--filter ik] [--list]
+#        python3 bench/bench_suite.py --compare base.json [new.json]
+#                                     [--threshold 0.10]
+#
+# e.g. comparing two commits:
+#   git checkout A && python3 bench/bench_suite.py --out /tmp/a.json
+#   git checkout B && python3 bench/bench_suite.py --compare /tmp/a.json --out /tmp/b.json
+#
+
+import argparse
+import datetime
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import moteus
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.moteus_ctrlr.two_d_leg_class import Leg
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+from monopod.moteus_ctrlr.cmd_template import PositionTemplate
+from monopod.ctrlrs.traj.traj_compiler import crouch_extend, CROUCH, EXTEND, KNEE, HIP, POSITION, VELOCITY, TORQUE
+from monopod.moteus_ctrlr.telemetry import Telemetry
+
+FORMAT_VERSION = 1
+TARGET = 0.1 # [s] per repeat
+
+# crouch / extend foot points of jumping.py
+FOOT_PTS = [CROUCH, EXTEND]
+
+
+# ------------------------------ cases -------------------------------------
+# every case is a factory returning a function of no arguments, a call of
+# which is one operation; anything that should not be timed happens in the
+# factory
+
+def case_ik_iter():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'iter')
+    state = [0.0, 0.0, 0]
+    def op():
+        ctrlr.q[0], ctrlr.q[1] = FOOT_PTS[state[2] & 1]
+        state[0], state[1] = ctrlr.two_link_leg_ik(
+            des_eps=0.1, theta0=state[0], theta1=state[1])
+        state[2] += 1
+    return op
+
+
+def case_ik_direct():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+    state = [0.0, 0.0, 0]
+    def op():
+        ctrlr.q[0], ctrlr.q[1] = FOOT_PTS[state[2] & 1]
+        state[0], state[1] = ctrlr.two_link_leg_ik(
+            des_eps=0.1, theta0=state[0], theta1=state[1])
+        state[2] += 1
+    return op
+
+
+def case_fwrd_kinematics():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False)
+    def op():
+        ctrlr.fwrd_kinematics(0.3, 1.2)
+    return op
+
+
+def case_lin_conv():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False)
+    def op():
+        ctrlr.lin_conv(0.3, -np.pi, np.pi, -0.48, 0.4)
+    return op
+
+
+def case_convert_rad_enc():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False)
+    def op():
+        ctrlr.convert_rad_enc_kn(0.7)
+        ctrlr.convert_rad_enc_hp(-0.4)
+    return op
+
+
+def case_convert_enc_rad():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False)
+    def op():
+        ctrlr.convert_enc_rad_kn(0.1)
+        ctrlr.convert_enc_rad_hp(-0.2)
+    return op
+
+
+def case_make_position():
+    servo = moteus.Controller(id=1)
+    def op():
+        servo.make_position(
+            position = 0.1,
+            velocity = 0.0,
+            maximum_torque = 1.0,
+            stop_position = math.nan,
+            feedforward_torque = -0.01,
+            watchdog_timeout = math.nan,
+            query = True)
+    return op
+
+
+def case_position_template():
+    tmpl = PositionTemplate(moteus.Controller(id=1), ('position',),
+        velocity = 0.0,
+        maximum_torque = 1.0,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+    def op():
+        tmpl.make(0.1)
+    return op
+
+
+def case_traj_lookup():
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+    traj = crouch_extend(ctrlr, 0.002, period=2.0, profile='spline')
+    t = [0.0]
+    def op():
+        t[0] += 0.002
+        sp = traj.at(t[0])
+        kn = sp[KNEE]
+        hp = sp[HIP]
+        return (kn[POSITION], kn[VELOCITY], kn[TORQUE],
+                hp[POSITION], hp[VELOCITY], hp[TORQUE])
+    return op
+
+
+# drives a coroutine to completion without an event loop, the sim transport
+# never suspends with latency=0 so one send() is enough
+def run_sync(coro):
+    try:
+        coro.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("coroutine suspended, not supported by the benchmark")
+
+
+# jumping.py main loop body: two position commands (PositionTemplate) +
+# transport.cycle + replies,
+# the sim advances a single integration step per tick so the joint models
+# cost little next to the command and reply handling
+def case_tick_jumping():
+    transport = SimPi3HatRouter(servo_bus_map = {1:[1], 2:[2]}, fixed_dt=0.0005)
+    servos = {servo_id : moteus.Controller(id=servo_id, transport=transport)
+              for servo_id in [1, 2]}
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+    theta_pts = ctrlr.ik_batch(np.array(FOOT_PTS))
+    hp_pts = ctrlr.convert_rad_enc_hp(theta_pts[:, 0])
+    kn_pts = ctrlr.convert_rad_enc_kn(theta_pts[:, 1])
+    kn_cmd, hp_cmd = [PositionTemplate(servos[servo_id], ('position',),
+        velocity = 0.0,
+        maximum_torque = 1.0,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True) for servo_id in [1, 2]]
+    state = [0]
+    def op():
+        pt = state[0] & 1
+        commands = [
+            kn_cmd.make(kn_pts[pt]), # KNEE
+            hp_cmd.make(hp_pts[pt]), # HIP
+        ]
+        run_sync(transport.cycle(commands))
+        state[0] += 1
+    return op
+
+
+# two_d_leg_class.Leg: set_motor_kn_cmds + set_motor_hp_cmds + send_motor_cmds
+def case_tick_leg():
+    transport = SimPi3HatRouter(servo_bus_map = {1:[1], 2:[2]}, fixed_dt=0.0005)
+    monopod = Leg(1, 2, transport)
+    state = [0]
+    async def tick(kn_pos, hp_pos):
+        await monopod.set_motor_kn_cmds(math.nan, 0.5, 2.0, kn_pos, -0.01, math.nan, True)
+        await monopod.set_motor_hp_cmds(math.nan, 0.5, 2.0, hp_pos, -0.01, math.nan, True)
+        await monopod.send_motor_cmds()
+    def op():
+        s = 0.1 if state[0] & 1 else -0.1
+        run_sync(tick(s, -s))
+        state[0] += 1
+    return op
+
+
+# Telemetry.log_cycle of a jumping.py cycle (2 servos, full replies), the
+# records go to /dev/null, the ring is flushed often enough to never drop
+def case_telemetry_log():
+    transport = SimPi3HatRouter(servo_bus_map = {1:[1], 2:[2]}, fixed_dt=0.0005)
+    servos = {servo_id : moteus.Controller(id=servo_id, transport=transport)
+              for servo_id in [1, 2]}
+    results = run_sync(transport.cycle(
+        [servos[servo_id].make_position(position=math.nan, query=True) for servo_id in [1, 2]]))
+    tlm = Telemetry(os.devnull, [1, 2], capacity=1 << 20, flush_interval=0.01)
+    cmds = [(-0.5, 0.0, -0.01), (-0.1, 0.0, -0.01)]
+    def op():
+        tlm.log_cycle(1.0, cmds, results)
+    return op
+
+
+CASES = {
+    'ik_iter': case_ik_iter,
+    'ik_direct': case_ik_direct,
+    'fwrd_kinematics': case_fwrd_kinematics,
+    'lin_conv': case_lin_conv,
+    'convert_rad_enc': case_convert_rad_enc,
+    'convert_enc_rad': case_convert_enc_rad,
+    'make_position': case_make_position,
+    'position_template': case_position_template,
+    'traj_lookup': case_traj_lookup,
+    'tick_jumping': case_tick_jumping,
+    'tick_leg': case_tick_leg,
+    'telemetry_log': case_telemetry_log,
+}
+
+
+# ------------------------------ timing ------------------------------------
+
+def time_calls(op, number):
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            op()
+        return time.perf_counter() - t0
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+# smallest power of 10 (x1, x2, x5) of calls that takes at least target seconds
+def calibrate(op, target):
+    number = 1
+    while True:
+        for k in (1, 2, 5):
+            if time_calls(op, number * k) >= target:
+                return number * k
+        number *= 10
+
+
+def run_case(name, repeats, target):
+    op = CASES[name]()
+    op() # warm up
+    number = calibrate(op, target)
+    per_call = [time_calls(op, number) / number * 1e9 for _ in range(repeats)]
+    return {
+        'number': number,
+        'repeats': per_call,
+        'median_ns': statistics.median(per_call),
+        'min_ns': min(per_call),
+        'max_ns': max(per_call),
+    }
+
+
+def git_describe():
+    def git(*args):
+        try:
+            return subprocess.run(['git', '-C', ROOT] + list(args), check=True,
+                                  capture_output=True, text=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'subject': git('log', '-1', '--format=%s'),
+        'dirty': None if status is None else bool(status),
+    }
+
+
+def run_suite(names, repeats, target):
+    results = {}
+    print(f"{'case':<18}{'median [us]':>13}{'min [us]':>11}{'max [us]':>11}{'calls':>10}")
+    for name in names:
+        r = run_case(name, repeats, target)
+        results[name] = r
+        print(f"{name:<18}{r['median_ns'] / 1e3:>13.2f}{r['min_ns'] / 1e3:>11.2f}"
+              f"{r['max_ns'] / 1e3:>11.2f}{r['number']:>10}")
+    return {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'git': git_describe(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'moteus': getattr(moteus, '__version__', None) or getattr(moteus, 'VERSION', None),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'repeats': repeats,
+        'target': target,
+        'results': results,
+    }
+
+
+# ------------------------------ compare -----------------------------------
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported format version {data.get('format_version')}")
+    return data
+
+
+def label(data):
+    git = data.get('git') or {}
+    commit = (git.get('commit') or 'unknown')[:10]
+    return commit + (' (dirty)' if git.get('dirty') else '')
+
+
+# returns the names of the cases that got slower than threshold in both the
+# median and the min
+def compare(base, new, threshold):
+    print(f"base {label(base)}  vs  new {label(new)}, threshold {threshold:.0%}")
+    if base.get('machine') != new.get('machine') or base.get('python') != new.get('python'):
+        print(f"NOTE: measured on different setups: {base.get('machine')}/{base.get('python')}"
+              f" vs {new.get('machine')}/{new.get('python')}")
+    print(f"{'case':<18}{'base [us]':>11}{'new [us]':>11}{'change':>9}  ")
+    regressions = []
+    for name in sorted(set(base['results']) | set(new['results'])):
+        b = base['results'].get(name)
+        n = new['results'].get(name)
+        if b is None or n is None:
+            print(f"{name:<18}{'only in ' + ('new' if b is None else 'base'):>31}")
+            continue
+        change = n['median_ns'] / b['median_ns'] - 1.0
+        change_min = n['min_ns'] / b['min_ns'] - 1.0
+        flag = ''
+        if change > threshold and change_min > threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif change < -threshold and change_min < -threshold:
+            flag = 'faster'
+        print(f"{name:<18}{b['median_ns'] / 1e3:>11.2f}{n['median_ns'] / 1e3:>11.2f}"
+              f"{change:>+9.1%}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--target', type=float, default=TARGET,
+                        help='seconds per repeat of a case')
+    parser.add_argument('--filter', action='append', default=[],
+                        help='only run the cases containing this (repeatable)')
+    parser.add_argument('--list', action='store_true', help='list the cases')
+    parser.add_argument('--compare', nargs='+', metavar='JSON',
+                        help='BASE [NEW], NEW defaults to a fresh run')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='slow down flagged as a regression (default 0.10 = 10%%)')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(CASES))
+        return 0
+
+    names = [name for name in CASES
+             if not args.filter or any(f in name for f in args.filter)]
+
+    if args.compare:
+        if len(args.compare) > 2:
+            parser.error('--compare takes BASE [NEW]')
+        base = load(args.compare[0])
+        if len(args.compare) == 2:
+            new = load(args.compare[1])
+        else:
+            names = [name for name in names if name in base['results']]
+            new = run_suite(names, args.repeats, args.target)
+            print()
+    else:
+        new = run_suite(names, args.repeats, args.target)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(new, f, indent=2)
+            f.write('\n')
+
+    if args.compare:
+        if args.filter:
+            for data in (base, new):
+                data['results'] = {name : r for name, r in data['results'].items()
+                                   if any(f in name for f in args.filter)}
+        regressions = compare(base, new, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
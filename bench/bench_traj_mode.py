@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+# Sparse waypoints + the moteus trajectory limiter vs dense set point streaming
+# Plays a compiled crouch/extend trajectory (ctrlrs/traj/traj_compiler.py)
+# through Leg.set_trajectory / step_trajectory on the simulated pi3hat
+# transport, once w/ tolerance 0 (every tick streamed, the old loops) and
+# once per --tolerances (moteus_ctrlr/trajectory_limiter.py plans). For
+# every run it reports the commands sent per second, the share of the ticks
+# covered by limiter segments and the largest deviation of the servos'
+# control position (what the moteus tracks) and of the joint position from
+# the table.
+#
+# The sim's servos run the same TrajectoryLimiter model the planner predicts
+# with, so the sim's control position only shows the plan plays back as
+# planned, not that the predictions hold. The check is against a separate
+# reference: every waypoint is replayed w/ the closed form time optimal
+# profile (accel limited ramp, velocity limited cruise, ramp onto the moving
+# target) of this file, which shares no code w/ trajectory_limiter.py, and
+# compared to the dense table the plan came from ("ref err").
+# Exits 1 when the reference path misses the table by more than a plan's
+# tolerance (+10%).
+#
+# NOT verified: the moteus firmware's limiter. Both the model and the
+# reference here are what the moteus docs describe (velocity_limit /
+# accel_limit on a position command), the plans are only as good as that
+# description until checked on the hardware w/ telemetry (--log).
+#
+# USAGE: python3 bench/bench_traj_mode.py [--profile sine] [--period 2.0]
+#                                         [--rate 500] [--tolerances 0.002 0.005 0.02]
+#
+
+import argparse
+import asyncio
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'src'))
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.ctrlrs.traj.traj_compiler import crouch_extend, PROFILES, KNEE, HIP, POSITION, VELOCITY
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter, SimJoint
+from monopod.moteus_ctrlr.trajectory_limiter import TrajectoryPlan, plan_trajectory
+from monopod.moteus_ctrlr.two_d_leg_class import Leg
+
+PERIODS = 3 # trajectory periods per run
+
+
+# closed form path of a position command w/ limits: the control state
+# (position x0, velocity v0) is driven onto a target that starts at p and
+# moves at v_t, w/ |velocity| <= v_lim & |acceleration| <= a_lim, in the
+# least time. Returns (position, velocity) tau [s] after the command.
+# Relative to the target the error e = x - target has to go to 0 w/ its
+# rate u = v - v_t in [-v_lim - v_t, v_lim - v_t]: ramp to a peak rate,
+# cruise if the peak is capped, ramp down to 0 on the target.
+def reference(x0, v0, p, v_t, v_lim, a_lim, tau):
+    e0 = x0 - p
+    u0 = v0 - v_t
+    # all in the direction of travel s = +-1: distance d to go, rate w0
+    stop = u0 * abs(u0) / (2.0 * a_lim)
+    s = 1.0 if -e0 - stop >= 0.0 else -1.0
+    d = -s * e0
+    w0 = s * u0
+    cap = v_lim - s * v_t
+    peak = min(math.sqrt(max(a_lim * d + 0.5 * w0 * w0, 0.0)), cap)
+    # durations & accelerations of ramp up, cruise, ramp down
+    a1 = a_lim if peak >= w0 else -a_lim
+    t1 = (peak - w0) / a1
+    d1 = (peak * peak - w0 * w0) / (2.0 * a1)
+    d3 = peak * peak / (2.0 * a_lim)
+    t2 = (d - d1 - d3) / peak if peak == cap and peak > 0.0 else 0.0
+    t3 = peak / a_lim
+
+    moved, rate, left = 0.0, w0, tau
+    for duration, acc in ((t1, a1), (t2, 0.0), (t3, -a_lim)):
+        step = min(left, duration)
+        moved += rate * step + 0.5 * acc * step * step
+        rate += acc * step
+        left -= step
+        if left <= 0.0:
+            break
+    else:
+        # on the target, it carries on at v_t
+        moved, rate = d, 0.0
+    return p + v_t * tau + e0 + s * moved, v_t + s * rate
+
+
+# largest deviation of the reference path from the table over the plan's
+# sparse segments, every waypoint starting from where the reference left the
+# servos. A periodic trajectory is run for 2 periods and the 2nd is measured,
+# it starts from what the last segment of the 1st left.
+def reference_err(traj, plan):
+    table = traj.table
+    dt = traj.dt
+    n = len(traj)
+    laps = 2 if traj.periodic else 1
+    state = [(float(table[0, servo, POSITION]), float(table[0, servo, VELOCITY]))
+             for servo in range(table.shape[1])]
+    worst = 0.0
+    for lap in range(laps):
+        for start, end, sparse, waypoint in plan.segments:
+            if not sparse:
+                # streamed: a tick after the last set point, moving at its velocity
+                row = table[(end - 1) % n]
+                state = [(float(row[servo, POSITION] + row[servo, VELOCITY] * dt),
+                          float(row[servo, VELOCITY])) for servo in range(len(row))]
+                continue
+            for servo, (position, velocity, v_lim, a_lim, _) in enumerate(waypoint):
+                x0, v0 = state[servo]
+                if lap == laps - 1:
+                    for tick in range(start + 1, end + 1):
+                        x, _ = reference(x0, v0, position, velocity, v_lim, a_lim,
+                                         (tick - start) * dt)
+                        worst = max(worst, abs(x - table[tick % n, servo, POSITION]))
+                state[servo] = reference(x0, v0, position, velocity, v_lim, a_lim,
+                                         (end - start) * dt)
+    return worst
+
+
+async def play(traj, plan):
+    now = [0.0]
+    table = traj.table
+    joints = {1: SimJoint(position=table[0, KNEE, POSITION]),
+              2: SimJoint(position=table[0, HIP, POSITION])}
+    transport = SimPi3HatRouter(servo_bus_map={1: [1], 2: [2]}, joints=joints,
+                                clock=lambda: now[0])
+    leg = Leg(1, 2, transport=transport)
+    await leg.stop_all_motors()
+    leg.set_trajectory(plan)
+
+    ctrl_err = joint_err = 0.0
+    ticks = PERIODS * len(traj)
+    for tick in range(ticks):
+        # mid tick, clear of the rounding of traj.index at the tick edges
+        now[0] = (tick + 0.5) * traj.dt
+        if await leg.step_trajectory(now[0]) is None:
+            # nothing on the bus, the sim still runs to this tick
+            await transport.cycle([])
+        if tick < len(traj):
+            continue # settling in the first period
+        sp = table[traj.index(now[0])]
+        for servo_id, servo in ((1, KNEE), (2, HIP)):
+            ctrl_err = max(ctrl_err, abs(joints[servo_id].control_position - sp[servo, POSITION]))
+            joint_err = max(joint_err, abs(joints[servo_id].position - sp[servo, POSITION]))
+    return leg.cycles / (ticks * traj.dt), ctrl_err, joint_err
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', default='sine', choices=PROFILES)
+    parser.add_argument('--period', type=float, default=2.0, help='trajectory period [s]')
+    parser.add_argument('--rate', type=float, default=500.0, help='table rate [Hz]')
+    parser.add_argument('--tolerances', type=float, nargs='+', default=[0.002, 0.005, 0.02],
+                        help='planner tolerances [rev]')
+    args = parser.parse_args()
+
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+    traj = crouch_extend(ctrlr, 1.0 / args.rate, period=args.period, profile=args.profile)
+
+    failed = False
+    print(f"{'tolerance [rev]':>16}{'segments':>10}{'sparse ticks':>14}{'cmds/s':>10}"
+          f"{'ref err [rev]':>15}{'ctrl err [rev]':>16}{'joint err [rev]':>17}")
+    for tolerance in [0.0] + args.tolerances:
+        if tolerance == 0.0:
+            plan = TrajectoryPlan(traj, [(0, len(traj), False, None)], 0.0)
+        else:
+            plan = plan_trajectory(traj, tolerance=tolerance)
+        rate, ctrl_err, joint_err = asyncio.run(play(traj, plan))
+        ref_err = reference_err(traj, plan)
+        ok = tolerance == 0.0 or ref_err <= 1.1 * tolerance
+        failed |= not ok
+        print(f"{tolerance:>16.4f}{len(plan.segments):>10}"
+              f"{plan.sparse_ticks / len(traj):>13.0%} {rate:>10.1f}{ref_err:>15.5f}"
+              f"{ctrl_err:>16.5f}{joint_err:>17.5f}{'' if ok else '  FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,3 +2,4 @@
 
 rm -f *.pyc
 rm -rf exlcm
+rm -rf monopod_lcm
@@ -0,0 +1,19 @@
+import lcm
+import sys
+import time
+
+sys.path.insert(0, '../../src')
+from monopod.comms.lcm_np import SETPOINT_T
+
+# USAGE: python3 send-setpoint.py x y   (foot position relative to the hip [m])
+
+lc = lcm.LCM()
+
+x = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0
+y = float(sys.argv[2]) if len(sys.argv) > 2 else -0.18
+
+data = SETPOINT_T.encode(utime = int(time.time() * 1000000),
+                         foot = (x, y),
+                         enabled = True)
+
+lc.publish("MONOPOD_SETPOINT", data)
@@ -14,6 +14,8 @@ import time
 import argparse
 import sys
 
+from monopod.moteus_ctrlr.cmd_template import PositionTemplate
+
 
 '''
 TODO:
@@ -70,6 +72,48 @@ async def main():
     await transport.cycle([x.make_stop() for x in servos.values()])
     print("sent stop cmd to clear any motor faults")
 
+    # 'make_position' accepts optional keyword arguments that correspond
+    # to each of the available position mode registers in the moteus
+    # reference manual. Only the stop position of the sinusoidal commands
+    # changes, so they are encoded once here and the loop patches the stop
+    # position into the frames (see monopod/moteus_ctrlr/cmd_template.py)
+    half_kn = (MAX_POS_KN - MIN_POS_KN) / 2
+    half_hp = (MAX_POS_HP - MIN_POS_HP) / 2
+    kn_sinusoidal = PositionTemplate(servos[1], ('stop_position',), # KNEE
+        position = math.nan,
+        velocity = 0.5,
+        maximum_torque = 2.0,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+    hp_sinusoidal = PositionTemplate(servos[2], ('stop_position',), # HIP
+        position = math.nan,
+        velocity = 0.5,
+        maximum_torque = 2.0,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+
+    # position commands, nothing changes so they are made once
+    commands_pos = [
+        servos[1].make_position( # KNEE
+            position = math.nan,
+            velocity = 2.0,
+            maximum_torque = 2.0,
+            stop_position = MAX_POS_KN,
+            feedforward_torque = -0.01,
+            watchdog_timeout = math.nan,
+            query = True),
+        servos[2].make_position( # HIP
+            position = math.nan,
+            velocity = 2.0,
+            maximum_torque = 2.0,
+            stop_position = MAX_POS_HP,
+            feedforward_torque = -0.01,
+            watchdog_timeout = math.nan,
+            query = True),
+    ]
+
     while True:
         # the 'cycle' method accepts a list of commands, each of which is created by
         # calling one of the 'make_foo' methods on Controller. The most command thing
@@ -80,49 +124,9 @@ async def main():
         # construct a pos command for each servo, each of which consists of a
         # sinusoidal velocity command starting from wherever the servo was at
         # to begin with
-        #
-        # 'make_position' accepts optional keyword arguments that correspond
-        # to each of the available position mode registers in the moteus
-        # reference manual
-        half_kn = (MAX_POS_KN - MIN_POS_KN) / 2
-        half_hp = (MAX_POS_HP - MIN_POS_HP) / 2
         commands_sinusoidal = [
-            servos[1].make_position( # KNEE
-                position = math.nan,
-                velocity = 0.5,
-                maximum_torque = 2.0,
-                stop_position = MIN_POS_KN + half_kn + math.sin(now) * half_kn,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
-            servos[2].make_position( # HIP
-                position = math.nan,
-                velocity = 0.5,
-                maximum_torque = 2.0,
-                stop_position = MIN_POS_HP + half_hp + math.sin(now + 1) * half_hp,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
-        ]
-
-        # position commands
-        commands_pos = [
-            servos[1].make_position( # KNEE
-                position = math.nan,
-                velocity = 2.0,
-                maximum_torque = 2.0,
-                stop_position = MAX_POS_KN,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
-            servos[2].make_position( # HIP
-                position = math.nan,
-                velocity = 2.0,
-                maximum_torque = 2.0,
-                stop_position = MAX_POS_HP,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
+            kn_sinusoidal.make(MIN_POS_KN + half_kn + math.sin(now) * half_kn), # KNEE
+            hp_sinusoidal.make(MIN_POS_HP + half_hp + math.sin(now + 1) * half_hp), # HIP
         ]
 
         # By sending all commands to the transport in one go, the pi3hat
@@ -14,11 +14,16 @@ class motor:
     def __init__(self):
         #self.args = args
 
-        # for now, let's just use the default query res of F32
+        # only the position is printed, so only ask for it (F32) and the
+        # mode & fault, the rest of the default query is left out of the replies
         qr = moteus.QueryResolution()
+        qr.velocity = moteus.multiplex.IGNORE
+        qr.torque = moteus.multiplex.IGNORE
+        qr.voltage = moteus.multiplex.IGNORE
+        qr.temperature = moteus.multiplex.IGNORE
 
         # hp_motor = hip pitch motor
-        self.m_ctrlr = moteus.Controller(id = 1)
+        self.m_ctrlr = moteus.Controller(id = 1, query_resolution = qr)
         self.pos_tolerance = 0.05
 
 
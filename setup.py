@@ -117,7 +117,7 @@ setup(
 
     # When your source code is in a subdirectory under the project root, e.g.
     # `src/`, it is necessary to specify the `package_dir` argument.
-    package_dir={'monopod': '.'},  # Optional
+    package_dir={'': 'src'},  # Optional
 
     # You can just specify package directories manually here if your project is
     # simple. Or you can use find_packages().
@@ -128,7 +128,7 @@ setup(
     #
     #   py_modules=["my_module"],
     #
-    packages=find_packages('monopod/bin') + find_packages('monopod/ctrlrs') + find_packages('monopod/moteus') + find_packages(),  # Required
+    packages=find_packages(where='src'),  # Required
 
     # Specify which Python versions you support. In contrast to the
     # 'Programming Language' classifiers above, 'pip install' will check this
@@ -144,7 +144,6 @@ setup(
     # https://packaging.python.org/en/latest/requirements.html
     install_requires=[ # 'moteus_pi3hat', # this is needed on a raspi
                       'moteus',
-                      'matplotlib',
                       'numpy'
                       ],  # Optional
 
@@ -156,10 +155,11 @@ setup(
     #
     # Similar to `install_requires` above, these must be valid existing
     # projects.
-    #extras_require={  # Optional
-    #    'dev': ['check-manifest'],
-    #    'test': ['coverage'],
-    #},
+    # NOTE: matplotlib is only needed for the leg animation (anim=True), it
+    #       is imported lazily so the control programs start without it
+    extras_require={  # Optional
+        'plot': ['matplotlib'],
+    },
 
     # If there are data files included in your packages that need to be
     # installed, specify them here.
@@ -181,11 +181,13 @@ setup(
     #
     # For example, the following would provide a command called `sample` which
     # executes the function `main` from this package when invoked:
-    #entry_points={  # Optional
-    #    'console_scripts': [
-    #        'sample=sample:main',
-    #    ],
-    #},
+    entry_points={  # Optional
+        'console_scripts': [
+            'monopod-hop=monopod.jumping:run',
+            'monopod-read-pos=monopod.read_pos:run',
+            'monopod-motor-test=monopod.moteus_ctrlr.two_d_servo_class:run',
+        ],
+    },
 
     # List additional URLs that are relevant to your project as a dict.
     #
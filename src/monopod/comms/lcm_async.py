@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+# asyncio adapter for LCM
+#
+# lc.handle() and select() with a timeout block the thread, so LCM could not
+# share a process with the asyncio loop driving transport.cycle. Here the
+# LCM socket is registered with loop.add_reader: whenever it is readable the
+# event loop calls back, every pending message is drained with
+# lc.handle_timeout(0) and the handlers run right there, between two control
+# cycles, without ever blocking the loop.
+#
+# USAGE:
+#   lc = AsyncLcm()
+#   setpoints = SetpointMailbox(lc, "MONOPOD_SETPOINT")
+#   lc.start()                         # inside the running event loop
+#   while True:
+#       sp = setpoints.take()          # newest set point or None, no waiting
+#       ...
+#       results = await transport.cycle(commands)
+#
+
+import asyncio
+
+from monopod.comms.lcm_np import SETPOINT_T
+
+
+SETPOINT_CHANNEL = "MONOPOD_SETPOINT"
+
+
+class AsyncLcm:
+    # lc: an lcm.LCM instance, created with the default provider if None
+    def __init__(self, lc=None):
+        if lc is None:
+            import lcm
+            lc = lcm.LCM()
+        self.lc = lc
+        self.loop = None
+        self.handled = 0   # messages handled since start
+        self.wakeups = 0   # reader callbacks since start
+        self._drained = []
+
+
+    # handler(channel, data) runs on the event loop thread, keep it short
+    def subscribe(self, channel, handler):
+        return self.lc.subscribe(channel, handler)
+
+
+    def unsubscribe(self, subscription):
+        self.lc.unsubscribe(subscription)
+
+
+    # callback(n) runs after each drain with the number of messages handled,
+    # e.g. to decode everything received in that wakeup as one batch
+    def on_drained(self, callback):
+        self._drained.append(callback)
+
+
+    def publish(self, channel, data):
+        self.lc.publish(channel, data)
+
+
+    # register the lcm socket with the running event loop
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop.add_reader(self.lc.fileno(), self._on_readable)
+
+
+    def stop(self):
+        if self.loop is not None:
+            self.loop.remove_reader(self.lc.fileno())
+            self.loop = None
+
+
+    # handle everything that is pending, never wait for more
+    def _on_readable(self):
+        self.wakeups += 1
+        n = 0
+        while self.lc.handle_timeout(0) > 0:
+            n += 1
+        self.handled += n
+        if n:
+            for callback in self._drained:
+                callback(n)
+
+
+# Keeps the newest set point received, the buffers of one wakeup are
+# decoded as one batch after the drain
+class SetpointMailbox:
+    def __init__(self, lcm_async, channel=SETPOINT_CHANNEL):
+        self.channel = channel
+        self.latest = None   # newest decoded setpoint_t record
+        self.received = 0
+        self.rejected = 0    # buffers that are not a setpoint_t
+        self._fresh = False
+        self._pending = []
+        self.subscription = lcm_async.subscribe(channel, self._handle)
+        lcm_async.on_drained(self._decode)
+
+
+    def _handle(self, channel, data):
+        self._pending.append(data)
+
+
+    def _decode(self, n):
+        if not self._pending:
+            return
+        pending = [data for data in self._pending if len(data) == SETPOINT_T.size]
+        self.rejected += len(self._pending) - len(pending)
+        self._pending.clear()
+        try:
+            records = SETPOINT_T.decode_batch(pending)
+        except ValueError:
+            self.rejected += len(pending)
+            return
+        if len(records):
+            self.latest = records[-1]
+            self.received += len(records)
+            self._fresh = True
+
+
+    # the newest set point if one arrived since the last take, else None
+    def take(self):
+        if not self._fresh:
+            return None
+        self._fresh = False
+        return self.latest
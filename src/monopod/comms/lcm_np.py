@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+# NumPy encode/decode of fixed size LCM messages
+#
+# The lcm-gen python classes decode one message object at a time, too slow
+# for a monitoring process that has to keep up with the 1kHz state stream.
+# An LCM message made only of primitives and fixed size arrays has a fixed
+# wire layout: the 8 byte fingerprint followed by the fields, big endian and
+# packed. That maps onto a numpy structured dtype, so a batch of received
+# buffers decodes with one np.frombuffer into one record per message.
+#
+# The monopod types below mirror lcm/types/*.lcm (package monopod_lcm),
+# their fingerprints are computed the way lcm-gen does, so the buffers are
+# interchangeable with the lcm-gen classes of the c/cpp/python side.
+#
+# USAGE:
+#   states = LEG_STATE_T.decode_batch(buffers)   # structured array, one per msg
+#   knee_pos = states['position'][:, 0]
+#   data = SETPOINT_T.encode(utime=..., foot=(0.0, -0.18), enabled=True)
+#
+
+import re
+
+import numpy as np
+
+
+# lcm primitive -> numpy dtype, the lcm wire format is big endian
+LCM_PRIMITIVES = {
+    'int8_t':  '>i1',
+    'int16_t': '>i2',
+    'int32_t': '>i4',
+    'int64_t': '>i8',
+    'float':   '>f4',
+    'double':  '>f8',
+    'byte':    'u1',
+    'boolean': 'i1',
+}
+
+FINGERPRINT = '_fingerprint'
+
+_MASK64 = (1 << 64) - 1
+
+
+# lcm-gen hash helpers, on signed 64 bit ints with char sized updates
+def _to_int64(v):
+    v &= _MASK64
+    return v - (1 << 64) if v >> 63 else v
+
+
+def _hash_update(v, c):
+    c &= 0xff
+    if c > 127:
+        c -= 256
+    return _to_int64(((v << 8) ^ (v >> 55)) + c)
+
+
+def _hash_string(v, s):
+    v = _hash_update(v, len(s))
+    for c in s.encode('ascii'):
+        v = _hash_update(v, c)
+    return v
+
+
+class LcmStruct:
+    # members: [(name, lcm primitive type, (dim, ...)), ...], fixed size dims only
+    def __init__(self, package, name, members):
+        self.package = package
+        self.name = name
+        self.members = [(m_name, m_type, tuple(dims)) for m_name, m_type, dims in members]
+
+        fields = [(FINGERPRINT, '>u8')]
+        for m_name, m_type, dims in self.members:
+            if m_type not in LCM_PRIMITIVES:
+                raise ValueError(f"{name}.{m_name}: {m_type} has no fixed size numpy layout")
+            fields.append((m_name, LCM_PRIMITIVES[m_type], dims))
+        self.dtype = np.dtype(fields)
+        self.size = self.dtype.itemsize
+        self.fingerprint = self.compute_fingerprint()
+        self._fingerprint_bytes = self.fingerprint.to_bytes(8, 'big')
+
+
+    # same hash as lcm-gen, the package name is not part of it
+    def compute_fingerprint(self):
+        v = 0x12345678
+        for m_name, m_type, dims in self.members:
+            v = _hash_string(v, m_name)
+            v = _hash_string(v, m_type)
+            v = _hash_update(v, len(dims))
+            for dim in dims:
+                v = _hash_update(v, 0) # constant size dimension
+                v = _hash_string(v, str(dim))
+        v &= _MASK64
+        # no nested types, so the recursive hash is a single rotate left
+        return ((v << 1) & _MASK64) | (v >> 63)
+
+
+    # one buffer -> one record
+    def decode(self, data):
+        if len(data) != self.size or data[:8] != self._fingerprint_bytes:
+            raise ValueError(f"buffer is not a {self.package}.{self.name}")
+        return np.frombuffer(data, dtype=self.dtype)[0]
+
+
+    # list of buffers -> structured array with one record per buffer, the
+    # buffers are joined once and viewed, no per message decoding
+    def decode_batch(self, buffers):
+        data = b''.join(buffers)
+        if len(data) != len(buffers) * self.size:
+            raise ValueError(f"buffers are not all {self.package}.{self.name}")
+        records = np.frombuffer(data, dtype=self.dtype)
+        if not (records[FINGERPRINT] == self.fingerprint).all():
+            raise ValueError(f"buffers are not all {self.package}.{self.name}")
+        return records
+
+
+    def encode(self, **fields):
+        record = np.zeros((), dtype=self.dtype)
+        record[FINGERPRINT] = self.fingerprint
+        for m_name, value in fields.items():
+            record[m_name] = value
+        return record.tobytes()
+
+
+    # encode a whole structured array (e.g. from zeros()) at once
+    def encode_batch(self, records):
+        records = np.asarray(records, dtype=self.dtype).copy()
+        records[FINGERPRINT] = self.fingerprint
+        return [r.tobytes() for r in records]
+
+
+    def zeros(self, n):
+        return np.zeros(n, dtype=self.dtype)
+
+
+# Parse the fixed size structs of an .lcm file, comments and constants are
+# skipped, members that are not fixed size primitives raise ValueError
+def parse_lcm(text):
+    text = re.sub(r'//[^\n]*|/\*.*?\*/', '', text, flags=re.S)
+    package = re.search(r'\bpackage\s+(\w+)\s*;', text)
+    package = package.group(1) if package else ''
+
+    structs = []
+    for name, body in re.findall(r'\bstruct\s+(\w+)\s*\{(.*?)\}', text, flags=re.S):
+        members = []
+        for decl in body.split(';'):
+            decl = decl.strip()
+            if not decl or decl.startswith('const'):
+                continue
+            m = re.fullmatch(r'(\w+)\s+(\w+)\s*((?:\[\s*\w+\s*\]\s*)*)', decl)
+            if m is None:
+                raise ValueError(f"{name}: cannot parse '{decl}'")
+            m_type, m_name, dims = m.groups()
+            dims = re.findall(r'\[\s*(\w+)\s*\]', dims)
+            if not all(d.isdigit() for d in dims):
+                raise ValueError(f"{name}.{m_name}: variable size array")
+            members.append((m_name, m_type, tuple(int(d) for d in dims)))
+        structs.append(LcmStruct(package, name, members))
+    return structs
+
+
+# keep in sync with lcm/types/*.lcm
+LEG_STATE_T = LcmStruct('monopod_lcm', 'leg_state_t', [
+    ('utime',    'int64_t', ()),
+    ('cycle',    'int64_t', ()),
+    ('position', 'double',  (2,)),
+    ('velocity', 'double',  (2,)),
+    ('torque',   'double',  (2,)),
+    ('mode',     'byte',    (2,)),
+    ('fault',    'byte',    (2,)),
+])
+
+LEG_CMD_T = LcmStruct('monopod_lcm', 'leg_cmd_t', [
+    ('utime',              'int64_t', ()),
+    ('cycle',              'int64_t', ()),
+    ('position',           'double',  (2,)),
+    ('velocity',           'double',  (2,)),
+    ('feedforward_torque', 'double',  (2,)),
+    ('maximum_torque',     'double',  (2,)),
+    ('kp_scale',           'double',  (2,)),
+    ('kd_scale',           'double',  (2,)),
+])
+
+SETPOINT_T = LcmStruct('monopod_lcm', 'setpoint_t', [
+    ('utime',      'int64_t', ()),
+    ('foot',       'double',  (2,)),
+    ('hop_height', 'double',  ()),
+    ('velocity',   'double',  ()),
+    ('enabled',    'boolean', ()),
+])
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+# Hop cycle state machine, driven by the servos' torque & velocity replies
+#
+#   FLIGHT -> TOUCHDOWN -> COMPRESSION -> THRUST -> LIFTOFF -> FLIGHT
+#
+# Contact is detected from the knee: while the foot is in the air the knee
+# servo only holds the shank, on the ground it carries the body, so |torque|
+# jumps up at touchdown and drops back at liftoff. The knee velocity gives
+# the leg's stroke, compressing (the knee folds) or extending.
+#   FLIGHT      -> TOUCHDOWN    |torque| > contact_torque, after swing_ticks
+#   TOUCHDOWN   -> COMPRESSION  next cycle (the touchdown commands went out once)
+#   COMPRESSION -> THRUST       the leg stops folding, bottom of the stroke
+#   THRUST      -> LIFTOFF      |torque| < release_torque
+#   LIFTOFF     -> FLIGHT       next cycle
+# Every condition must hold for debounce consecutive cycles before the phase
+# changes, single noisy replies do not flip it. contact_torque >
+# release_torque gives the contact detection a hysteresis. For the first
+# swing_ticks cycles of a flight the knee is busy swinging the leg out to the
+# landing pose, its torque saturates w/o any ground contact, so those cycles
+# are not checked for a touchdown.
+#
+# update() is O(1), a few comparisons and a counter per cycle. The commands
+# of every phase are encoded before the loop starts (phase_commands), a phase
+# change only selects another list, so the new commands go out in the cycle
+# right after the one whose replies triggered it.
+#
+# USAGE:
+#   hop = HopPhase(contact_torque=0.3, release_torque=0.15, debounce=2, swing_ticks=50)
+#   cmds = phase_commands(servos[1], servos[2], ctrlr, PHASE_TARGETS)
+#   while True:
+#       results = await transport.cycle(cmds[hop.phase])
+#       ... kn_torque, kn_vel from results ...
+#       hop.update(kn_torque, kn_vel)
+#
+
+import math
+
+
+FLIGHT      = 0
+TOUCHDOWN   = 1
+COMPRESSION = 2
+THRUST      = 3
+LIFTOFF     = 4
+
+PHASE_NAMES = ['flight', 'touchdown', 'compression', 'thrust', 'liftoff']
+
+# per phase foot set point (x, y) [m] w.r.t. the hip and position mode gains
+#   flight       leg out, ready to land
+#   touchdown    same pose, soft, takes the impact
+#   compression  soft towards a crouch, the leg stores the landing
+#   thrust       stiff & full torque to the extended pose
+#   liftoff      pull the foot in to clear the ground
+PHASE_TARGETS = [
+    {'foot': (0.0, -0.20),  'kp_scale': 1.0, 'maximum_torque': 0.5},
+    {'foot': (0.0, -0.20),  'kp_scale': 0.3, 'maximum_torque': 0.5},
+    {'foot': (0.0, -0.15),  'kp_scale': 0.3, 'maximum_torque': 0.5},
+    {'foot': (0.0, -0.235), 'kp_scale': 1.0, 'maximum_torque': 1.0},
+    {'foot': (0.0, -0.17),  'kp_scale': 1.0, 'maximum_torque': 0.5},
+]
+
+
+class HopPhase:
+    # contact_torque: knee |torque| above which the foot is loaded [Nm]
+    # release_torque: knee |torque| below which the foot is unloaded [Nm]
+    # stroke_vel:     knee velocity below which the compression stroke has
+    #                 ended [rev/s]
+    # debounce:       cycles a condition must hold before the phase changes
+    # swing_ticks:    cycles after liftoff w/o touchdown detection
+    # compress_sign:  sign of the knee velocity [rev/s] while the leg shortens,
+    #                 -1 w/ the encoder mapping of sinIkHopCtrlr.convert_rad_enc_kn
+    def __init__(self, contact_torque=0.3, release_torque=0.15, stroke_vel=0.2,
+                 debounce=2, swing_ticks=0, compress_sign=-1.0):
+        if release_torque > contact_torque:
+            raise ValueError("release_torque must not exceed contact_torque")
+        self.contact_torque = contact_torque
+        self.release_torque = release_torque
+        self.stroke_vel = stroke_vel
+        self.debounce = debounce
+        self.swing_ticks = swing_ticks
+        self.compress_sign = compress_sign
+        self.reset()
+
+
+    def reset(self, phase=FLIGHT):
+        self.phase = phase
+        self.ticks = 0 # cycles spent in the current phase
+        self.count = 0 # consecutive cycles the exit condition held
+        self.hops = 0  # completed liftoffs
+
+
+    def _enter(self, phase):
+        self.phase = phase
+        self.ticks = 0
+        self.count = 0
+        if phase == LIFTOFF:
+            self.hops += 1
+        return phase
+
+
+    # True once cond held for debounce cycles in a row
+    def _held(self, cond):
+        self.count = self.count + 1 if cond else 0
+        return self.count >= self.debounce
+
+
+    # torque [Nm] & velocity [rev/s] of the knee from this cycle's replies
+    # -> phase the next cycle's commands are for
+    def update(self, torque, velocity):
+        self.ticks += 1
+        phase = self.phase
+        if torque != torque or velocity != velocity:
+            # no reply from the knee this cycle, keep the phase
+            return phase
+        load = abs(torque)
+
+        if phase == FLIGHT:
+            if self._held(load > self.contact_torque and self.ticks > self.swing_ticks):
+                return self._enter(TOUCHDOWN)
+        elif phase == TOUCHDOWN:
+            return self._enter(COMPRESSION)
+        elif phase == COMPRESSION:
+            if self._held(self.compress_sign * velocity < self.stroke_vel):
+                return self._enter(THRUST)
+        elif phase == THRUST:
+            if self._held(load < self.release_torque):
+                return self._enter(LIFTOFF)
+        elif phase == LIFTOFF:
+            return self._enter(FLIGHT)
+        return phase
+
+
+    def name(self):
+        return PHASE_NAMES[self.phase]
+
+
+# the position commands (knee, hip) of every phase, indexed by phase, encoded
+# once from the foot set points & gains of targets (see PHASE_TARGETS)
+# constants: make_position arguments shared by all phases
+def phase_commands(kn_servo, hp_servo, ctrlr, targets=PHASE_TARGETS, **constants):
+    args = dict(velocity = 0.0,
+                stop_position = math.nan,
+                feedforward_torque = -0.01,
+                watchdog_timeout = math.nan,
+                query = True)
+    args.update(constants)
+
+    commands = []
+    for target in targets:
+        r = math.hypot(*target['foot'])
+        if not abs(ctrlr.l0 - ctrlr.l1) <= r <= ctrlr.l0 + ctrlr.l1:
+            raise ValueError(f"foot set point {target['foot']} is out of reach")
+        theta0, theta1 = ctrlr.ik_direct(*target['foot'])
+        gains = {name : value for name, value in target.items() if name != 'foot'}
+        commands.append([
+            kn_servo.make_position(position=ctrlr.convert_rad_enc_kn(theta1), **args, **gains), # KNEE
+            hp_servo.make_position(position=ctrlr.convert_rad_enc_hp(theta0), **args, **gains), # HIP
+        ])
+    return commands
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Raibert style hopping controller
+#
+# Treats the leg as a spring leg of stiffness k and rest length r0 (the
+# compliant position loop in stance, or the virtual spring of
+# virtual_leg_ctrlr.py) and controls, once per hop:
+#   hop height   energy injected in thrust: at the bottom of the stroke the
+#                leg's rest length is extended by delta, so that the spring
+#                energy lifts the body to the target apex,
+#                  1/2 k (c + delta)^2 = m g (h_target - z_b)
+#                  c = r0 - r_b, compression at the bottom (leg length r_b,
+#                  hip height z_b above the foot)
+#                the losses are taken up by an integral term on the measured
+#                apex, h_target = h_des + h_int
+#   foot placement  touchdown foot x w.r.t. the hip, the neutral point plus a
+#                correction of the forward speed,
+#                  x_td = v T_s / 2 + k_v (v - v_des)
+#                v the hip speed at liftoff (the foot's speed w.r.t. the hip
+#                in the last stance tick), T_s the time of the last stance
+# The apex is measured from the flight time T_f and the hip height above the
+# foot at touchdown z_td, h = z_td + g T_f^2 / 8 (+ the up to one tick the
+# touchdown is sampled late, see _touchdown).
+#
+# The phase comes from the hop state machine (hop_phase.py), the leg state from
+# the measured joint angles through sinIkHopCtrlr.fwrd_kinematics, the set
+# point goes back through sinIkHopCtrlr.ik_direct. Every tick is constant
+# time: a fk, an ik and a few float operations, the per hop updates (apex,
+# thrust, foot placement) run once on the phase change that triggers them.
+#
+# USAGE:
+#   raibert = RaibertCtrlr(ctrlr, h_des=0.3, mass=0.95, k=300.0, r0=0.2, dt=0.002)
+#   while True:
+#       ... results -> hop.update(kn_torque, kn_vel), theta0, theta1 ...
+#       kn_pos, hp_pos = raibert.update(hop.phase, theta0, theta1)
+#
+
+import math
+
+try:
+    from .hop_phase import FLIGHT, TOUCHDOWN, THRUST, LIFTOFF
+except ImportError:
+    from hop_phase import FLIGHT, TOUCHDOWN, THRUST, LIFTOFF
+
+
+GRAVITY = 9.81
+
+
+class RaibertCtrlr:
+    # ctrlr:        sinIkHopCtrlr, leg kinematics & encoder conversions
+    # h_des:        target apex height of the hip above the ground [m]
+    # mass:         hopping mass [kg]
+    # k:            leg stiffness [N/m]
+    # r0:           leg length at touchdown / rest length of the spring [m]
+    # dt:           period of update() [s]
+    # k_h:          integral gain on the apex height error, per hop
+    # v_des:        target forward speed [m/s], 0 on the slider
+    # k_v:          foot placement gain on the speed error [s]
+    # r_max:        longest leg, caps the thrust [m]
+    # x_max:        largest touchdown foot offset [m]
+    def __init__(self, ctrlr, h_des=0.3, mass=0.95, k=300.0, r0=0.2, dt=0.002,
+                 k_h=0.5, v_des=0.0, k_v=0.02, r_max=0.24, x_max=0.05):
+        self.ctrlr = ctrlr
+        self.h_des = h_des
+        self.mass = mass
+        self.k = k
+        self.r0 = r0
+        self.dt = dt
+        self.k_h = k_h
+        self.v_des = v_des
+        self.k_v = k_v
+        self.r_max = r_max
+        self.x_max = x_max
+        self.reset()
+
+
+    def reset(self):
+        self.phase = FLIGHT
+        self.h_int = 0.0       # integral of the apex error [m]
+        self.h_apex = math.nan # last measured apex [m]
+        self.delta = 0.0       # thrust extension of the current stance [m]
+        self.r_cmd = self.r0   # leg length set point [m]
+        self.x_td = 0.0        # touchdown foot x [m]
+        self.v = 0.0           # forward speed at the last liftoff [m/s]
+        self.v_stance = 0.0    # forward speed in stance, this tick [m/s]
+        self.flight_ticks = -1 # ticks since liftoff, -1 before the first one
+        self.stance_ticks = 0
+        self.z_td = self.r0    # hip height above the foot at touchdown [m]
+        self.x = 0.0           # measured foot w.r.t. the hip [m]
+        self.y = -self.r0
+        self.r = self.r0
+        self.hops = 0
+
+
+    # phase entry events, once per hop each
+    # x, y: foot w.r.t. the hip this tick
+    def _touchdown(self, x, y):
+        self.z_td = -y
+        if self.flight_ticks > 0:
+            t_f = self.flight_ticks * self.dt
+            # + the half tick the leg was on the ground on average, at the
+            #   touchdown speed g t_f / 2, before this tick sampled it
+            self.h_apex = self.z_td + GRAVITY * t_f * (t_f + 2.0 * self.dt) / 8.0
+            self.h_int += self.k_h * (self.h_des - self.h_apex)
+            # bounded, one hop height at most
+            self.h_int = max(-self.h_des, min(self.h_des, self.h_int))
+        self.stance_ticks = 0
+
+
+    def _thrust(self, x, y):
+        c = max(self.r0 - math.sqrt(x * x + y * y), 0.0)
+        lift = self.h_des + self.h_int + y
+        spring = math.sqrt(2.0 * self.mass * GRAVITY * lift / self.k) if lift > 0.0 else 0.0
+        self.delta = max(0.0, min(spring - c, self.r_max - self.r0))
+
+
+    def _liftoff(self):
+        self.hops += 1
+        self.flight_ticks = 0
+        if self.stance_ticks > 0:
+            # the last stance tick, the leg may already swing in this one
+            t_s = self.stance_ticks * self.dt
+            self.v = self.v_stance
+            x = self.v * t_s / 2.0 + self.k_v * (self.v - self.v_des)
+            self.x_td = max(-self.x_max, min(self.x_max, x))
+        self.delta = 0.0
+
+
+    # phase of this tick (hop_phase.py) & measured joint angles [rad]
+    # -> knee & hip set points [rev]
+    def update(self, phase, theta0, theta1):
+        x, y = self.ctrlr.fwrd_kinematics(theta0, theta1)
+        x = float(x)
+        y = float(y)
+        r = math.sqrt(x * x + y * y)
+
+        if phase != self.phase:
+            if phase == TOUCHDOWN:
+                self._touchdown(x, y)
+            elif phase == THRUST:
+                self._thrust(x, y)
+            elif phase == LIFTOFF:
+                self._liftoff()
+            self.phase = phase
+
+        if phase == FLIGHT or phase == LIFTOFF:
+            # swing to the touchdown pose
+            if self.flight_ticks >= 0:
+                self.flight_ticks += 1
+            self.r_cmd = self.r0
+            fx = self.x_td
+            fy = -math.sqrt(self.r0 * self.r0 - fx * fx)
+        else:
+            # stance, along the leg as it stands, extended in thrust
+            # the foot stands still, the hip moves by the opposite of its travel
+            if self.stance_ticks > 0:
+                self.v_stance = (self.x - x) / self.dt
+            self.stance_ticks += 1
+            self.r_cmd = self.r0 + self.delta
+            s = self.r_cmd / r if r > 0.0 else 0.0
+            fx = x * s
+            fy = y * s
+        self.x = x
+        self.y = y
+        self.r = r
+
+        theta0, theta1 = self.ctrlr.ik_direct(fx, fy)
+        return self.ctrlr.convert_rad_enc_kn(theta1), self.ctrlr.convert_rad_enc_hp(theta0)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+# Virtual spring leg (SLIP) impedance controller, in torque mode
+#
+# The two-link leg is made to behave like a massless telescopic leg w/ a
+# spring-damper between the hip and the foot. From the measured joint angles
+# each cycle:
+#   foot      p = fk(theta0, theta1), same kinematics as sinIkHopCtrlr
+#   jacobian  J = dp/dtheta
+#   leg       r = |p|, u = p / r (hip -> foot), phi = atan2(p_y, p_x)
+#   force     F_r = k (r0 - r) - b dr + f_ff                     along u
+#             F_t = (k_phi (phi0 - phi) - b_phi dphi) / r       along n = (-u_y, u_x)
+#   torques   tau = J^T (F_r u + F_t n)
+# F_r > 0 pushes the foot away from the hip, i.e. the spring extends the leg
+# and on the ground lifts the body. The joint torques are converted to motor
+# torques w/ the slopes of sinIkHopCtrlr.convert_rad_enc_* (motor rev per
+# joint rad), the motors' position loop is switched off (kp_scale = kd_scale
+# = 0) so feedforward_torque is the whole command, see torque_templates().
+#
+# Everything is closed form on python floats (math, no numpy), the per cycle
+# state lives in preallocated attributes, so update() takes a few us and
+# does not build any arrays or lists, which keeps it inside a 2 ms (500 Hz)
+# cycle on the pi.
+#
+# USAGE:
+#   leg = VirtualLegCtrlr(k=300.0, b=4.0, r0=0.2)
+#   kn_cmd, hp_cmd = leg.torque_templates(servos[1], servos[2])
+#   while True:
+#       hp_tau, kn_tau = leg.update(hp_pos, kn_pos, hp_vel, kn_vel)
+#       results = await transport.cycle([kn_cmd.make(kn_tau), hp_cmd.make(hp_tau)])
+#       ... hp_pos, kn_pos, hp_vel, kn_vel from results ...
+#
+
+import math
+
+try:
+    from ...moteus_ctrlr.cmd_template import PositionTemplate
+except ImportError:
+    from monopod.moteus_ctrlr.cmd_template import PositionTemplate
+
+
+# motor rev = ENC_SCALE * theta + ENC_OFFSET, the linear maps of
+# sinIkHopCtrlr.convert_rad_enc_hp / convert_rad_enc_kn
+HP_ENC_SCALE = 0.88 / (2 * math.pi)
+HP_ENC_OFFSET = -0.04
+KN_ENC_SCALE = 0.9 / math.pi
+KN_ENC_OFFSET = -0.05
+
+
+class VirtualLegCtrlr:
+    # l0, l1:       thigh & shank [m]
+    # k, b:         radial spring [N/m] and damper [N s/m] of the virtual leg
+    # r0:           rest length of the virtual leg [m]
+    # k_phi, b_phi: angular spring [Nm/rad] and damper [Nm s/rad] of the leg
+    #               angle about the hip, holds the leg at phi0
+    # phi0:         leg angle set point [rad], -pi/2 is straight down
+    # max_torque:   motor torque limit [Nm], also sent as maximum_torque
+    def __init__(self, l0=0.1, l1=0.15, k=300.0, b=4.0, r0=0.2,
+                 k_phi=2.0, b_phi=0.05, phi0=-math.pi / 2, max_torque=1.0):
+        self.l0 = l0
+        self.l1 = l1
+        self.k = k
+        self.b = b
+        self.r0 = r0
+        self.k_phi = k_phi
+        self.b_phi = b_phi
+        self.phi0 = phi0
+        self.max_torque = max_torque
+        self.f_ff = 0.0 # extra radial force [N], e.g. thrust
+
+        # joint torque [Nm] = motor torque [Nm] * tau ratio
+        self.hp_tau_ratio = 2 * math.pi * HP_ENC_SCALE
+        self.kn_tau_ratio = 2 * math.pi * KN_ENC_SCALE
+
+        # state of the last update
+        self.theta0 = self.theta1 = 0.0   # hip, knee [rad]
+        self.dtheta0 = self.dtheta1 = 0.0 # [rad/s]
+        self.x = self.y = 0.0             # foot w.r.t. the hip [m]
+        self.r = self.dr = 0.0            # virtual leg length [m], rate [m/s]
+        self.phi = self.dphi = 0.0        # virtual leg angle [rad], rate [rad/s]
+        self.force = 0.0                  # radial force [N]
+        self.hp_torque = self.kn_torque = 0.0 # motor torques sent [Nm]
+
+
+    # motor positions [rev] and velocities [rev/s] as replied by the moteus
+    # -> motor torques (hip, knee) [Nm] for feedforward_torque
+    def update(self, hp_pos, kn_pos, hp_vel, kn_vel):
+        t0 = (hp_pos - HP_ENC_OFFSET) / HP_ENC_SCALE
+        t1 = (kn_pos - KN_ENC_OFFSET) / KN_ENC_SCALE
+        w0 = hp_vel / HP_ENC_SCALE
+        w1 = kn_vel / KN_ENC_SCALE
+        return self.update_joints(t0, t1, w0, w1)
+
+
+    # same as update, from joint angles [rad] and rates [rad/s]
+    def update_joints(self, t0, t1, w0, w1):
+        l0 = self.l0
+        l1 = self.l1
+        c0 = math.cos(t0)
+        s0 = math.sin(t0)
+        c01 = math.cos(t0 + t1)
+        s01 = math.sin(t0 + t1)
+
+        # foot & jacobian
+        x = l0 * c0 + l1 * c01
+        y = l0 * s0 + l1 * s01
+        j00 = -l0 * s0 - l1 * s01
+        j01 = -l1 * s01
+        j10 = l0 * c0 + l1 * c01
+        j11 = l1 * c01
+        vx = j00 * w0 + j01 * w1
+        vy = j10 * w0 + j11 * w1
+
+        # polar coordinates of the foot
+        r = math.sqrt(x * x + y * y)
+        if r < 1e-6:
+            r = 1e-6
+        ux = x / r
+        uy = y / r
+        dr = ux * vx + uy * vy
+        dphi = (ux * vy - uy * vx) / r
+        phi = math.atan2(y, x)
+
+        # virtual spring-dampers, radial force & tangential force
+        fr = self.k * (self.r0 - r) - self.b * dr + self.f_ff
+        e_phi = (self.phi0 - phi + math.pi) % (2 * math.pi) - math.pi
+        ft = (self.k_phi * e_phi - self.b_phi * dphi) / r
+        fx = fr * ux - ft * uy
+        fy = fr * uy + ft * ux
+
+        # tau = J^T f, joint -> motor side, clamped
+        lim = self.max_torque
+        hp = (j00 * fx + j10 * fy) / self.hp_tau_ratio
+        kn = (j01 * fx + j11 * fy) / self.kn_tau_ratio
+        hp = -lim if hp < -lim else (lim if hp > lim else hp)
+        kn = -lim if kn < -lim else (lim if kn > lim else kn)
+
+        self.theta0 = t0
+        self.theta1 = t1
+        self.dtheta0 = w0
+        self.dtheta1 = w1
+        self.x = x
+        self.y = y
+        self.r = r
+        self.dr = dr
+        self.phi = phi
+        self.dphi = dphi
+        self.force = fr
+        self.hp_torque = hp
+        self.kn_torque = kn
+        return hp, kn
+
+
+    # pure torque commands (knee, hip): position loop off, only the
+    # feedforward_torque is patched per cycle (moteus_ctrlr/cmd_template.py)
+    # watchdog_timeout: latch a fault if no command arrives in this time [s],
+    #                   keeps a stale torque from being applied when the loop stops
+    def torque_templates(self, kn_servo, hp_servo, watchdog_timeout=0.05, buffers=1):
+        return [PositionTemplate(servo, ('feedforward_torque',),
+                    buffers = buffers,
+                    position = math.nan,
+                    velocity = 0.0,
+                    kp_scale = 0.0,
+                    kd_scale = 0.0,
+                    maximum_torque = self.max_torque,
+                    stop_position = math.nan,
+                    watchdog_timeout = watchdog_timeout,
+                    query = True)
+                for servo in (kn_servo, hp_servo)]
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+
+# Precomputed ik lookup table for the foot workspace of the 2D monopod leg
+#
+# A dense grid of joint solutions over the reachable (x, y) region, bounded
+# by the link lengths and the knee/hip joint limits, is solved once with
+# sinIkHopCtrlr.ik_batch and cached to disk keyed by the link lengths, limits,
+# knee branch and grid resolution. Queries are answered by bilinear
+# interpolation, so the control loop never runs the trig-heavy solve.
+#
+# The grid is solved w/ the controller's own knee branch rule, the one of
+# the ik_direct fallback, so the table and the fallback never disagree on
+# the branch and a set point cannot jump branches at the table's edge.
+# Grid points where that solution is out of the joint limits are not in
+# the table.
+#
+# Cells whose interpolation error is above max_err (branch switches,
+# angle wrap, joint limit edges) are left out of the table, queries that
+# land there return None and the caller falls back to the direct solver.
+#
+# In CPython a query costs about as much as ik_direct (bench/bench_ik.py),
+# the table pays off where the trig is expensive, not on a desktop.
+#
+# NOTE: the joint limits are the moteus servopos.position_min/max (in
+#       encoder revolutions) from two_d_leg_class.py
+#
+
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+
+LUT_VERSION = 2
+
+try:
+    from .sin_ik_hop_ctrlr import KN_LIMITS, HP_LIMITS
+except ImportError:
+    from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import KN_LIMITS, HP_LIMITS
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "monopod")
+
+
+class IkLookupTable():
+
+    # ctrlr: a sinIkHopCtrlr, used for the link lengths, ik_batch/fk_batch and
+    #        the encoder <-> radian conversions
+    # res:   grid spacing [m]
+    # max_err: max interpolation error [rad] of a cell to be kept in the table
+    def __init__(self, ctrlr, res=0.002, kn_limits=KN_LIMITS, hp_limits=HP_LIMITS,
+                 max_err=0.01, cache_dir=CACHE_DIR):
+        self.ctrlr = ctrlr
+        self.res = res
+        self.kn_limits = tuple(kn_limits)
+        self.hp_limits = tuple(hp_limits)
+        self.max_err = max_err
+        self.cache_dir = cache_dir
+
+        # joint limits in radians, sorted since the conversions may flip them
+        self.kn_rad = tuple(sorted(ctrlr.convert_enc_rad_kn(p) for p in self.kn_limits))
+        self.hp_rad = tuple(sorted(ctrlr.convert_enc_rad_hp(p) for p in self.hp_limits))
+
+        self.key = self.cache_key()
+        self.path = None
+        if cache_dir is not None:
+            self.path = os.path.join(cache_dir, "ik_lut_" + self.key + ".npz")
+
+        if self.path is not None and os.path.exists(self.path):
+            self.load(self.path)
+        else:
+            self.build()
+            if self.path is not None:
+                self.save(self.path)
+
+        self._prepare_query()
+
+
+    def cache_key(self):
+        params = {
+            "version": LUT_VERSION,
+            "l0": self.ctrlr.l0,
+            "l1": self.ctrlr.l1,
+            "branch": self.ctrlr.branch,
+            "kn_limits": self.kn_limits,
+            "hp_limits": self.hp_limits,
+            "kn_rad": self.kn_rad,
+            "hp_rad": self.hp_rad,
+            "res": self.res,
+            "max_err": self.max_err,
+        }
+        return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+    # Exact joint solution of ik_direct (the controller's knee branch) for
+    # each foot point, NaN where it is out of reach or out of the joint limits
+    def solve_limited(self, xy):
+        theta, reachable = self.ctrlr.ik_batch(xy, return_mask=True)
+        ok = (reachable
+              & (theta[..., 0] >= self.hp_rad[0]) & (theta[..., 0] <= self.hp_rad[1])
+              & (theta[..., 1] >= self.kn_rad[0]) & (theta[..., 1] <= self.kn_rad[1]))
+        theta[~ok] = np.nan
+        return theta
+
+
+    def build(self):
+        # bounding box of the workspace, from the fk of the joint limit box
+        th0, th1 = np.meshgrid(np.linspace(self.hp_rad[0], self.hp_rad[1], 256),
+                               np.linspace(self.kn_rad[0], self.kn_rad[1], 256))
+        xy = self.ctrlr.fk_batch(np.stack((th0, th1), axis=-1))
+        x0 = math.floor(xy[..., 0].min() / self.res) * self.res - self.res
+        y0 = math.floor(xy[..., 1].min() / self.res) * self.res - self.res
+        nx = int(math.ceil((xy[..., 0].max() - x0) / self.res)) + 2
+        ny = int(math.ceil((xy[..., 1].max() - y0) / self.res)) + 2
+
+        gx, gy = np.meshgrid(x0 + self.res * np.arange(nx), y0 + self.res * np.arange(ny))
+        theta = self.solve_limited(np.stack((gx, gy), axis=-1))
+
+        # interpolation error of each cell, sampled at its centre and edge midpoints
+        err = np.zeros((ny - 1, nx - 1))
+        for fx, fy in [(0.5, 0.5), (0.5, 0.0), (0.0, 0.5), (1.0, 0.5), (0.5, 1.0)]:
+            sx = gx[:-1, :-1] + fx * self.res
+            sy = gy[:-1, :-1] + fy * self.res
+            exact = self.solve_limited(np.stack((sx, sy), axis=-1))
+            interp = (theta[:-1, :-1] * (1 - fx) * (1 - fy) + theta[:-1, 1:] * fx * (1 - fy)
+                      + theta[1:, :-1] * (1 - fx) * fy + theta[1:, 1:] * fx * fy)
+            err = np.fmax(err, np.abs(interp - exact).max(axis=-1))
+            err[np.isnan(exact).any(axis=-1)] = np.nan
+
+        corners = theta[:-1, :-1] + theta[:-1, 1:] + theta[1:, :-1] + theta[1:, 1:]
+        err[np.isnan(corners).any(axis=-1)] = np.nan
+        valid = ~np.isnan(err) & (err <= self.max_err)
+
+        self.x0 = x0
+        self.y0 = y0
+        self.nx = nx
+        self.ny = ny
+        self.theta = theta
+        self.valid = valid
+        # reported bound of the table: max sampled joint error [rad] of the kept cells
+        self.err_bound = float(err[valid].max()) if valid.any() else 0.0
+        # and the matching bound in foot space [m]
+        self.err_bound_xy = self.err_bound * (self.ctrlr.l0 + 2 * self.ctrlr.l1)
+
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, x0=self.x0, y0=self.y0, theta=self.theta, valid=self.valid,
+                 err_bound=self.err_bound, err_bound_xy=self.err_bound_xy)
+        os.replace(tmp, path)
+
+
+    def load(self, path):
+        data = np.load(path)
+        self.x0 = float(data["x0"])
+        self.y0 = float(data["y0"])
+        self.theta = data["theta"]
+        self.valid = data["valid"]
+        self.ny, self.nx = self.valid.shape[0] + 1, self.valid.shape[1] + 1
+        self.err_bound = float(data["err_bound"])
+        self.err_bound_xy = float(data["err_bound_xy"])
+
+
+    # flat python lists are faster to index than numpy arrays for single queries
+    def _prepare_query(self):
+        self._inv_res = 1.0 / self.res
+        self._t0 = np.nan_to_num(self.theta[..., 0]).ravel().tolist()
+        self._t1 = np.nan_to_num(self.theta[..., 1]).ravel().tolist()
+        self._valid = self.valid.ravel().tolist()
+
+
+    # Interpolated (theta0, theta1) for the foot point (x, y),
+    # None when the point is outside of the table
+    def query(self, x, y):
+        fx = (x - self.x0) * self._inv_res
+        fy = (y - self.y0) * self._inv_res
+        if fx < 0.0 or fy < 0.0:
+            return None
+        i = int(fx)
+        j = int(fy)
+        if i >= self.nx - 1 or j >= self.ny - 1 or not self._valid[j * (self.nx - 1) + i]:
+            return None
+
+        tx = fx - i
+        ty = fy - j
+        k = j * self.nx + i
+        kn = k + self.nx
+
+        t = self._t0
+        a = t[k]
+        theta0 = a + (t[k + 1] - a) * tx + (t[kn] - a) * ty + (a - t[k + 1] - t[kn] + t[kn + 1]) * tx * ty
+        t = self._t1
+        a = t[k]
+        theta1 = a + (t[k + 1] - a) * tx + (t[kn] - a) * ty + (a - t[k + 1] - t[kn] + t[kn + 1]) * tx * ty
+        return theta0, theta1
+
+
+
+# Checks the table against ik_direct, it is the fallback off the table:
+# every query on the table is within the table's error bound of ik_direct
+# and on the same knee branch. Exits 1 otherwise.
+if __name__ == "__main__":
+    import sys
+    import time
+    from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+
+    ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+    t0 = time.perf_counter()
+    lut = IkLookupTable(ctrlr)
+    print("table:       ", lut.nx, "x", lut.ny, "cells, in", lut.path)
+    print("load/build:  ", time.perf_counter() - t0, "s")
+    print("err bound:   ", lut.err_bound, "rad,", lut.err_bound_xy, "m")
+
+    rng = np.random.default_rng(0)
+    pts = np.stack((rng.uniform(lut.x0, lut.x0 + (lut.nx - 1) * lut.res, 100000),
+                    rng.uniform(lut.y0, lut.y0 + (lut.ny - 1) * lut.res, 100000)), axis=1)
+    on_table = branch_flips = 0
+    worst = 0.0
+    for x, y in pts:
+        sol = lut.query(x, y)
+        if sol is None:
+            continue
+        on_table += 1
+        ref = ctrlr.ik_direct(x, y)
+        if (sol[1] < 0.0) != (ref[1] < 0.0) and abs(ref[1]) > lut.err_bound:
+            branch_flips += 1
+        worst = max(worst, abs(sol[0] - ref[0]), abs(sol[1] - ref[1]))
+    print("vs ik_direct:", on_table, "points on the table, worst", worst, "rad,",
+          branch_flips, "on another knee branch")
+    sys.exit(1 if branch_flips or worst > lut.err_bound + 1e-9 else 0)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Live leg animation in its own process
+#
+# The controller only writes the newest leg state into a small shared memory
+# block (a few microseconds, never blocks). A separate process redraws at a
+# fixed frame rate from whatever state is newest, updating only the line
+# data of the artists and blitting them over a cached background, so states
+# published faster than the frame rate are simply skipped and the animation
+# never changes the controller's timing.
+#
+# The block is a seqlock: the writer makes the sequence number odd, writes
+# the state and makes it even again, the reader retries when the number is
+# odd or changed during its copy, so no lock is shared between the processes.
+#
+# USAGE:
+#   viz = LegVisualizer(l0=0.1, l1=0.15)
+#   viz.start()
+#   while True:
+#       ... ik ...
+#       viz.publish(theta0, theta1, target_x, target_y)
+#   viz.close()
+#
+
+import math
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# layout of the shared block, float64 slots
+SEQ      = 0 # sequence number, odd while the writer is in the middle of an update
+STOP     = 1 # set to 1 by the producer to close the window
+THETA0   = 2
+THETA1   = 3
+TARGET_X = 4
+TARGET_Y = 5
+SLOTS    = 6
+
+
+class LegVisualizer:
+    # l0, l1: link lengths [m]
+    # fps:    redraw rate of the viewer process
+    def __init__(self, l0=0.1, l1=0.15, fps=30.0):
+        self.l0 = l0
+        self.l1 = l1
+        self.fps = fps
+        self.published = 0
+        self._shm = None
+        self._state = None
+        self._process = None
+
+
+    def start(self):
+        self._shm = shared_memory.SharedMemory(create=True, size=SLOTS * 8)
+        self._state = np.ndarray((SLOTS,), dtype=np.float64, buffer=self._shm.buf)
+        self._state[:] = 0.0
+        self._state[THETA0] = -math.pi / 2
+        # spawn, the controller process may run threads and an event loop
+        ctx = multiprocessing.get_context('spawn')
+        self._process = ctx.Process(target=viewer_main, name="leg_viz", daemon=True,
+                                    args=(self._shm.name, self.l0, self.l1, self.fps))
+        self._process.start()
+
+
+    def publish(self, theta0, theta1, target_x=math.nan, target_y=math.nan):
+        state = self._state
+        state[SEQ] += 1
+        state[THETA0] = theta0
+        state[THETA1] = theta1
+        state[TARGET_X] = target_x
+        state[TARGET_Y] = target_y
+        state[SEQ] += 1
+        self.published += 1
+
+
+    def close(self):
+        if self._process is None:
+            return
+        self._state[STOP] = 1.0
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+        self._state = None
+        self._shm.close()
+        self._shm.unlink()
+
+
+# consistent copy of the shared state, None if nothing new since seq
+def read_state(state, seq=None):
+    while True:
+        seq0 = state[SEQ]
+        if seq0 == seq:
+            return None
+        if seq0 % 2:
+            continue
+        snapshot = state.copy()
+        if state[SEQ] == seq0:
+            return snapshot
+
+
+# Viewer process main, redraws the newest state at fps until STOP is set or
+# the window is closed, frames=N stops after N redraws (for headless runs)
+def viewer_main(shm_name, l0, l1, fps, frames=None):
+    import matplotlib.pyplot as plt
+
+    # the producer owns and unlinks the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    state = np.ndarray((SLOTS,), dtype=np.float64, buffer=shm.buf)
+
+    reach = (l0 + l1) * 1.2
+    fig, ax = plt.subplots()
+    ax.set_xlim(-reach, reach)
+    ax.set_ylim(-reach, reach)
+    ax.set_aspect('equal')
+    leg, = ax.plot([], [], 'k-o', mfc='r', mec='r', animated=True)
+    goal, = ax.plot([], [], 'g--*', animated=True)
+    plt.show(block=False)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+
+    drawn = 0
+    seq = None
+    period = 1.0 / fps
+    while state[STOP] == 0.0 and plt.fignum_exists(fig.number):
+        t0 = time.monotonic()
+        snapshot = read_state(state, seq)
+        if snapshot is not None:
+            seq = snapshot[SEQ]
+            theta0 = snapshot[THETA0]
+            theta01 = theta0 + snapshot[THETA1]
+            knee = (l0 * math.cos(theta0), l0 * math.sin(theta0))
+            foot = (knee[0] + l1 * math.cos(theta01), knee[1] + l1 * math.sin(theta01))
+            leg.set_data([0.0, knee[0], foot[0]], [0.0, knee[1], foot[1]])
+            goal.set_data([foot[0], snapshot[TARGET_X]], [foot[1], snapshot[TARGET_Y]])
+
+            fig.canvas.restore_region(background)
+            ax.draw_artist(leg)
+            ax.draw_artist(goal)
+            fig.canvas.blit(fig.bbox)
+            drawn += 1
+            if frames is not None and drawn >= frames:
+                break
+        fig.canvas.flush_events()
+        remaining = period - (time.monotonic() - t0)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    plt.close(fig)
+    shm.close()
+    return drawn
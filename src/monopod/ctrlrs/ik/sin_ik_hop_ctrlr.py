@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+
+# sinusoidal hopping controller based on
+# analytical inverse kinematics set points controlled
+# by a sine wave with a P control loop
+
+#
+# TODO: - Perhaps implement Ki and Kd gains for more full robust PID control
+#
+
+import numpy as np
+from random import random
+import math
+import sys
+import time
+
+
+# knee/hip joint limits [rev], the moteus servopos.position_min/max of
+# two_d_leg_class.py, for code that checks set points w/o the moteus package
+KN_LIMITS = (-0.65, -0.15)
+HP_LIMITS = (-0.51,  0.02)
+
+# P-loop steps of the iterative ik before it gives up, a target it cannot
+# get within des_eps of (e.g. out of reach) would loop forever otherwise
+IK_MAX_ITER = 1000
+
+
+class sinIkHopCtrlr():
+
+    # ik_mode: 'iter'   -> P-loop that steps towards the analytic solution
+    #          'direct' -> closed-form solution in a single bounded-time call
+    #          'lut'    -> interpolated from an IkLookupTable (see use_lut)
+    # branch:  'auto' (legacy knee selection), 'up' (theta1 >= 0), 'down' (theta1 <= 0)
+    # smooth:  in 'direct' mode, apply one P filter step to the solution
+    def __init__(self, Kp=25.0, dt=0.015, l0=0.1, l1=0.15, anim=True,
+                 ik_mode='iter', branch='auto', smooth=False):
+        self.Kp = Kp
+        self.dt = dt
+        self.l0 = l0
+        self.l1 = l1
+        self.ik_mode = ik_mode
+        self.branch = branch
+        self.smooth = smooth
+        self.lut = None
+        # state vector for the foot point
+        self.q = np.array([[0.1],  # x
+                           [0.1]]) # y
+        self.theta0 = self.theta1 = 0.0
+        # False when the last iterative ik stopped at max_iter
+        self.ik_converged = True
+        self.show_animation = anim
+        self.viz = None
+        if self.show_animation:
+            # drawn by a separate process, loaded only when animating
+            try:
+                from .leg_viz import LegVisualizer
+            except ImportError:
+                from leg_viz import LegVisualizer
+            self.viz = LegVisualizer(l0, l1)
+            self.viz.start()
+
+
+    # stops the viewer process & frees its shared memory, safe to call twice
+    def close(self):
+        if self.viz is not None:
+            self.viz.close()
+            self.viz = None
+
+
+    # Computes the ik for a planar 2DOF leg
+    # When out of bounds, rewrite q[0] and q[1]
+    # w/ previous valid values
+    # Gives up after max_iter steps w/ the angles it got to, ik_converged
+    # tells whether the foot got within des_eps
+    def two_link_leg_ik(self, des_eps=0.0, theta0=0.0, theta1=0.0, max_iter=IK_MAX_ITER):
+        if self.ik_mode in ('direct', 'lut'):
+            return self.two_link_leg_ik_direct(theta0, theta1)
+
+        x_prev, y_prev = None, None
+
+        for _ in range(max_iter):
+            try:
+                if float(self.q[0]) is not None and float(self.q[1]) is not None:
+                    x_prev = float(self.q[0])
+                    y_prev = float(self.q[1])
+
+                # NOTE: assuming the base point is the origin (0,0) for the dist formula
+                if np.sqrt(float(self.q[0])**2 + float(self.q[1])**2) > (self.l0 + self.l1):
+                    theta1_des = 0
+
+                else:
+                    theta1_des = np.arccos(
+                        (float(self.q[0])**2 + float(self.q[1])**2 - self.l0**2 - self.l1**2) /
+                        (2 * self.l0 * self.l1))
+
+                beta_angle = math.atan2(self.l1 * np.sin(theta1_des),\
+                                           (self.l0 + self.l1 * np.cos(theta1_des)))
+                gamma_angle = math.atan2(float(self.q[1]), float(self.q[0]))
+                theta0_des = gamma_angle - beta_angle
+
+                if theta0_des < 0:
+                    theta1_des = -theta1_des
+                    beta_angle = math.atan2(self.l1 * np.sin(theta1_des),
+                                               (self.l0 + self.l1 * np.cos(theta1_des)))
+                    theta0_des = gamma_angle - beta_angle
+
+                # apply proportional gain and time step to output angles
+                theta0 = theta0 + self.Kp * self.ang_diff(theta0_des, theta0) * self.dt
+                theta1 = theta1 + self.Kp * self.ang_diff(theta1_des, theta1) * self.dt
+
+            except ValueError as e:
+                print("Unreachable des"+e)
+
+            # go back to the last valid point
+            except TypeError:
+                x = x_prev
+                y = y_prev
+
+            foot = self.plot_leg(theta0, theta1, float(self.q[0]), float(self.q[1]))
+
+                # check desired point
+            dist_to_des = None
+            if float(self.q[0]) is not None and float(self.q[1]) is not None:
+                dist_to_des = np.hypot(foot[0] - float(self.q[0]), foot[1] - float(self.q[1]))
+
+            if abs(dist_to_des) < des_eps and float(self.q[0]) is not None:
+                self.theta0 = theta0
+                self.theta1 = theta1
+                self.ik_converged = True
+                return theta0, theta1
+
+        self.theta0 = theta0
+        self.theta1 = theta1
+        self.ik_converged = False
+        return theta0, theta1
+
+
+    # Closed-form ik mode of two_link_leg_ik, no iteration and no
+    # convergence check. theta0/theta1 are only used by the optional filter
+    def two_link_leg_ik_direct(self, theta0=0.0, theta1=0.0):
+        x = float(self.q[0, 0])
+        y = float(self.q[1, 0])
+        sol = None
+        if self.lut is not None:
+            sol = self.lut.query(x, y)
+        if sol is None:
+            sol = self.ik_direct(x, y)
+        theta0_des, theta1_des = sol
+
+        if self.smooth:
+            theta0_des, theta1_des = self.p_filter(theta0_des, theta1_des, theta0, theta1)
+
+        if self.show_animation:
+            self.plot_leg(theta0_des, theta1_des, x, y)
+
+        self.theta0 = theta0_des
+        self.theta1 = theta1_des
+        return theta0_des, theta1_des
+
+
+    # Answer ik queries from a precomputed ctrlrs.ik.ik_lut.IkLookupTable,
+    # points outside of the table fall back to ik_direct
+    def use_lut(self, lut):
+        self.lut = lut
+        self.ik_mode = 'lut'
+
+
+    # Analytic ik for the foot point (x, y), targets out of reach are
+    # clamped onto the workspace boundary (fully extended or folded leg)
+    def ik_direct(self, x, y, branch=None):
+        if branch is None:
+            branch = self.branch
+
+        c1 = (x*x + y*y - self.l0**2 - self.l1**2) / (2 * self.l0 * self.l1)
+        if c1 > 1.0:
+            c1 = 1.0
+        elif c1 < -1.0:
+            c1 = -1.0
+
+        theta1 = math.acos(c1)
+        if branch == 'down':
+            theta1 = -theta1
+
+        gamma_angle = math.atan2(y, x)
+        theta0 = gamma_angle - math.atan2(self.l1 * math.sin(theta1), self.l0 + self.l1 * c1)
+
+        # same knee selection as the P-loop
+        if branch == 'auto' and theta0 < 0:
+            theta1 = -theta1
+            theta0 = gamma_angle - math.atan2(self.l1 * math.sin(theta1), self.l0 + self.l1 * c1)
+
+        # keep the hip angle in -pi to +pi for the linear encoder conversion
+        if theta0 >= math.pi:
+            theta0 -= 2 * math.pi
+        elif theta0 < -math.pi:
+            theta0 += 2 * math.pi
+
+        return theta0, theta1
+
+
+    # Vectorized ik_direct over whole foot trajectories, xy: (N, 2) -> theta: (N, 2)
+    # columns of theta are (theta0, theta1). Unreachable points are clamped onto
+    # the workspace boundary and flagged False in the mask (return_mask=True)
+    def ik_batch(self, xy, branch=None, return_mask=False):
+        if branch is None:
+            branch = self.branch
+
+        xy = np.asarray(xy, dtype=float)
+        x = xy[..., 0]
+        y = xy[..., 1]
+
+        c1 = (x*x + y*y - self.l0**2 - self.l1**2) / (2 * self.l0 * self.l1)
+        reachable = np.abs(c1) <= 1.0
+        c1 = np.clip(c1, -1.0, 1.0)
+
+        theta1 = np.arccos(c1)
+        if branch == 'down':
+            theta1 = -theta1
+
+        gamma_angle = np.arctan2(y, x)
+        theta0 = gamma_angle - np.arctan2(self.l1 * np.sin(theta1), self.l0 + self.l1 * c1)
+
+        # same knee selection as the P-loop, per point
+        if branch == 'auto':
+            flip = theta0 < 0
+            theta1 = np.where(flip, -theta1, theta1)
+            theta0 = np.where(
+                flip,
+                gamma_angle - np.arctan2(self.l1 * np.sin(theta1), self.l0 + self.l1 * c1),
+                theta0)
+
+        theta = np.stack((self.ang_diff(theta0, 0.0), theta1), axis=-1)
+        if return_mask:
+            return theta, reachable
+        return theta
+
+
+    # Vectorized fwrd_kinematics, theta: (N, 2) -> xy: (N, 2)
+    def fk_batch(self, theta):
+        theta = np.asarray(theta, dtype=float)
+        theta0 = theta[..., 0]
+        theta01 = theta0 + theta[..., 1]
+        x = self.l0 * np.cos(theta0) + self.l1 * np.cos(theta01)
+        y = self.l0 * np.sin(theta0) + self.l1 * np.sin(theta01)
+        return np.stack((x, y), axis=-1)
+
+
+    # One proportional step from the current angles towards the desired ones
+    def p_filter(self, theta0_des, theta1_des, theta0, theta1):
+        theta0 = theta0 + self.Kp * self.ang_diff(theta0_des, theta0) * self.dt
+        theta1 = theta1 + self.Kp * self.ang_diff(theta1_des, theta1) * self.dt
+        return theta0, theta1
+
+
+    def plot_leg(self, theta0, theta1, target_x, target_y):  # pragma: no cover
+        hip = np.array([0, 0])
+        knee = hip + np.array([self.l0 * np.cos(theta0), self.l0 * np.sin(theta0)])
+        foot = knee + \
+            np.array([self.l1 * np.cos(theta0 + theta1), self.l1 * np.sin(theta0 + theta1)])
+
+        if self.viz is not None:
+            # only hands the state over, the viewer process redraws at its own rate
+            self.viz.publish(theta0, theta1, target_x, target_y)
+
+        return foot
+
+
+    def ang_diff(self, theta0, theta1):
+        # Return difference b/w two angles in range -pi to +pi
+        return (theta0 - theta1 + np.pi) % (2 * np.pi) - np.pi
+
+
+    def lin_conv(self, old_val, old_min, old_max, new_min, new_max):
+        old_rng = old_max - old_min
+        if (old_rng == 0):
+            new_val = new_min
+        else:
+            new_rng = (new_max - new_min)
+            new_val = (((old_val - old_min) * new_rng) / old_rng) + new_min
+        return new_val
+
+
+    def sinusoidal_mv_anim(self):
+        theta0 = theta1 = 0.0
+        try:
+            while True:
+                now = time.time()
+                self.q[0] = 0.0
+                self.q[1] = 1.0 * np.sin(now) - 2.0
+                theta0, theta1 = self.two_link_leg_ik(
+                    des_eps=0.1, theta0=theta0, theta1=theta1)
+                # print out the motor pos equiv:
+                hp_pos = self.convert_rad_enc_hp(theta0)
+                kn_pos = self.convert_rad_enc_kn(theta1)
+                print("time: ", now)
+                print("hp: ", hp_pos)
+                print("kn: ", kn_pos)
+        finally:
+            # Ctrl-C ends the loop, the viewer must not outlive it
+            self.close()
+
+    def sinusoidal_mv(self, q_0, q_1):
+        theta0 = theta1 = 0.0
+        self.q[0] = q_0
+        self.q[0] = q_1
+        theta, theta1 = self.two_link_leg_ik(
+            des_eps=0.1, theta0=theta0, theta1=theta1)
+        return theta0, theta1
+
+
+    # NOTE: MAKE SURE THE RANGE OF RADIANS IS APPROX TO IRL RANGE OF KNEE JOINT
+    def convert_rad_enc_kn(self, theta):
+        # linear conversion from theta angle to the knee motor limits
+        goal_pos = self.lin_conv(theta, -np.pi/2.0, np.pi/2.0, -0.5, 0.4)
+        return goal_pos
+
+    def convert_rad_enc_hp(self, theta):
+        # linear conversion from theta angle to the hip motor limits
+        goal_pos = self.lin_conv(theta, -np.pi, np.pi, -0.48, 0.4)
+        return goal_pos
+
+    # NOTE: MAKE SURE THE RANGE OF RADIANS IS APPROX TO IRL RANGE OF KNEE JOINT
+    def convert_enc_rad_kn(self, pos):
+        # linear conversion from knee motor limits to theta angle
+        theta = self.lin_conv(pos, -0.5, 0.4, -np.pi/2.0, np.pi/2.0)
+        return theta
+
+    def convert_enc_rad_hp(self, pos):
+        # linear conversion from hip motor limits to theta angle
+        theta = self.lin_conv(pos, -0.48, 0.4, -np.pi, np.pi)
+        return theta
+
+    def fwrd_kinematics(self, theta0, theta1):
+        x = self.l0 * np.cos(theta0) + self.l1 * np.cos(theta0 + theta1)
+        y = self.l0 * np.sin(theta0) + self.l1 * np.sin(theta0 + theta1)
+        return x, y
+
+
+
+if __name__ == "__main__":
+    ctrlr = sinIkHopCtrlr()
+    ctrlr.sinusoidal_mv_anim()
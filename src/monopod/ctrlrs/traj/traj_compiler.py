@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+# Offline trajectory compiler: foot waypoints -> per tick joint set point table
+#
+# The foot path (x, y w.r.t. the hip) through the waypoints is sampled at the
+# loop period, solved w/ sinIkHopCtrlr.ik_batch in one go, converted to motor
+# revs w/ convert_rad_enc_kn/hp and checked against the knee/hip position
+# limits, all before the loop starts. The result is one C-contiguous table:
+#   table[tick, servo, value]   servo  KNEE, HIP (the order of the commands)
+#                               value  POSITION [rev], VELOCITY [rev/s],
+#                                      TORQUE (feedforward) [Nm]
+# so a control loop only indexes the row of the current tick, whatever the
+# profile, the number of waypoints or the ik cost.
+#
+# Profiles between two waypoints:
+#   step    hold the waypoint until the next one (the old crouch/extend toggle)
+#   linear  constant speed
+#   sine    half a cosine, starts & stops at rest, a sinusoid over crouch/extend
+#   spline  cubic hermite through all waypoints (catmull-rom tangents), smooth
+#           velocity across the waypoints
+# The velocities are the derivative of the position table (0 for step), the
+# feedforward torque is constant per servo.
+#
+# USAGE:
+#   traj = crouch_extend(ctrlr, dt=1/500, period=2.0, profile='sine')
+#   t0 = time.monotonic()
+#   while True:
+#       kn, hp = traj.at(time.monotonic() - t0)
+#       ... kn[POSITION], kn[VELOCITY], kn[TORQUE] ...
+#
+
+import math
+
+import numpy as np
+
+try:
+    from ..ik.sin_ik_hop_ctrlr import KN_LIMITS, HP_LIMITS
+except ImportError:
+    from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import KN_LIMITS, HP_LIMITS
+
+
+KNEE = 0
+HIP  = 1
+
+POSITION = 0
+VELOCITY = 1
+TORQUE   = 2
+
+PROFILES = ('step', 'linear', 'sine', 'spline')
+
+# foot points of the crouch/extend hop [m]
+CROUCH = (0.0, -0.15)
+EXTEND = (0.0, -0.235)
+
+
+class JointTrajectory():
+
+    # table:    (ticks, 2, 3) set points, see the header
+    # dt:       time between two ticks [s]
+    # periodic: wrap around at the end, otherwise hold the last tick
+    def __init__(self, table, dt, periodic=True):
+        self.table = np.ascontiguousarray(table, dtype=np.float64)
+        self.dt = dt
+        self.periodic = periodic
+        self.ticks = len(self.table)
+        self.duration = self.ticks * dt
+
+
+    def __len__(self):
+        return self.ticks
+
+
+    # tick of time t [s] since the start of the trajectory
+    def index(self, t):
+        i = int(t / self.dt)
+        if self.periodic:
+            return i % self.ticks
+        return min(max(i, 0), self.ticks - 1)
+
+
+    # (2, 3) set points (knee, hip) at time t [s]
+    def at(self, t):
+        return self.table[self.index(t)]
+
+
+    def save(self, path):
+        np.savez(path, table=self.table, dt=self.dt, periodic=self.periodic)
+
+
+def load_trajectory(path):
+    with np.load(path) as data:
+        return JointTrajectory(data['table'], float(data['dt']), bool(data['periodic']))
+
+
+# foot points at the times t, (n, 2), from the waypoints pts (m, 2) at times
+def interpolate(pts, times, t, profile, period=None):
+    m = len(pts)
+    if period is not None:
+        # the segment after the last waypoint goes back to the first
+        nxt = np.arange(1, m + 1) % m
+        t_end = np.append(times[1:], period)
+    else:
+        nxt = np.minimum(np.arange(1, m + 1), m - 1)
+        t_end = np.append(times[1:], times[-1])
+        t = np.clip(t, times[0], times[-1])
+
+    seg = np.clip(np.searchsorted(times, t, side='right') - 1, 0, m - 1)
+    t0 = times[seg]
+    span = t_end[seg] - t0
+    u = np.divide(t - t0, span, out=np.zeros_like(t), where=span > 0)[:, None]
+    p0 = pts[seg]
+    p1 = pts[nxt[seg]]
+
+    if profile == 'step':
+        return p0.copy()
+    if profile == 'linear':
+        return p0 + u * (p1 - p0)
+    if profile == 'sine':
+        return p0 + (1.0 - np.cos(np.pi * u)) / 2.0 * (p1 - p0)
+
+    # spline: tangent at each waypoint from its neighbours
+    if period is not None:
+        prv = np.arange(-1, m - 1) % m
+        t_prv = np.append(times[-1] - period, times[:-1])
+        tangents = (pts[nxt] - pts[prv]) / (t_end - t_prv)[:, None]
+    else:
+        tangents = np.zeros_like(pts)
+        if m > 2:
+            tangents[1:-1] = (pts[2:] - pts[:-2]) / (times[2:] - times[:-2])[:, None]
+    d = span[:, None]
+    u2 = u * u
+    u3 = u2 * u
+    return ((2 * u3 - 3 * u2 + 1) * p0 + (u3 - 2 * u2 + u) * d * tangents[seg] +
+            (-2 * u3 + 3 * u2) * p1 + (u3 - u2) * d * tangents[nxt[seg]])
+
+
+# ctrlr:     sinIkHopCtrlr, ik_batch & encoder conversions
+# waypoints: foot points (x, y) w.r.t. the hip [m]
+# times:     time of each waypoint [s], increasing, from 0
+# dt:        loop period [s], one table row per tick
+# period:    periodic trajectory of this length [s] (> the last time), it
+#            returns to the first waypoint; None: ends at the last waypoint
+# torque:    feedforward torque [Nm], one for both or (knee, hip)
+# clip:      clip set points beyond the joint limits instead of raising
+def compile_trajectory(ctrlr, waypoints, times, dt, profile='sine', period=None,
+                       torque=-0.01, kn_limits=KN_LIMITS, hp_limits=HP_LIMITS,
+                       clip=False):
+    pts = np.asarray(waypoints, dtype=float).reshape(-1, 2)
+    times = np.asarray(times, dtype=float)
+    if profile not in PROFILES:
+        raise ValueError(f"unknown profile {profile!r}, one of {', '.join(PROFILES)}")
+    if len(pts) == 0 or len(times) != len(pts):
+        raise ValueError("need one time per waypoint")
+    if times[0] != 0.0 or np.any(np.diff(times) <= 0.0):
+        raise ValueError("waypoint times must start at 0 and increase")
+    if period is not None and period <= times[-1]:
+        raise ValueError("period must be longer than the last waypoint time")
+
+    end = period if period is not None else times[-1]
+    ticks = max(1, int(round(end / dt)))
+    if period is None:
+        ticks += 1 # the last waypoint gets its own tick
+    t = np.arange(ticks) * dt
+
+    foot = interpolate(pts, times, t, profile, period)
+    theta, reachable = ctrlr.ik_batch(foot, return_mask=True)
+    if not reachable.all():
+        i = int(np.argmin(reachable))
+        raise ValueError(f"foot point {tuple(foot[i])} at t = {t[i]:.4f} s is out of reach")
+
+    table = np.empty((ticks, 2, 3))
+    table[:, KNEE, POSITION] = ctrlr.convert_rad_enc_kn(theta[:, 1])
+    table[:, HIP, POSITION] = ctrlr.convert_rad_enc_hp(theta[:, 0])
+
+    for servo, name, limits in ((KNEE, 'knee', kn_limits), (HIP, 'hip', hp_limits)):
+        pos = table[:, servo, POSITION]
+        lo, hi = min(limits), max(limits)
+        if clip:
+            np.clip(pos, lo, hi, out=pos)
+            continue
+        out = (pos < lo) | (pos > hi)
+        if out.any():
+            i = int(np.argmax(out))
+            raise ValueError(f"{name} set point {pos[i]:.4f} rev at t = {t[i]:.4f} s "
+                             f"is outside its limits [{lo}, {hi}]")
+
+    if profile == 'step' or ticks < 2:
+        table[:, :, VELOCITY] = 0.0
+    elif period is not None:
+        pos = table[:, :, POSITION]
+        table[:, :, VELOCITY] = (np.roll(pos, -1, axis=0) - np.roll(pos, 1, axis=0)) / (2 * dt)
+    else:
+        table[:, :, VELOCITY] = np.gradient(table[:, :, POSITION], dt, axis=0)
+        table[-1, :, VELOCITY] = 0.0 # held from there on
+    table[:, :, TORQUE] = torque
+
+    return JointTrajectory(table, dt, period is not None)
+
+
+# the crouch/extend hop: crouch at t = 0, extend at half the period
+def crouch_extend(ctrlr, dt, period=2 * math.pi, profile='sine',
+                  crouch=CROUCH, extend=EXTEND, **kwargs):
+    return compile_trajectory(ctrlr, [crouch, extend], [0.0, period / 2], dt,
+                              profile=profile, period=period, **kwargs)
@@ -2,8 +2,8 @@
 
 # Sinusoidal jumping program for the 2D monopod setup
 
-from ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
-from moteus_ctrlr.src.two_d_leg_class import Leg
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.moteus_ctrlr.two_d_leg_class import Leg
 
 import numpy as np
 import asyncio
@@ -0,0 +1,554 @@
+#!/usr/bin/python3 -B
+
+# Sinusoidal jumping program for the 2D monopod setup
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.ctrlrs.SLIP.virtual_leg_ctrlr import VirtualLegCtrlr
+from monopod.ctrlrs.SLIP.hop_phase import HopPhase, PHASE_TARGETS, phase_commands
+from monopod.ctrlrs.SLIP.raibert_ctrlr import RaibertCtrlr
+from monopod.ctrlrs.traj.traj_compiler import crouch_extend, PROFILES, CROUCH, EXTEND, KNEE, HIP, POSITION, VELOCITY, TORQUE
+from monopod.moteus_ctrlr.two_d_leg_class import Leg, query_servos, MIN_POS_KN, MAX_POS_KN, MIN_POS_HP, MAX_POS_HP
+from monopod.moteus_ctrlr.trajectory_limiter import plan_trajectory
+from monopod.moteus_ctrlr.loop_rate import FixedRateLoop
+from monopod.moteus_ctrlr.cmd_template import PositionTemplate
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+from monopod.moteus_ctrlr.telemetry import Telemetry
+from monopod.moteus_ctrlr.query_profiles import QUERY_PROFILES, make_query_resolution
+from monopod.comms.lcm_async import AsyncLcm, SetpointMailbox
+
+import numpy as np
+import asyncio
+import math
+import moteus
+import time
+import argparse
+import sys
+
+
+
+# TODO: check out and if needed tune/change the motor's internal PID
+#       in order to increase damping!
+
+knee = 1
+hip  = 2
+
+servo_bus_map = {
+    1:[knee], # KNEE
+    2:[hip], # HIP
+}
+
+# set up by setup()
+transport = None
+servos = {}
+tlm = None # per cycle telemetry, only with --log
+
+# NOTE: sin controller: Kp,  dt,   l0,  l1,  animation, ik_mode)
+ctrlr = sinIkHopCtrlr(25.0, 0.015, 0.1, 0.15, False, 'direct')
+ctrlr_x = ctrlr_y = 0
+theta0 = 0 # hip angle
+theta1 = 0 # knee angle
+commands = []
+ctrlr.q[0] = 0 # x ft pos in sim
+ctrlr.q[1] = 0 # y ft pos in sim
+
+# absolute deadline loop pacing, replaces sleeping a fixed time after each cycle
+LOOP_HZ = 50.0
+rate = FixedRateLoop(LOOP_HZ)
+# the torque mode loop closes the leg's impedance on the pi, it needs >= 500 Hz
+SPRING_HZ = 500.0
+# the hop phases are detected from the replies, at 50 Hz a touchdown would be
+# seen tens of ms late
+HOP_HZ = 500.0
+# longest sparse segment of --sparse [s], a waypoint's watchdog_timeout is its
+# segment + Leg.set_trajectory's watchdog (50 ms), so if the pi dies mid
+# segment the moteus faults w/in ~150 ms instead of after seconds
+SPARSE_MAX_SEGMENT = 0.1
+
+
+# create the transport, the pi3hat or a simulated one, the servos on it
+# and the telemetry log if a path is given
+# query: query profile of the servos' replies (moteus_ctrlr/query_profiles.py)
+def setup(sim=False, log=None, query='full'):
+    global transport, servos, tlm
+
+    if sim:
+        transport = SimPi3HatRouter(servo_bus_map = servo_bus_map)
+    else:
+        import moteus_pi3hat
+        transport = moteus_pi3hat.Pi3HatRouter(servo_bus_map = servo_bus_map)
+
+    servos = {
+        servo_id : moteus.Controller(id=servo_id, transport=transport,
+                                     query_resolution=make_query_resolution(query))
+        for servo_id in [1, 2]
+    }
+
+    if log is not None:
+        tlm = Telemetry(log, servo_ids=[knee, hip], servo_bus_map=servo_bus_map)
+
+
+async def main():
+
+    # clearing any faults
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    # update the current pos to the closest one which is consistent with an output pos
+    # and read back all the joints, in one cycle for all servos
+    results = await query_servos(transport, servos, rezero=True, timeout=1.0)
+    result_kn = results[knee]
+    result_hp = results[hip]
+
+    # now we have all the info about the actual monopod's joint positions,
+    # so now we must convert & feedback that info to the ctrlr
+    theta0 = ctrlr.convert_enc_rad_hp(result_hp.values[moteus.Register.POSITION])
+    theta1 = ctrlr.convert_enc_rad_kn(result_kn.values[moteus.Register.POSITION])
+    ctrlr_x, ctrlr_y = ctrlr.fwrd_kinematics(theta0, theta1)
+    ctrlr.q[0] = ctrlr_x
+    ctrlr.q[1] = ctrlr_y
+
+    # solve the ik for every foot set point once, before the loop starts
+    # (the crouch/extend points of the --traj & --hop modes)
+    foot_pts = np.array([CROUCH, EXTEND])
+    theta_pts, reachable = ctrlr.ik_batch(foot_pts, return_mask=True)
+    if not reachable.all():
+        raise ValueError(f"foot point {tuple(foot_pts[np.argmin(reachable)])} is out of reach")
+    hp_pts = ctrlr.convert_rad_enc_hp(theta_pts[:, 0])
+    kn_pts = ctrlr.convert_rad_enc_kn(theta_pts[:, 1])
+    for name, pts, lo, hi in (('knee', kn_pts, MIN_POS_KN, MAX_POS_KN),
+                              ('hip', hp_pts, MIN_POS_HP, MAX_POS_HP)):
+        if np.any((pts < lo) | (pts > hi)):
+            raise ValueError(f"{name} set points {pts} are outside its limits [{lo}, {hi}]")
+
+    # position commands, encoded once, only the position is patched per cycle
+    kn_irl = PositionTemplate(servos[1], ('position',), # KNEE
+        velocity = 0.0,
+        maximum_torque = 1.0,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+    hp_irl = PositionTemplate(servos[2], ('position',), # HIP
+        velocity = 0.0,
+        maximum_torque = 1.0,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+
+
+    while True:
+        # goal positions, crouch while sin(t) > 0, extend otherwise
+        pt = 0 if np.sin(time.time()) > 0 else 1
+        hp_pos = hp_pts[pt]
+        kn_pos = kn_pts[pt]
+
+        commands_irl = [
+            kn_irl.make(kn_pos), # KNEE
+            hp_irl.make(hp_pos), # HIP
+        ]
+
+        results = await rate.io(transport.cycle(commands_irl))
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(),
+                          [(kn_pos, 0.0, -0.01),
+                           (hp_pos, 0.0, -0.01)],
+                          results)
+
+        # NOTE: it is possible to not receive responses from all servos
+        #       for which a query was requested
+
+
+        # We will run a cycle every 20ms. By default, each servo has
+        # a watchdog timeout, where if no CAN command is received for
+        # 100mc the controller will enter a latched fault state
+        await rate.sleep()
+
+
+# remote:    take foot set points over lcm (comms/lcm_async.py), they override
+#            the crouch/extend positions from the cycle they arrive in
+# pipelined: compute the commands of the next cycle while the transfer of this
+#            one is in flight, for the time they will be sent (a period later),
+#            see moteus_ctrlr/loop_rate.py
+async def main_bare(remote=False, pipelined=False):
+
+    # clearing any faults
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    setpoints = None
+    setpoint = None
+    if remote:
+        lc = AsyncLcm()
+        setpoints = SetpointMailbox(lc)
+        lc.start()
+
+    # position commands, encoded once, only the position is patched per cycle
+    # NOTE: pipelined, the next commands are made while the last are in
+    #       flight, hence two buffers
+    kn_cmd = PositionTemplate(servos[1], ('position',), # KNEE
+        buffers = 2 if pipelined else 1,
+        velocity = 2.0,
+        maximum_torque = 0.5,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+    hp_cmd = PositionTemplate(servos[2], ('position',), # HIP
+        buffers = 2 if pipelined else 1,
+        velocity = 2.0,
+        maximum_torque = 0.5,
+        stop_position = math.nan,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+
+    # goal positions for the time t the commands are sent
+    def goal(t):
+        nonlocal setpoint
+        wave = np.sin(t)
+        if (wave > 0):
+            # crouch
+            knee_pos = -0.175
+            hip_pos = -0.065
+        else:
+            # extend
+            knee_pos = -0.49
+            hip_pos = -0.244
+
+        # newest remote set point, received while waiting for this cycle
+        if setpoints is not None:
+            sp = setpoints.take()
+            if sp is not None:
+                setpoint = sp if sp['enabled'] else None
+        if setpoint is not None:
+            theta0, theta1 = ctrlr.ik_direct(*setpoint['foot'])
+            hip_pos = ctrlr.convert_rad_enc_hp(theta0)
+            knee_pos = ctrlr.convert_rad_enc_kn(theta1)
+        return knee_pos, hip_pos
+
+    if pipelined:
+        t_cmds = rate.clock()
+        knee_pos, hip_pos = goal(time.time())
+        commands_irl = [kn_cmd.make(knee_pos), hp_cmd.make(hip_pos)]
+
+    while True:
+        if pipelined:
+            # start this cycle's transfer, then compute the next cycle
+            sent = [(knee_pos, 2.0, -0.01), (hip_pos, 2.0, -0.01)]
+            inflight = await rate.start_io(transport.cycle(commands_irl), stamp=t_cmds)
+            t_cmds = rate.clock()
+            knee_pos, hip_pos = goal(time.time() + rate.period)
+            commands_irl = [
+                kn_cmd.make(knee_pos), # KNEE
+                hp_cmd.make(hip_pos), # HIP
+            ]
+            results = await rate.io(inflight)
+        else:
+            t_cmds = rate.clock()
+            knee_pos, hip_pos = goal(time.time())
+
+            # irl position commands
+            commands_irl = [
+                kn_cmd.make(knee_pos), # KNEE
+                hp_cmd.make(hip_pos), # HIP
+            ]
+            sent = [(knee_pos, 2.0, -0.01), (hip_pos, 2.0, -0.01)]
+            results = await rate.io(transport.cycle(commands_irl), stamp=t_cmds)
+
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(), sent, results)
+
+        # NOTE: it is possible to not receive responses from all servos
+        #       for which a query was requested
+
+
+        # We will run a cycle every 20ms. By default, each servo has
+        # a watchdog timeout, where if no CAN command is received for
+        # 100mc the controller will enter a latched fault state
+        await rate.sleep()
+
+
+# virtual spring leg in torque mode (ctrlrs/SLIP/virtual_leg_ctrlr.py): every
+# cycle maps the measured joint angles & rates to the hip/knee torques of a
+# radial spring-damper between the hip and the foot and sends them as
+# feedforward_torque w/ the servos' position loop off (kp_scale = kd_scale = 0)
+async def main_spring():
+
+    # clearing any faults
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    leg = VirtualLegCtrlr(k=300.0, b=4.0, r0=0.2, max_torque=1.0)
+    # NOTE: a stale torque is not held when the loop stops, the watchdog
+    #       latches after 50 ms w/o a command
+    kn_cmd, hp_cmd = leg.torque_templates(servos[knee], servos[hip],
+                                          watchdog_timeout=0.05)
+
+    results = await query_servos(transport, servos, timeout=1.0)
+    kn_pos = results[knee].values[moteus.Register.POSITION]
+    hp_pos = results[hip].values[moteus.Register.POSITION]
+    kn_vel = hp_vel = 0.0
+
+    while True:
+        t_cmds = rate.clock()
+        hp_torque, kn_torque = leg.update(hp_pos, kn_pos, hp_vel, kn_vel)
+        commands_irl = [
+            kn_cmd.make(kn_torque), # KNEE
+            hp_cmd.make(hp_torque), # HIP
+        ]
+        results = await rate.io(transport.cycle(commands_irl), stamp=t_cmds)
+
+        # keep the last measurement of a servo that did not reply
+        for result in results:
+            values = result.values
+            if result.id == knee:
+                kn_pos = values.get(moteus.Register.POSITION, kn_pos)
+                kn_vel = values.get(moteus.Register.VELOCITY, kn_vel)
+            elif result.id == hip:
+                hp_pos = values.get(moteus.Register.POSITION, hp_pos)
+                hp_vel = values.get(moteus.Register.VELOCITY, hp_vel)
+
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(),
+                          [(math.nan, 0.0, kn_torque), (math.nan, 0.0, hp_torque)],
+                          results)
+
+        await rate.sleep()
+
+
+# hop cycle state machine (ctrlrs/SLIP/hop_phase.py): the phase (flight,
+# touchdown, compression, thrust, liftoff) follows the knee torque & velocity
+# of the replies, every phase has its own commands, encoded before the loop
+# NOTE: needs the torque in the replies, query profile full or diag
+async def main_hop():
+
+    # clearing any faults
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    # swing_ticks: the leg swings out to the landing pose for ~50 ms after liftoff
+    hop = HopPhase(contact_torque=0.3, release_torque=0.15, debounce=2,
+                   swing_ticks=int(0.05 * rate.rate_hz))
+    phase_cmds = phase_commands(servos[knee], servos[hip], ctrlr, PHASE_TARGETS)
+    phase_sent = []
+    for target in PHASE_TARGETS:
+        theta0, theta1 = ctrlr.ik_direct(*target['foot'])
+        phase_sent.append([(ctrlr.convert_rad_enc_kn(theta1), 0.0, -0.01),
+                           (ctrlr.convert_rad_enc_hp(theta0), 0.0, -0.01)])
+
+    while True:
+        t_cmds = rate.clock()
+        phase = hop.phase
+        results = await rate.io(transport.cycle(phase_cmds[phase]), stamp=t_cmds)
+
+        kn_torque = kn_vel = math.nan
+        for result in results:
+            if result.id == knee:
+                kn_torque = result.values.get(moteus.Register.TORQUE, math.nan)
+                kn_vel = result.values.get(moteus.Register.VELOCITY, math.nan)
+        hop.update(kn_torque, kn_vel)
+
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(), phase_sent[phase], results)
+
+        await rate.sleep()
+
+
+# Raibert style hopping (ctrlrs/SLIP/raibert_ctrlr.py) on the hop phases of
+# main_hop: the set points come from the hop height & foot placement control
+# instead of the fixed foot points, only the gains are per phase (PHASE_TARGETS)
+# h_des: target apex of the hip above the ground [m]
+async def main_raibert(h_des=0.3):
+
+    # clearing any faults
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    hop = HopPhase(contact_torque=0.3, release_torque=0.15, debounce=2,
+                   swing_ticks=int(0.05 * rate.rate_hz))
+    raibert = RaibertCtrlr(ctrlr, h_des=h_des, mass=0.95, k=300.0, r0=0.2,
+                           dt=rate.period)
+
+    # position commands per phase, w/ the gains of the phase
+    phase_tmpls = []
+    for target in PHASE_TARGETS:
+        phase_tmpls.append([PositionTemplate(servos[servo_id], ('position',),
+            velocity = 0.0,
+            kp_scale = target['kp_scale'],
+            maximum_torque = target['maximum_torque'],
+            stop_position = math.nan,
+            feedforward_torque = -0.01,
+            watchdog_timeout = math.nan,
+            query = True) for servo_id in [knee, hip]])
+
+    results = await query_servos(transport, servos, timeout=1.0)
+    kn_pos = results[knee].values[moteus.Register.POSITION]
+    hp_pos = results[hip].values[moteus.Register.POSITION]
+
+    while True:
+        t_cmds = rate.clock()
+        theta0 = ctrlr.convert_enc_rad_hp(hp_pos)
+        theta1 = ctrlr.convert_enc_rad_kn(kn_pos)
+        phase = hop.phase
+        knee_pos, hip_pos = raibert.update(phase, theta0, theta1)
+        kn_cmd, hp_cmd = phase_tmpls[phase]
+        commands_irl = [
+            kn_cmd.make(knee_pos), # KNEE
+            hp_cmd.make(hip_pos), # HIP
+        ]
+        results = await rate.io(transport.cycle(commands_irl), stamp=t_cmds)
+
+        # keep the last measurement of a servo that did not reply
+        kn_torque = kn_vel = math.nan
+        for result in results:
+            values = result.values
+            if result.id == knee:
+                kn_pos = values.get(moteus.Register.POSITION, kn_pos)
+                kn_torque = values.get(moteus.Register.TORQUE, math.nan)
+                kn_vel = values.get(moteus.Register.VELOCITY, math.nan)
+            elif result.id == hip:
+                hp_pos = values.get(moteus.Register.POSITION, hp_pos)
+        hop.update(kn_torque, kn_vel)
+
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(),
+                          [(knee_pos, 0.0, -0.01), (hip_pos, 0.0, -0.01)],
+                          results)
+
+        await rate.sleep()
+
+
+# crouch/extend from a compiled trajectory (ctrlrs/traj/traj_compiler.py):
+# the foot path, ik, encoder conversion and limit checks run once before the
+# loop, every cycle only looks up the set points of its tick
+# profile: step (the crouch/extend toggle of main_bare), linear, sine or spline
+# sparse: plan tolerance [rev], send waypoints for the moteus' trajectory
+#         limiter (moteus_ctrlr/trajectory_limiter.py) instead of every tick
+async def main_traj(profile='sine', period=2 * math.pi, sparse=None, query='full'):
+
+    # clearing any faults
+    await transport.cycle([x.make_stop() for x in servos.values()])
+
+    traj = crouch_extend(ctrlr, rate.period, period=period, profile=profile)
+    if sparse is not None:
+        await main_traj_sparse(traj, sparse, query)
+        return
+
+    # position, velocity & feedforward torque are patched per cycle
+    kn_cmd, hp_cmd = [PositionTemplate(servos[servo_id], ('position', 'velocity', 'feedforward_torque'),
+        maximum_torque = 0.5,
+        stop_position = math.nan,
+        watchdog_timeout = math.nan,
+        query = True) for servo_id in [knee, hip]]
+
+    t0 = rate.clock()
+    while True:
+        t_cmds = rate.clock()
+        sp = traj.at(t_cmds - t0)
+        kn = sp[KNEE]
+        hp = sp[HIP]
+        commands_irl = [
+            kn_cmd.make(kn[POSITION], kn[VELOCITY], kn[TORQUE]), # KNEE
+            hp_cmd.make(hp[POSITION], hp[VELOCITY], hp[TORQUE]), # HIP
+        ]
+        results = await rate.io(transport.cycle(commands_irl), stamp=t_cmds)
+
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(),
+                          [(kn[POSITION], kn[VELOCITY], kn[TORQUE]),
+                           (hp[POSITION], hp[VELOCITY], hp[TORQUE])],
+                          results)
+
+        await rate.sleep()
+
+
+async def main_traj_sparse(traj, tolerance, query):
+    leg = Leg(knee, hip, transport=transport, query=query)
+    max_ticks = max(1, int(SPARSE_MAX_SEGMENT / traj.dt))
+    plan = plan_trajectory(traj, tolerance=tolerance, min_ticks=min(4, max_ticks),
+                           max_ticks=max_ticks)
+    leg.set_trajectory(plan, max_torq=0.5)
+    print(f"{plan.commands_per_period()} commands per {len(traj)} ticks, "
+          f"{plan.sparse_ticks / len(traj):.0%} of the ticks on the moteus' limiter")
+
+    t0 = rate.clock()
+    while True:
+        t_cmds = rate.clock()
+        results = await rate.io(leg.step_trajectory(t_cmds - t0), stamp=t_cmds)
+        if results is None and isinstance(transport, SimPi3HatRouter):
+            # nothing on the bus, the sim still has to run to this tick, in
+            # one long step it would integrate a whole segment in one call
+            await rate.io(transport.cycle([]), stamp=t_cmds)
+
+        # every cycle, a cycle w/o a command on the bus is logged w/ the
+        # table's set points & no replies (reply 0)
+        if tlm is not None:
+            sp = traj.at(t_cmds - t0)
+            tlm.log_cycle(time.monotonic(),
+                          [tuple(sp[KNEE]), tuple(sp[HIP])],
+                          results if results is not None else [])
+
+        await rate.sleep()
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sim', action='store_true',
+                        help='run against the simulated pi3hat transport')
+    parser.add_argument('--log', metavar='PATH',
+                        help='append per cycle telemetry to PATH')
+    parser.add_argument('--lcm', action='store_true',
+                        help='take foot set points from the MONOPOD_SETPOINT lcm channel')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='compute the next cycle while the transfer of this one is in flight')
+    # loop modes, one at a time, w/o any the default crouch/extend loop
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--spring', action='store_true',
+                      help='virtual spring leg in torque mode instead of the crouch/extend positions')
+    mode.add_argument('--hop', action='store_true',
+                      help='hop phase state machine on the knee torque & velocity replies')
+    mode.add_argument('--traj', choices=PROFILES,
+                      help='crouch/extend from a trajectory compiled w/ this profile')
+    mode.add_argument('--raibert', type=float, metavar='HEIGHT',
+                      help='raibert hopping on the hop phases, to an apex of HEIGHT [m]')
+    parser.add_argument('--sparse', type=float, metavar='TOL',
+                        help='w/ --traj: send waypoints the moteus interpolates, streaming only '
+                             'where its path would be more than TOL [rev] off the table')
+    parser.add_argument('--rate', type=float, default=None,
+                        help=f'loop rate [Hz], default {LOOP_HZ:g}, {SPRING_HZ:g} w/ --spring, '
+                             f'{HOP_HZ:g} w/ --hop')
+    parser.add_argument('--query', default='full', choices=[q for q in QUERY_PROFILES if q != 'none'],
+                        help='registers the servos reply with, see moteus_ctrlr/query_profiles.py')
+    args = parser.parse_args()
+    hopping = args.hop or args.raibert is not None
+    if hopping and args.query not in ('full', 'diag'):
+        parser.error('--hop/--raibert need the torque in the replies, --query full or diag')
+    if args.sparse is not None and args.traj is None:
+        parser.error('--sparse plays a --traj trajectory')
+    default_mode = not (args.spring or hopping or args.traj is not None)
+    if (args.pipeline or args.lcm) and not default_mode:
+        parser.error('--pipeline/--lcm only apply to the default crouch/extend loop, '
+                     'not w/ --spring/--hop/--traj/--raibert')
+
+    global rate
+    if args.rate is None:
+        args.rate = SPRING_HZ if args.spring else (HOP_HZ if hopping else LOOP_HZ)
+    rate = FixedRateLoop(args.rate)
+    setup(args.sim, args.log, args.query)
+    try:
+        if args.spring:
+            asyncio.run(main_spring())
+        elif args.traj is not None:
+            asyncio.run(main_traj(args.traj, sparse=args.sparse, query=args.query))
+        elif args.raibert is not None:
+            asyncio.run(main_raibert(args.raibert))
+        elif args.hop:
+            asyncio.run(main_hop())
+        else:
+            asyncio.run(main_bare(args.lcm, args.pipeline))
+    except KeyboardInterrupt:
+        print(rate.summary())
+    finally:
+        if tlm is not None:
+            tlm.close()
+            print(f"telemetry: {tlm.written} cycles written, {tlm.dropped} dropped")
+
+
+if __name__ == "__main__":
+    run()
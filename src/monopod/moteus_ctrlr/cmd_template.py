@@ -0,0 +1,88 @@
+# Pre-encoded position mode commands
+# make_position rebuilds the whole CAN frame every call (register combiner,
+# a BytesIO, the query format, a new moteus.Command), although in the control
+# loops only one or two registers change from tick to tick. A PositionTemplate
+# encodes the frame once per servo with make_position and afterwards only
+# packs the changing registers (float32) into that frame at their offsets.
+#
+# usage:
+#   tmpl = PositionTemplate(servos[1], ('position',),
+#                           velocity = 0.0,
+#                           maximum_torque = 1.0,
+#                           stop_position = math.nan,
+#                           feedforward_torque = -0.01,
+#                           watchdog_timeout = math.nan,
+#                           query = True)
+#   ...
+#   await transport.cycle([tmpl.make(kn_pos), ...])
+#
+# NOTE: make returns the same moteus.Command every call with new data, so
+#       build the commands of a cycle right before sending them, or pass
+#       buffers=2 when the next commands are made while a cycle is in flight
+#       (pipelined loop), make then alternates between two commands
+# NOTE: the changing registers must have the float32 (moteus.multiplex.F32)
+#       resolution, the default of moteus.Controller
+#
+
+import copy
+import math
+import struct
+
+import moteus
+
+
+F32 = struct.Struct('<f')
+
+# two values that do not show up in a frame by chance, used to find where a
+# register is encoded
+PROBES = (1234.5677490234375, -765.4320068359375)
+
+
+class PositionTemplate:
+    # controller: moteus.Controller the commands are for
+    # fields:     names of the make_position arguments that change per tick,
+    #             given to make() in this order
+    # buffers:    number of commands make() rotates through
+    # constants:  the other make_position arguments, encoded once
+    def __init__(self, controller, fields=('position', 'stop_position'), buffers=1, **constants):
+        self.controller = controller
+        self.fields = tuple(fields)
+        for name in self.fields:
+            if name in constants:
+                raise ValueError(f"{name} is given as a constant and as a field")
+            resolution = getattr(controller.position_resolution, name, None)
+            if resolution != moteus.multiplex.F32:
+                raise ValueError(f"{name} is not encoded as float32 "
+                                 f"(resolution {resolution}), it can not be patched")
+        self.constants = constants
+
+        # locate every field: encode it w/ both probes, the others held at 0
+        self.offsets = []
+        for name in self.fields:
+            frames = []
+            for probe in PROBES:
+                values = {field : 0.0 for field in self.fields}
+                values[name] = probe
+                frames.append(controller.make_position(**constants, **values).data)
+            offset = frames[0].find(F32.pack(PROBES[0]))
+            if (offset < 0 or frames[0].count(F32.pack(PROBES[0])) != 1 or
+                frames[1][offset:offset + 4] != F32.pack(PROBES[1])):
+                raise ValueError(f"could not locate {name} in the position frame")
+            self.offsets.append(offset)
+
+        self.command = controller.make_position(
+            **constants, **{field : math.nan for field in self.fields})
+        self.buf = bytearray(self.command.data)
+        self.commands = [self.command] + [copy.copy(self.command) for _ in range(buffers - 1)]
+        self.next = 0
+
+
+    # the command w/ the fields set to values, in the order of self.fields
+    def make(self, *values):
+        buf = self.buf
+        for offset, value in zip(self.offsets, values):
+            F32.pack_into(buf, offset, value)
+        command = self.commands[self.next]
+        self.next = (self.next + 1) % len(self.commands)
+        command.data = bytes(buf)
+        return command
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# Fixed-rate loop scheduler for the asyncio control loops
+#
+# Replaces the 'await asyncio.sleep(0.02)' pacing after transport.cycle,
+# whose real period is 20ms + compute + I/O and drifts. Each cycle targets
+# an absolute deadline on the monotonic clock, so overruns are compensated
+# instead of accumulated. Per cycle period, compute and I/O time and wake-up
+# jitter are recorded in a preallocated ring buffer.
+#
+# USAGE:
+#   rate = FixedRateLoop(400.0)
+#   while True:
+#       ... compute commands ...
+#       results = await rate.io(transport.cycle(commands))
+#       await rate.sleep()
+#
+# pipelined, the commands of the next cycle are computed while the transfer
+# of this cycle is in flight:
+#   while True:
+#       inflight = await rate.start_io(transport.cycle(commands), stamp=t_cmds)
+#       t_cmds = rate.clock()
+#       ... compute the next commands, for the time they will be sent ...
+#       results = await rate.io(inflight)
+#       await rate.sleep()
+#
+# stamp is the time the commands' inputs were sampled, the time from it to
+# the end of the transfer that carries them is recorded as the latency.
+# Pipelining cuts a cycle from compute + I/O to max(compute, I/O), which
+# allows a higher loop rate, and in exchange every command is up to a period
+# older when it is sent.
+#
+
+import asyncio
+import math
+import time
+
+import numpy as np
+
+
+# columns of the stats ring buffer
+JITTER  = 0 # wake-up time - deadline
+PERIOD  = 1 # time between consecutive wake-ups
+COMPUTE = 2 # busy time of the cycle outside of rate.io()
+IO      = 3 # time spent awaiting rate.io()
+FLIGHT  = 4 # time from the start to the end of the cycle's I/O
+LATENCY = 5 # end of the I/O - stamp of the commands sent (nan w/o stamp)
+
+
+class FixedRateLoop:
+    # rate_hz:  target loop rate
+    # history:  number of cycles kept in the stats ring buffer
+    # spin:     the last part [s] of each wait is busy-waited, asyncio.sleep
+    #           alone wakes up late by up to a scheduler tick
+    # catch_up: after an overrun, run the missed cycles back to back (True)
+    #           or skip them and re-anchor on the next deadline (False)
+    def __init__(self, rate_hz=50.0, history=4096, spin=0.0005, catch_up=False,
+                 clock=time.monotonic):
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.spin = spin
+        self.catch_up = catch_up
+        self.clock = clock
+
+        self.stats = np.zeros((history, 6))
+        self.history = history
+        self.cycle = 0   # number of completed cycles
+        self.missed = 0  # number of missed deadlines
+
+        self._deadline = None
+        self._missed_until = -math.inf # last deadline counted in missed
+        self._t_start = None
+        self._io = 0.0
+        self._flight = 0.0
+        self._latency = math.nan
+        self._inflight = None # (task, start time, stamp) of start_io
+
+
+    # anchor the schedule on now, called implicitly on first use
+    def start(self):
+        self._t_start = self.clock()
+        self._deadline = self._t_start
+        self._io = 0.0
+
+
+    # await an I/O operation (e.g. transport.cycle) and account its time,
+    # awaitable can be the task returned by start_io
+    # stamp: time the inputs of the commands sent were sampled
+    async def io(self, awaitable, stamp=None):
+        if self._t_start is None:
+            self.start()
+        t0 = self.clock()
+        if self._inflight is not None and awaitable is self._inflight[0]:
+            awaitable, t0_flight, stamp = self._inflight
+            self._inflight = None
+        else:
+            t0_flight = t0
+        result = await awaitable
+        t_done = self.clock()
+        self._io += t_done - t0
+        self._flight += t_done - t0_flight
+        if stamp is not None:
+            self._latency = t_done - stamp
+        return result
+
+
+    # start an I/O operation w/o waiting for it to finish, returns a task to
+    # await w/ rate.io() later in the cycle, see pipelined USAGE above
+    async def start_io(self, awaitable, stamp=None):
+        if self._t_start is None:
+            self.start()
+        task = asyncio.ensure_future(awaitable)
+        self._inflight = (task, self.clock(), stamp)
+        # let the transfer get going before the caller's compute
+        await asyncio.sleep(0)
+        return task
+
+
+    # wait for the start of the next cycle
+    async def sleep(self):
+        if self._t_start is None:
+            self.start()
+
+        now = self.clock()
+        busy = now - self._t_start
+        self._deadline += self.period
+
+        if now > self._deadline:
+            late = int((now - self._deadline) / self.period) + 1
+            # catching up, the cycles run back to back on deadlines that an
+            # earlier cycle of the same overrun already counted
+            last = self._deadline + (late - 1) * self.period
+            if self._missed_until < self._deadline:
+                self.missed += late
+            elif last > self._missed_until:
+                self.missed += int(round((last - self._missed_until) / self.period))
+            self._missed_until = max(self._missed_until, last)
+            if not self.catch_up:
+                self._deadline += late * self.period
+
+        remaining = self._deadline - now
+        if remaining > self.spin:
+            await asyncio.sleep(remaining - self.spin)
+        while self.clock() < self._deadline:
+            pass
+
+        t_wake = self.clock()
+        row = self.stats[self.cycle % self.history]
+        row[JITTER] = t_wake - self._deadline
+        row[PERIOD] = t_wake - self._t_start
+        row[COMPUTE] = busy - self._io
+        row[IO] = self._io
+        row[FLIGHT] = self._flight
+        row[LATENCY] = self._latency
+
+        self.cycle += 1
+        self._t_start = t_wake
+        self._io = 0.0
+        self._flight = 0.0
+        self._latency = math.nan
+
+
+    # run step(self) at the loop rate, forever or for the given number of cycles
+    async def run(self, step, cycles=None):
+        while cycles is None or self.cycle < cycles:
+            await step(self)
+            await self.sleep()
+
+
+    # stats over the cycles in the ring buffer, times in seconds
+    def report(self):
+        n = min(self.cycle, self.history)
+        if n == 0:
+            return {"cycles": 0, "missed": self.missed}
+        data = self.stats[:n]
+        jitter = np.abs(data[:, JITTER])
+        report = {
+            "cycles": self.cycle,
+            "missed": self.missed,
+            "rate_hz": self.rate_hz,
+            "period_mean": float(data[:, PERIOD].mean()),
+            "jitter_p50": float(np.percentile(jitter, 50)),
+            "jitter_p99": float(np.percentile(jitter, 99)),
+            "jitter_max": float(jitter.max()),
+        }
+        for name, col in [("compute", COMPUTE), ("io", IO), ("flight", FLIGHT)]:
+            report[name + "_p50"] = float(np.percentile(data[:, col], 50))
+            report[name + "_p99"] = float(np.percentile(data[:, col], 99))
+            report[name + "_max"] = float(data[:, col].max())
+        latency = data[:, LATENCY]
+        latency = latency[np.isfinite(latency)]
+        if len(latency):
+            report["latency_p50"] = float(np.percentile(latency, 50))
+            report["latency_p99"] = float(np.percentile(latency, 99))
+            report["latency_max"] = float(latency.max())
+        return report
+
+
+    def summary(self):
+        r = self.report()
+        if r["cycles"] == 0:
+            return "no cycles"
+        ms = 1e3
+        return (f"{r['cycles']} cycles @ {self.rate_hz:g} Hz, {r['missed']} missed deadlines\n"
+                f"period  mean {r['period_mean'] * ms:.3f} ms\n"
+                f"jitter  p50 {r['jitter_p50'] * ms:.3f}  p99 {r['jitter_p99'] * ms:.3f}"
+                f"  max {r['jitter_max'] * ms:.3f} ms\n"
+                f"compute p50 {r['compute_p50'] * ms:.3f}  p99 {r['compute_p99'] * ms:.3f}"
+                f"  max {r['compute_max'] * ms:.3f} ms\n"
+                f"io      p50 {r['io_p50'] * ms:.3f}  p99 {r['io_p99'] * ms:.3f}"
+                f"  max {r['io_max'] * ms:.3f} ms" +
+                (f"\nlatency p50 {r['latency_p50'] * ms:.3f}  p99 {r['latency_p99'] * ms:.3f}"
+                 f"  max {r['latency_max'] * ms:.3f} ms" if "latency_p50" in r else ""))
+
+
+
+# check of the missed deadline count: one cycle stalls for STALL periods on a
+# simulated clock, both w/ and w/o catch_up every deadline it overran is
+# counted once
+# USAGE: python3 -m monopod.moteus_ctrlr.loop_rate
+if __name__ == "__main__":
+    import sys
+
+    STALL = 5.5 # periods
+
+    # time only moves when read, by a step, the busy wait spins on it
+    class SimClock:
+        def __init__(self, step=1e-5):
+            self.t = 0.0
+            self.step = step
+
+        def __call__(self):
+            self.t += self.step
+            return self.t
+
+    failed = False
+    for catch_up in (False, True):
+        clock = SimClock()
+        rate = FixedRateLoop(100.0, spin=1.0, catch_up=catch_up, clock=clock)
+
+        async def step(rate):
+            if rate.cycle == 3:
+                clock.t += STALL * rate.period
+
+        asyncio.run(rate.run(step, cycles=20))
+        ok = rate.missed == int(STALL)
+        failed |= not ok
+        print(f"catch_up={catch_up!s:<5} missed {rate.missed}, expected {int(STALL)}"
+              f"{'' if ok else '  FAIL'}")
+    sys.exit(1 if failed else 0)
+
@@ -0,0 +1,84 @@
+# Named query profiles of the leg
+# A command sent w/ query=True asks the moteus for the registers of the
+# controller's QueryResolution, by default mode, position, velocity, torque
+# (float32) plus voltage, temperature and fault. Every register in the reply
+# is bus time in every cycle, so the leg asks only for what the loop uses:
+#
+#   full     the moteus default, what the leg used to ask for
+#   control  position & velocity as int16, all the control loop needs
+#   diag     control + mode, torque, voltage, temperature & fault
+#   none     no reply at all
+#
+# The int16 scaling limits the range of the replies:
+#   position 0.0001 rev   -> +-3.2767 rev
+#   velocity 0.00025 rev/s -> +-8.19 rev/s
+# which covers the leg joints (position limits within +-0.65 rev).
+#
+# NOTE: moteus.Controller precomputes its query frame from the query_resolution
+#       given at construction (query_override rebuilds it every call), so there
+#       is one Controller per servo and profile, see make_profile_servos
+#
+
+import moteus
+import moteus.multiplex as mp
+
+
+IGNORE = mp.IGNORE
+INT8 = mp.INT8
+INT16 = mp.INT16
+F32 = mp.F32
+
+# registers of moteus.QueryResolution that are not ignored, per profile
+QUERY_PROFILES = {
+    'full': None, # moteus.QueryResolution defaults
+    'control': {
+        'position': INT16,
+        'velocity': INT16,
+    },
+    'diag': {
+        'mode': INT8,
+        'position': INT16,
+        'velocity': INT16,
+        'torque': INT16,
+        'voltage': INT8,
+        'temperature': INT8,
+        'fault': INT8,
+    },
+    'none': {},
+}
+
+# the registers of the moteus query frame, all set to IGNORE for a profile
+QUERY_REGISTERS = [
+    'mode', 'position', 'velocity', 'torque', 'q_current', 'd_current',
+    'abs_position', 'power', 'motor_temperature', 'trajectory_complete',
+    'rezero_state', 'home_state', 'voltage', 'temperature', 'fault',
+    'aux1_gpio', 'aux2_gpio',
+    'aux1_pwm_input_period_us', 'aux1_pwm_input_duty_cycle',
+    'aux2_pwm_input_period_us', 'aux2_pwm_input_duty_cycle',
+]
+
+
+def make_query_resolution(profile):
+    if profile not in QUERY_PROFILES:
+        raise ValueError(f"unknown query profile {profile!r}, "
+                         f"one of {', '.join(QUERY_PROFILES)}")
+    qr = moteus.QueryResolution()
+    registers = QUERY_PROFILES[profile]
+    if registers is None:
+        return qr
+    for name in QUERY_REGISTERS:
+        if hasattr(qr, name):
+            setattr(qr, name, registers.get(name, IGNORE))
+    return qr
+
+
+# {profile: {servo_id: moteus.Controller}} w/ the query resolution of each profile
+def make_profile_servos(servo_ids, transport, profiles=QUERY_PROFILES):
+    return {
+        profile : {
+            servo_id : moteus.Controller(id=servo_id, transport=transport,
+                                         query_resolution=make_query_resolution(profile))
+            for servo_id in servo_ids
+        }
+        for profile in profiles
+    }
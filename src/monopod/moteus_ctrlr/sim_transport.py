@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+
+# Simulated stand-in for moteus_pi3hat.Pi3HatRouter
+#
+# Implements cycle(commands) on top of a simple simulated joint per servo
+# (inertia, damping, torque limit) so Leg, jumping.py and the benchmarks can
+# run at full rate without the pi and the CAN hardware. Commands are the
+# regular moteus.Controller make_* commands, their register frames are decoded
+# and the replies are encoded back into frames that the command's own parser
+# turns into moteus.Result objects, exactly like on the real bus.
+#
+# Position mode semantics follow the moteus reference manual:
+#   - position NaN keeps the current control position
+#   - the control position advances at the commanded velocity
+#   - stop_position, when finite, stops the control position when reached
+#   - torque = kp*kp_scale*err + kd*kd_scale*vel_err + feedforward_torque,
+#     clamped to maximum_torque
+#   - no command within the watchdog timeout -> TIMEOUT mode, cleared by stop
+#   - velocity_limit / accel_limit, when finite, slew the control position &
+#     velocity to the commanded ones (trajectory_limiter.py) instead of
+#     jumping, trajectory_complete reports the arrival
+#
+# NOTE: the sim clock follows the wall (monotonic) clock by default, pass
+#       fixed_dt to advance a fixed time per cycle for repeatable runs
+#
+
+import asyncio
+import math
+import random
+import struct
+import time
+
+import moteus
+
+try:
+    from .trajectory_limiter import TrajectoryLimiter, LIMITER_DT
+except ImportError:
+    from trajectory_limiter import TrajectoryLimiter, LIMITER_DT
+
+
+# multiplex protocol subframe codes
+WRITE_BASE = 0x00
+READ_BASE  = 0x10
+REPLY_BASE = 0x20
+NOP        = 0x50
+
+INT8  = 0
+INT16 = 1
+INT32 = 2
+F32   = 3
+
+TYPES = [struct.Struct('<b'), struct.Struct('<h'), struct.Struct('<i'), struct.Struct('<f')]
+TYPES_MAX = [127, 32767, 2147483647]
+TYPES_MIN = [-128, -32768, -2147483648]
+
+# int8, int16, int32 scale of the registers that are not plain integers
+POSITION_SCALE = (0.01, 0.0001, 0.00001)
+VELOCITY_SCALE = (0.1, 0.00025, 0.00001)
+ACCEL_SCALE    = (0.05, 0.001, 0.00001)
+TORQUE_SCALE   = (0.5, 0.01, 0.001)
+PWM_SCALE      = (1.0 / 127.0, 1.0 / 32767.0, 1.0 / 2147483647.0)
+TIME_SCALE     = (0.01, 0.001, 0.000001)
+VOLTAGE_SCALE  = (0.5, 0.1, 0.001)
+TEMP_SCALE     = (1.0, 0.1, 0.001)
+CURRENT_SCALE  = (1.0, 0.1, 0.001)
+POWER_SCALE    = (10.0, 0.05, 0.0001)
+
+REG = moteus.Register
+SCALES = {
+    # measured
+    int(REG.POSITION): POSITION_SCALE,
+    int(REG.VELOCITY): VELOCITY_SCALE,
+    int(REG.TORQUE): TORQUE_SCALE,
+    int(REG.Q_CURRENT): CURRENT_SCALE,
+    int(REG.D_CURRENT): CURRENT_SCALE,
+    0x006: POSITION_SCALE, # abs position
+    0x007: POWER_SCALE,    # power
+    0x00a: TEMP_SCALE,     # motor temperature
+    int(REG.VOLTAGE): VOLTAGE_SCALE,
+    int(REG.TEMPERATURE): TEMP_SCALE,
+    # position mode command
+    0x020: POSITION_SCALE, # position
+    0x021: VELOCITY_SCALE, # velocity
+    0x022: TORQUE_SCALE,   # feedforward torque
+    0x023: PWM_SCALE,      # kp scale
+    0x024: PWM_SCALE,      # kd scale
+    0x025: TORQUE_SCALE,   # maximum torque
+    0x026: POSITION_SCALE, # stop position
+    0x027: TIME_SCALE,     # watchdog timeout
+    0x028: VELOCITY_SCALE, # velocity limit
+    0x029: ACCEL_SCALE,    # accel limit
+    0x130: POSITION_SCALE, # rezero / set output nearest
+}
+
+MODE_STOPPED  = 0
+MODE_POSITION = 10
+MODE_TIMEOUT  = 11
+
+
+def _read_varuint(data, offset):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if (byte & 0x80) == 0:
+            return result, offset
+
+
+def _write_varuint(buf, value):
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            buf.append(byte | 0x80)
+        else:
+            buf.append(byte)
+            return
+
+
+def _decode(register, resolution, raw):
+    if resolution == F32:
+        return raw
+    scale = SCALES.get(register)
+    if scale is None:
+        return raw
+    if raw == TYPES_MIN[resolution]:
+        return math.nan
+    return raw * scale[resolution]
+
+
+def _encode(register, resolution, value):
+    if resolution == F32:
+        return value
+    scale = SCALES.get(register)
+    if scale is None:
+        return int(value)
+    if not math.isfinite(value):
+        return TYPES_MIN[resolution]
+    raw = int(round(value / scale[resolution]))
+    return max(-TYPES_MAX[resolution], min(TYPES_MAX[resolution], raw))
+
+
+# Decode a moteus register frame into ({register: value}, [(register, resolution)])
+def parse_command_frame(data):
+    writes = {}
+    reads = []
+    offset = 0
+    while offset < len(data):
+        cmd = data[offset]
+        offset += 1
+        upper = cmd & 0xf0
+        if upper == WRITE_BASE or upper == READ_BASE:
+            resolution = (cmd >> 2) & 0x03
+            count = cmd & 0x03
+            if count == 0:
+                count, offset = _read_varuint(data, offset)
+            register, offset = _read_varuint(data, offset)
+            for i in range(count):
+                if upper == WRITE_BASE:
+                    raw = TYPES[resolution].unpack_from(data, offset)[0]
+                    offset += TYPES[resolution].size
+                    writes[register + i] = _decode(register + i, resolution, raw)
+                else:
+                    reads.append((register + i, resolution))
+        elif cmd == NOP:
+            continue
+        else:
+            # stream / diagnostic frames are not simulated
+            break
+    return writes, reads
+
+
+# Encode the reply frame for the requested registers, consecutive registers
+# of the same resolution are combined like the moteus firmware does
+def make_reply_frame(reads, values):
+    buf = bytearray()
+    i = 0
+    while i < len(reads):
+        register, resolution = reads[i]
+        count = 1
+        while (i + count < len(reads) and reads[i + count][1] == resolution
+               and reads[i + count][0] == register + count):
+            count += 1
+        if count < 4:
+            buf.append(REPLY_BASE | (resolution << 2) | count)
+        else:
+            buf.append(REPLY_BASE | (resolution << 2))
+            _write_varuint(buf, count)
+        _write_varuint(buf, register)
+        for k in range(count):
+            reg = register + k
+            buf += TYPES[resolution].pack(_encode(reg, resolution, values.get(reg, 0)))
+        i += count
+    return bytes(buf)
+
+
+class SimFrame:
+    def __init__(self, arbitration_id, data, bus):
+        self.arbitration_id = arbitration_id
+        self.data = data
+        self.bus = bus
+
+
+class SimJoint:
+    # inertia [kg m^2] and damping [Nm s/rad] at the output, kp [Nm/rev] and
+    # kd [Nm s/rev] are the moteus servo.pid_position gains, load_torque is a
+    # constant external torque (e.g. gravity on the leg) [Nm]
+    def __init__(self, inertia=0.002, damping=0.01, kp=4.0, kd=0.05,
+                 load_torque=0.0, default_timeout=0.1, position=0.0,
+                 position_min=math.nan, position_max=math.nan):
+        self.inertia = inertia
+        self.damping = damping
+        self.kp = kp
+        self.kd = kd
+        self.load_torque = load_torque
+        self.default_timeout = default_timeout
+        self.position_min = position_min
+        self.position_max = position_max
+
+        # state, in revolutions like the moteus registers
+        self.position = position
+        self.velocity = 0.0
+        self.torque = 0.0
+        self.mode = MODE_STOPPED
+        self.fault = 0
+
+        # position mode command
+        self.control_position = math.nan
+        self.cmd_velocity = 0.0
+        self.ff_torque = 0.0
+        self.kp_scale = 1.0
+        self.kd_scale = 1.0
+        self.max_torque = math.inf
+        self.stop_position = math.nan
+        self.timeout = default_timeout
+        self.since_cmd = 0.0
+        self.limiter = TrajectoryLimiter()
+        self.limited = False
+
+
+    def apply(self, writes):
+        if 0x130 in writes:
+            # rezero: the closest position consistent with the output position
+            value = writes[0x130]
+            self.position = value + round(self.position - value)
+            self.control_position = math.nan
+            self.limited = False
+
+        if int(REG.MODE) not in writes:
+            return
+        mode = int(writes[int(REG.MODE)])
+
+        if mode == MODE_STOPPED:
+            self.mode = MODE_STOPPED
+            self.control_position = math.nan
+            self.limited = False
+            self.fault = 0
+            return
+
+        if mode != MODE_POSITION or self.mode == MODE_TIMEOUT:
+            return
+
+        def get(reg, default):
+            value = writes.get(reg, default)
+            return default if value is None else value
+
+        position = get(0x020, math.nan)
+        control_velocity = self.control_velocity()
+        self.cmd_velocity = get(0x021, 0.0)
+        if not math.isfinite(self.cmd_velocity):
+            self.cmd_velocity = 0.0
+        velocity_limit = get(0x028, math.nan)
+        accel_limit = get(0x029, math.nan)
+        limited = math.isfinite(position) and (math.isfinite(velocity_limit) or
+                                               math.isfinite(accel_limit))
+
+        if self.mode != MODE_POSITION or not math.isfinite(self.control_position):
+            self.control_position = self.position
+            self.limited = False
+        if limited:
+            if not self.limited:
+                # the limiter starts from the current control state
+                self.limiter = TrajectoryLimiter(self.control_position, control_velocity)
+            self.limiter.set(position, self.cmd_velocity, velocity_limit, accel_limit)
+        elif math.isfinite(position):
+            self.control_position = position
+        self.limited = limited
+
+        self.ff_torque = get(0x022, 0.0)
+        self.kp_scale = get(0x023, 1.0)
+        self.kd_scale = get(0x024, 1.0)
+        self.max_torque = get(0x025, math.inf)
+        if not math.isfinite(self.max_torque):
+            self.max_torque = math.inf
+        self.stop_position = get(0x026, math.nan)
+        timeout = get(0x027, math.nan)
+        self.timeout = timeout if math.isfinite(timeout) else self.default_timeout
+        self.since_cmd = 0.0
+        self.mode = MODE_POSITION
+
+
+    # velocity the control position moves at [rev/s]
+    def control_velocity(self):
+        if self.mode != MODE_POSITION:
+            return 0.0
+        if self.limited:
+            return self.limiter.velocity
+        return self.cmd_velocity
+
+
+    def step(self, dt):
+        torque = 0.0
+        if self.mode == MODE_POSITION:
+            self.since_cmd += dt
+            if self.timeout > 0.0 and self.since_cmd > self.timeout:
+                self.mode = MODE_TIMEOUT
+
+        if self.mode == MODE_POSITION:
+            cp = self.control_position + self.cmd_velocity * dt
+            vel_des = self.cmd_velocity
+            if self.limited:
+                substeps = max(1, int(round(dt / LIMITER_DT)))
+                for _ in range(substeps):
+                    self.limiter.step(dt / substeps)
+                cp = self.limiter.position
+                vel_des = self.limiter.velocity
+            elif math.isfinite(self.stop_position):
+                if ((self.cmd_velocity > 0.0 and cp >= self.stop_position) or
+                        (self.cmd_velocity < 0.0 and cp <= self.stop_position) or
+                        self.cmd_velocity == 0.0):
+                    cp = self.stop_position
+                    vel_des = 0.0
+            if math.isfinite(self.position_min) and cp < self.position_min:
+                cp = self.position_min
+            if math.isfinite(self.position_max) and cp > self.position_max:
+                cp = self.position_max
+            self.control_position = cp
+
+            torque = (self.kp * self.kp_scale * (cp - self.position) +
+                      self.kd * self.kd_scale * (vel_des - self.velocity) +
+                      self.ff_torque)
+            torque = max(-self.max_torque, min(self.max_torque, torque))
+        elif self.mode == MODE_TIMEOUT:
+            # moteus holds a damping only torque in the timeout mode
+            torque = -self.kd * self.velocity
+
+        self.torque = torque
+        # integrate in radians, semi-implicit euler
+        vel_rad = self.velocity * 2 * math.pi
+        acc = (torque + self.load_torque - self.damping * vel_rad) / self.inertia
+        vel_rad += acc * dt
+        self.velocity = vel_rad / (2 * math.pi)
+        self.position += self.velocity * dt
+
+
+    def registers(self):
+        return {
+            int(REG.MODE): self.mode,
+            int(REG.POSITION): self.position,
+            int(REG.VELOCITY): self.velocity,
+            int(REG.TORQUE): self.torque,
+            int(REG.VOLTAGE): 24.0,
+            int(REG.TEMPERATURE): 30.0,
+            int(REG.FAULT): self.fault,
+            int(REG.TRAJECTORY_COMPLETE): int(not self.limited or self.limiter.complete),
+        }
+
+
+
+class SimPi3HatRouter:
+    # servo_bus_map: same as for moteus_pi3hat.Pi3HatRouter
+    # joints:     optional {servo_id: SimJoint} to configure the joint models
+    # latency:    simulated bus time of a cycle [s]
+    # drop_rate:  probability that a requested reply is lost
+    # sim_dt:     integration step [s]
+    # fixed_dt:   advance the sim by this time per cycle instead of following the clock
+    def __init__(self, servo_bus_map, joints=None, latency=0.0, drop_rate=0.0,
+                 sim_dt=0.0005, fixed_dt=None, seed=None, clock=time.monotonic):
+        self.servo_bus_map = servo_bus_map
+        self.bus_of = {
+            servo_id : bus for bus, ids in servo_bus_map.items() for servo_id in ids
+        }
+        self.joints = {servo_id : SimJoint() for servo_id in self.bus_of}
+        if joints:
+            self.joints.update(joints)
+
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.sim_dt = sim_dt
+        self.fixed_dt = fixed_dt
+        self.clock = clock
+        self.rng = random.Random(seed)
+
+        self.time = 0.0        # simulated time [s]
+        self.cycles = 0
+        self.dropped = 0
+        self._last = None
+
+
+    def advance(self, duration):
+        # bound the catch up after a long pause (e.g. a debugger), loops that
+        # do not send every tick (sparse trajectories) cycle([]) to keep the
+        # sim on their clock
+        duration = min(duration, 1.0)
+        steps = int(duration / self.sim_dt)
+        rest = duration - steps * self.sim_dt
+        for joint in self.joints.values():
+            for _ in range(steps):
+                joint.step(self.sim_dt)
+            if rest > 0.0:
+                joint.step(rest)
+        self.time += duration
+
+
+    async def cycle(self, commands, **kwargs):
+        now = self.clock()
+        if self.fixed_dt is not None:
+            self.advance(self.fixed_dt)
+        elif self._last is not None:
+            self.advance(now - self._last)
+        self._last = now
+
+        pending = []
+        for command in commands:
+            servo_id = command.destination
+            joint = self.joints.get(servo_id)
+            if joint is None:
+                continue
+            writes, reads = parse_command_frame(command.data)
+            joint.apply(writes)
+            if command.reply_required and reads:
+                pending.append((command, servo_id, reads))
+
+        if self.latency > 0.0:
+            await asyncio.sleep(self.latency)
+
+        results = []
+        for command, servo_id, reads in pending:
+            if self.drop_rate > 0.0 and self.rng.random() < self.drop_rate:
+                self.dropped += 1
+                continue
+            data = make_reply_frame(reads, self.joints[servo_id].registers())
+            frame = SimFrame((servo_id << 8) | command.source, data, self.bus_of[servo_id])
+            results.append(command.parse(frame))
+
+        self.cycles += 1
+        return results
@@ -0,0 +1,229 @@
+# Onboard trajectory limiter of the moteus & sparse waypoint plans for it
+#
+# A position mode command w/ a finite velocity_limit and/or accel_limit does
+# not jump the control position to the commanded one, the moteus slews its
+# control position & velocity towards the command (position, velocity) w/
+# at most those limits, and reports trajectory_complete once it got there.
+# From then on the control position advances at the commanded velocity. So
+# one command per waypoint is enough where the loops used to stream a new
+# position every cycle.
+#
+# TrajectoryLimiter models that limiter, for sim_transport.py and to predict
+# offline what the servo will do w/ a waypoint. The model follows the moteus
+# docs, it has not been verified against the firmware: the sim runs this
+# same model, bench/bench_traj_mode.py only checks it against its own
+# closed form profile, so the tolerance of a plan holds on the hardware only
+# as far as the firmware matches the description.
+#
+# plan_trajectory splits a per tick set point table (ctrlrs/traj/
+# traj_compiler.py) into segments:
+#   sparse  one waypoint command at the segment's start (the set points of
+#           its last tick, velocity & accel limits from the segment's peak
+#           velocity & acceleration), the limiter does the interpolation
+#   dense   every tick's set points are streamed, where the limiter's path
+#           would be more than tolerance [rev] off the table, i.e. where
+#           tight tracking is needed (fast reversals, short features)
+# Segments grow greedily: from a start tick the longest segment (doubling
+# from min_ticks up to max_ticks) whose predicted path stays in tolerance
+# for both servos is taken, when even min_ticks is off the segment is dense.
+#
+# usage:
+#   plan = plan_trajectory(traj, tolerance=0.005)
+#   leg.set_trajectory(plan)
+#   while True:
+#       results = await leg.step_trajectory(time.monotonic() - t0)
+#
+
+import math
+
+import numpy as np
+
+
+# time step of the limiter model in the planner & the sim [s], the moteus
+# runs its limiter at the control rate (tens of kHz), coarser steps lag the
+# time optimal path by ~accel * step^2 per step, which adds up to a good
+# part of a tight tolerance at fast tables (checked against the closed form
+# profile of bench/bench_traj_mode.py)
+LIMITER_DT = 0.0001
+
+
+class TrajectoryLimiter:
+    # position [rev] & velocity [rev/s] of the control state to start from
+    def __init__(self, position=0.0, velocity=0.0):
+        self.position = position
+        self.velocity = velocity
+        self.target = position
+        self.target_velocity = 0.0
+        self.velocity_limit = math.inf
+        self.accel_limit = math.inf
+        self.complete = True
+
+
+    # new command, the control state carries on from where it is
+    # non finite limits are no limit
+    def set(self, target, target_velocity=0.0, velocity_limit=math.inf, accel_limit=math.inf):
+        self.target = target
+        self.target_velocity = target_velocity if math.isfinite(target_velocity) else 0.0
+        self.velocity_limit = velocity_limit if math.isfinite(velocity_limit) else math.inf
+        self.accel_limit = accel_limit if math.isfinite(accel_limit) else math.inf
+        self.complete = False
+
+
+    # advance the control state by dt [s]
+    def step(self, dt):
+        v_t = self.target_velocity
+        self.target += v_t * dt
+        if self.complete:
+            self.position = self.target
+            self.velocity = v_t
+            return
+
+        dx = self.target - self.position
+        a = self.accel_limit
+        # fastest approach that can still stop (relative to the target) at it
+        # and does not step past it
+        approach = abs(dx) / dt
+        if a != math.inf:
+            approach = min(approach, math.sqrt(2.0 * a * abs(dx)))
+        desired = v_t + math.copysign(approach, dx)
+        vmax = self.velocity_limit
+        desired = max(-vmax, min(vmax, desired))
+
+        dv = desired - self.velocity
+        if a != math.inf:
+            dv = max(-a * dt, min(a * dt, dv))
+        self.velocity += dv
+        self.position += self.velocity * dt
+
+        # arrived, w/ the target's velocity
+        if (abs(self.target - self.position) <= 1e-6 and
+                abs(self.velocity - v_t) <= (a * dt if a != math.inf else 1e-6)):
+            self.position = self.target
+            self.velocity = v_t
+            self.complete = True
+
+
+class TrajectoryPlan:
+    # traj:     the JointTrajectory the plan is for (table, dt, periodic)
+    # segments: [(start tick, end tick, sparse, waypoint)] where waypoint is
+    #           ((position, velocity, velocity_limit, accel_limit, torque) of
+    #           the knee, of the hip), None for dense segments
+    def __init__(self, traj, segments, tolerance):
+        self.traj = traj
+        self.segments = segments
+        self.tolerance = tolerance
+        # segment of every tick, an O(1) lookup in the loop
+        self.segment_of = np.empty(len(traj), dtype=np.int64)
+        for i, (start, end, sparse, waypoint) in enumerate(segments):
+            self.segment_of[start:end] = i
+        self.sparse_ticks = sum(end - start for start, end, sparse, _ in segments if sparse)
+
+
+    # waypoint commands + streamed ticks per period, vs one command per tick
+    def commands_per_period(self):
+        return sum(1 if sparse else end - start for start, end, sparse, _ in self.segments)
+
+
+# waypoint of the segment [start, end), the control state (position,
+# velocity) of every servo at its end & the largest deviation [rev] of the
+# limiter's path from the table over it, starting from the control states
+# state at the start tick
+# the commanded position moves at the commanded velocity from the moment it
+# is sent, so the waypoint is where the end tick's set point is at the start
+def _predict(table, accel, dt, start, end, state, margin, min_velocity, min_accel):
+    n = len(table)
+    target = table[end % n]
+    waypoint = []
+    end_state = []
+    worst = 0.0
+    for servo in range(table.shape[1]):
+        vel = table[start:end + 1, servo, 1] if end < n else np.append(table[start:, servo, 1], target[servo, 1])
+        acc = accel[start:end, servo]
+        v_lim = max(margin * float(np.max(np.abs(vel))), min_velocity)
+        a_lim = max(margin * float(np.max(np.abs(acc))), min_accel)
+        position = float(target[servo, 0] - target[servo, 1] * (end - start) * dt)
+        limiter = TrajectoryLimiter(*state[servo])
+        limiter.set(position, float(target[servo, 1]), v_lim, a_lim)
+        substeps = max(1, int(round(dt / LIMITER_DT)))
+        for tick in range(start + 1, end + 1):
+            for _ in range(substeps):
+                limiter.step(dt / substeps)
+            worst = max(worst, abs(limiter.position - table[tick % n, servo, 0]))
+        waypoint.append((position, float(target[servo, 1]), v_lim, a_lim,
+                         float(target[servo, 2])))
+        end_state.append((limiter.position, limiter.velocity))
+    return tuple(waypoint), end_state, worst
+
+
+# control state of every servo one tick after the set points of tick were
+# streamed to it
+def _streamed(table, tick, dt):
+    row = table[tick % len(table)]
+    return [(float(row[servo, 0] + row[servo, 1] * dt), float(row[servo, 1]))
+            for servo in range(len(row))]
+
+
+# traj:      JointTrajectory, table[tick, servo, (position, velocity, torque)]
+# tolerance: largest deviation [rev] of the limiter's path from the table in
+#            a sparse segment
+# margin:    limits = margin * the segment's peak velocity / acceleration
+# min_ticks, max_ticks: shortest & longest sparse segment
+# The predicted control state is carried from segment to segment, so a
+# sparse segment also has to take up what the one before it left off the
+# table. A non periodic trajectory starts on its first tick, a periodic one
+# where its last tick leaves the servos (the wrap of every later period).
+def plan_trajectory(traj, tolerance=0.005, margin=1.2, min_ticks=4, max_ticks=None,
+                    min_velocity=0.01, min_accel=0.1):
+    table = traj.table
+    dt = traj.dt
+    n = len(table)
+    if max_ticks is None:
+        max_ticks = n
+    # acceleration from tick to tick (to the first tick again if periodic)
+    nxt = np.roll(table[:, :, 1], -1, axis=0) if traj.periodic else np.vstack(
+        (table[1:, :, 1], table[-1:, :, 1]))
+    accel = (nxt - table[:, :, 1]) / dt
+
+    # a non periodic trajectory ends on its last tick, held
+    last = n if traj.periodic else n - 1
+    segments = []
+    start = 0
+    if traj.periodic:
+        state = _streamed(table, n - 1, dt)
+    else:
+        state = [(float(row[0]), float(row[1])) for row in table[0]]
+    dense_from = None
+    while start < last:
+        best = None
+        length = min_ticks
+        while True:
+            end = min(start + length, last)
+            waypoint, end_state, worst = _predict(table, accel, dt, start, end, state,
+                                                  margin, min_velocity, min_accel)
+            if worst > tolerance:
+                break
+            best = (end, waypoint, end_state)
+            if end == last or length >= max_ticks:
+                break
+            length = min(length * 2, max_ticks)
+
+        if best is None:
+            # stream this stretch, merged w/ a dense segment right before it,
+            # the servos are back on the table after it
+            if dense_from is None:
+                dense_from = start
+            start = min(start + min_ticks, last)
+            state = _streamed(table, start - 1, dt)
+            continue
+        if dense_from is not None:
+            segments.append((dense_from, start, False, None))
+            dense_from = None
+        segments.append((start, best[0], True, best[1]))
+        start, state = best[0], best[2]
+
+    if dense_from is not None:
+        segments.append((dense_from, last, False, None))
+    if not traj.periodic:
+        # the last tick, the final waypoint held
+        segments.append((n - 1, n, False, None))
+    return TrajectoryPlan(traj, segments, tolerance)
@@ -0,0 +1,395 @@
+#!/usr/bin/python3 -B
+
+# Jumping program for the 2D monoped setup
+# This program should be extendable to add more servos (at later stages)
+# such as, roll and yaw servos in the hip and also two ankle servos
+# NOTE: ankle servos may end up being hobby servos (but this will be designed more in the future)
+#
+
+import asyncio
+import math
+import moteus
+import time
+import argparse
+import sys
+
+try:
+    from .cmd_template import PositionTemplate
+    from .query_profiles import QUERY_PROFILES, make_profile_servos
+except ImportError:
+    from cmd_template import PositionTemplate
+    from query_profiles import QUERY_PROFILES, make_profile_servos
+
+try:
+    import moteus_pi3hat
+except ImportError: # not on the raspi, only a simulated transport can be used
+    moteus_pi3hat = None
+
+
+'''
+TODO:
+
+REDO THIS WHOLE GODDAMN THING TO BE MORE LIKE ZERO_LEG.PY
+
+Figure out how to make the spring jumping up and down virtual leg
+1. get the measurements for the leg links
+2. figure out the lowest possible length of the virtual leg spring
+3. then figure out the IK that needs to be mapped to the input positions of the servos
+   (This will be implemented as a cpp ctrlr that will interface with this py class)
+
+'''
+
+
+'''
+NOTE: On the moteus controller these are the set position_min/max
+
+KNEE servopos.position_min = -0.65
+KNEE servopos.position_max = -0.15
+
+HIP servopos.position_min = -0.51
+HIP servopos.position_max = +0.02
+
+KNEE id.id = 1
+HIP  id.id = 2
+'''
+
+
+MAX_POS_KN = -0.15 - 0.00
+MIN_POS_KN = -0.65 + 0.00
+
+MAX_POS_HP =  0.02 - 0.00
+MIN_POS_HP = -0.51 + 0.00
+
+
+# Query every servo (rezeroing them first w/ rezero=True) in a single
+# transport.cycle, so the pi3hat runs the buses in parallel. Servos that did
+# not reply are retried in the following cycles until the timeout [s].
+# Returns {servo_id: moteus.Result}, when not every servo replied in time:
+#   partial='raise' -> raise asyncio.TimeoutError
+#   partial='none'  -> return the dict w/ None for the missing servos
+async def query_servos(transport, servos, rezero=False, timeout=0.1, partial='raise'):
+    results = {servo_id : None for servo_id in servos}
+    pending = list(servos)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        if rezero:
+            commands = [servos[i].make_rezero(rezero=0.0, query=True) for i in pending]
+        else:
+            commands = [servos[i].make_query() for i in pending]
+
+        for result in await transport.cycle(commands):
+            if result.id in results:
+                results[result.id] = result
+
+        pending = [i for i in pending if results[i] is None]
+        if not pending or time.monotonic() >= deadline:
+            break
+
+    if pending and partial == 'raise':
+        raise asyncio.TimeoutError(f"no reply from servo(s) {pending}")
+    return results
+
+
+
+# args equal, w/ nan equal to nan (e.g. watchdog_timeout = math.nan)
+def same_args(a, b):
+    for x, y in zip(a, b):
+        if x != y and not (x != x and y != y):
+            return False
+    return True
+
+
+
+
+class Leg:
+    # each arg corresponds to the respective servo CANBUS ID
+    # transport: defaults to the pi3hat, pass e.g. a SimPi3HatRouter to run w/o hw
+    # query:      query profile (query_profiles.py) of the commands w/ que=True
+    # diag_every: use the 'diag' profile every diag_every cycles instead, 0 = never
+    def __init__(self, knee, hip_pitch, transport=None, query='full', diag_every=0):
+        if query not in QUERY_PROFILES:
+            raise ValueError(f"unknown query profile {query!r}, "
+                             f"one of {', '.join(QUERY_PROFILES)}")
+        self.knee = knee
+        self.hip_pitch = hip_pitch
+
+        # servo_bus_map arg describes which IDs are found on which bus
+        self.servo_bus_map = {
+            1:[self.knee],
+            2:[self.hip_pitch],
+        }
+        if transport is None:
+            if moteus_pi3hat is None:
+                raise RuntimeError("moteus_pi3hat is not installed, pass a transport to Leg")
+            transport = moteus_pi3hat.Pi3HatRouter(servo_bus_map = self.servo_bus_map)
+        self.transport = transport
+        # explicit servo_id's
+        self.port_knee = 0
+        self.port_hip_pitch = 1
+
+        # create a moteus.Controller instance for each servo and query profile,
+        # self.servos are the ones w/ the moteus default query
+        self.profile_servos = make_profile_servos(
+            [1, 2], self.transport) # number of motors, need to change manually
+        self.servos = self.profile_servos['full']
+
+        self.query = query
+        self.diag_every = diag_every
+        self.cycles = 0 # cycles sent by send_motor_cmds
+
+        # {(servo_id, profile): (args, PositionTemplate)} see make_cmd
+        self.templates = {}
+
+        # commands for the motors, default set to mid values
+        # NOTE: fixed table w/ one slot per servo port (port_knee, port_hip_pitch),
+        #       set_motor_*_cmds overwrite their slot so every batch sent
+        #       through transport.cycle has the same size
+        self.commands = [
+            self.servos[self.knee].make_position(
+                position = math.nan,
+                velocity = 0.5,
+                maximum_torque = 2.0,
+                stop_position = (MAX_POS_KN - MIN_POS_KN) / 2,
+                feedforward_torque = -0.01,
+                watchdog_timeout = math.nan,
+                query = True
+            ),
+            self.servos[self.hip_pitch].make_position(
+                position = math.nan,
+                velocity = 0.5,
+                maximum_torque = 2.0,
+                stop_position = (MAX_POS_HP - MIN_POS_HP) / 2,
+                feedforward_torque = -0.01,
+                watchdog_timeout = math.nan,
+                query = True
+            ),
+        ]
+
+
+    # send stop to clear faults && disable all the motors
+    async def stop_all_motors(self):
+        await self.transport.cycle([n.make_stop() for n in self.servos.values()])
+
+
+    # set knee motor commands
+    # query: query profile of this command, defaults to cycle_profile()
+    async def set_motor_kn_cmds(self, pos, vel, max_torq, stop_pos, ffwd_torq, watchdog_timeout, que,
+                                query=None):
+        self.commands[self.port_knee] = self.make_cmd(
+            self.knee, pos, vel, max_torq, stop_pos, ffwd_torq, watchdog_timeout, que, query)
+
+
+    # set hip motor commands
+    # query: query profile of this command, defaults to cycle_profile()
+    async def set_motor_hp_cmds(self, pos, vel, max_torq, stop_pos, ffwd_torq, watchdog_timeout, que,
+                                query=None):
+        self.commands[self.port_hip_pitch] = self.make_cmd(
+            self.hip_pitch, pos, vel, max_torq, stop_pos, ffwd_torq, watchdog_timeout, que, query)
+
+
+    # query profile of the commands made for the next cycle, 'diag' every
+    # diag_every cycles and self.query otherwise
+    def cycle_profile(self):
+        if self.diag_every and self.cycles % self.diag_every == 0:
+            return 'diag'
+        return self.query
+
+
+    # position command for a servo, position & stop_position are patched into
+    # a cached template (cmd_template.py) which is only re-encoded when one of
+    # the other args changes
+    def make_cmd(self, servo_id, pos, vel, max_torq, stop_pos, ffwd_torq, watchdog_timeout, que,
+                 query=None):
+        profile = 'none'
+        if que:
+            profile = query if query is not None else self.cycle_profile()
+        if profile == 'none':
+            que = False
+        servo = self.profile_servos[profile][servo_id]
+
+        if pos is None or stop_pos is None:
+            return servo.make_position(
+                position = pos,
+                velocity = vel,
+                maximum_torque = max_torq,
+                stop_position = stop_pos,
+                feedforward_torque = ffwd_torq,
+                watchdog_timeout = watchdog_timeout,
+                query = que)
+
+        key = (vel, max_torq, ffwd_torq, watchdog_timeout, que)
+        cached = self.templates.get((servo_id, profile))
+        if cached is None or not same_args(cached[0], key):
+            template = PositionTemplate(servo, ('position', 'stop_position'),
+                velocity = vel,
+                maximum_torque = max_torq,
+                feedforward_torque = ffwd_torq,
+                watchdog_timeout = watchdog_timeout,
+                query = que)
+            cached = self.templates[(servo_id, profile)] = (key, template)
+        return cached[1].make(pos, stop_pos)
+
+
+    # query all the servos in one cycle, see query_servos
+    async def query_all(self, rezero=False, timeout=0.1, partial='raise'):
+        return await query_servos(self.transport, self.servos, rezero, timeout, partial)
+
+
+    # send commands and return the results info
+    async def send_motor_cmds(self):
+        results = await self.transport.cycle(self.commands)
+        self.cycles += 1
+        return results
+
+
+    # trajectory mode: play a plan of trajectory_limiter.plan_trajectory, the
+    # sparse segments go out as one waypoint command each w/ their velocity &
+    # accel limits and the moteus interpolates on board, the dense ones
+    # stream the table's set points every tick
+    # max_torq:  maximum_torque of every trajectory command
+    # keepalive: ticks between resends of a sparse segment's waypoint (for
+    #            fresh replies), 0 = only at the start of the segment
+    # watchdog:  [s] a waypoint's watchdog_timeout is its segment + watchdog
+    def set_trajectory(self, plan, max_torq=2.0, keepalive=0, watchdog=0.05):
+        traj = plan.traj
+        servos = self.profile_servos[self.query]
+        self.plan = plan
+        self.keepalive = keepalive
+        self.traj_segment = -1 # last segment sent
+        self.traj_tick = -1    # tick of the last step_trajectory
+        self.traj_idle = 0     # ticks since the last command
+
+        # every waypoint encoded once
+        self.waypoint_cmds = []
+        for start, end, sparse, waypoint in plan.segments:
+            if not sparse:
+                self.waypoint_cmds.append(None)
+                continue
+            self.waypoint_cmds.append([
+                servos[servo_id].make_position(
+                    position = pos,
+                    velocity = vel,
+                    velocity_limit = vel_lim,
+                    accel_limit = accel_lim,
+                    maximum_torque = max_torq,
+                    stop_position = math.nan,
+                    feedforward_torque = ffwd_torq,
+                    watchdog_timeout = (end - start) * traj.dt + watchdog,
+                    query = True)
+                for servo_id, (pos, vel, vel_lim, accel_lim, ffwd_torq)
+                in zip([self.knee, self.hip_pitch], waypoint)])
+
+        # dense: position, velocity & feedforward torque patched per tick, no
+        # limits so the control position follows the table exactly
+        self.stream_cmds = [PositionTemplate(servos[servo_id], ('position', 'velocity', 'feedforward_torque'),
+            velocity_limit = math.nan,
+            accel_limit = math.nan,
+            maximum_torque = max_torq,
+            stop_position = math.nan,
+            watchdog_timeout = math.nan,
+            query = True) for servo_id in [self.knee, self.hip_pitch]]
+
+
+    # send what the plan needs at time t [s] since its start, returns the
+    # results or None when nothing had to be sent this tick
+    async def step_trajectory(self, t):
+        plan = self.plan
+        tick = plan.traj.index(t)
+        segment = int(plan.segment_of[tick])
+        start, end, sparse, waypoint = plan.segments[segment]
+        last = self.traj_tick
+        self.traj_tick = tick
+
+        if sparse:
+            # the waypoint once per segment (& period), then on keepalive
+            new = segment != self.traj_segment or tick < last
+            if not new and (not self.keepalive or self.traj_idle + 1 < self.keepalive):
+                self.traj_idle += 1
+                return None
+            commands = self.waypoint_cmds[segment]
+        else:
+            if tick == last:
+                # still the tick sent last, a non periodic trajectory's end
+                self.traj_idle += 1
+                return None
+            kn, hp = plan.traj.table[tick]
+            commands = [self.stream_cmds[0].make(*kn),
+                        self.stream_cmds[1].make(*hp)]
+
+        self.traj_segment = segment
+        self.traj_idle = 0
+        results = await self.transport.cycle(commands)
+        self.cycles += 1
+        return results
+
+
+
+
+async def main():
+
+    print("Starting jumping...")
+    monopod = Leg(1, 2)
+    # halfway position of each motorized joint
+    kn_half = (MAX_POS_KN - MIN_POS_KN) / 2
+    hp_half = (MAX_POS_HP - MIN_POS_HP) / 2
+
+    # clearing any faults
+    await monopod.stop_all_motors()
+    print("cleared motor faults")
+
+    while True:
+
+        now = time.time()
+
+        # testing the set commands
+        await monopod.set_motor_kn_cmds(math.nan, 0.5, 2.0, MIN_POS_KN + kn_half + math.sin(now) * kn_half, -0.01, math.nan, True)
+        await monopod.set_motor_hp_cmds(math.nan, 0.5, 2.0, MIN_POS_HP + hp_half + math.sin(now + 1) * hp_half, -0.01, math.nan, True)
+
+        #print(monopod.commands[0])
+        #print(monopod.commands[1])
+
+
+        # test sending the commands
+        results = await monopod.send_motor_cmds()
+
+        # The result is a list of 'moteus.Result' types, each of which
+        # identifies the servo it came from, and has a 'values' field
+        # that allows access to individual register results.
+        #
+        # NOTE: it is possible to not receive responses from all servos
+        #       for which a query was requested
+        #
+        # Here, we'll just print the ID, position, and velocity of each
+        # servo for which a reply was returned
+        '''print("".join(
+            f"({result.id}) " +
+            f"{result.values[moteus.Register.POSITION]} " +
+            f"{result.values[moteus.Register.VELOCITY]} "
+            for result in results
+        ), end='\r')'''
+        #print(now, end='\r')
+
+
+        # await asyncio.sleep(0.5)
+
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
+
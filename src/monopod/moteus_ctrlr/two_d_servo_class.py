@@ -16,6 +16,15 @@ import moteus
 import moteus_pi3hat
 import sys
 
+try:
+    from .loop_rate import FixedRateLoop
+    from .telemetry import Telemetry
+    from .cmd_template import PositionTemplate
+except ImportError:
+    from loop_rate import FixedRateLoop
+    from telemetry import Telemetry
+    from cmd_template import PositionTemplate
+
 
 '''
 TODO:
@@ -118,7 +127,7 @@ class Servo:
 
 
 
-async def main():
+async def main(tlm=None):
     servo_ids = {
         1:[1],
         2:[2],
@@ -134,7 +143,7 @@ async def main():
         },
     )
 
-    servos = [Servo(transport, x) for x in servo_ids]
+    servos = {x : Servo(transport, x) for x in servo_ids}
 
     # We will start by sending a 'stop' to all servos, in the event that any had a fault
     #await transport.cycle()
@@ -143,6 +152,29 @@ async def main():
     half_kn = (MAX_POS_KN - MIN_POS_KN) / 2
     half_hp = (MAX_POS_HP - MIN_POS_HP) / 2
 
+    # absolute deadline pacing at 50Hz
+    rate = FixedRateLoop(50.0)
+
+    # 'make_position' accepts optional keyword arguments that correspond
+    # to each of the available position mode registers in the moteus
+    # reference manual. The sinusoidal commands only change the stop
+    # position, so they are encoded once here and the loop only patches
+    # the stop position into the frames (cmd_template.py)
+    kn_sinusoidal = PositionTemplate(servos[1].controller, ('stop_position',), # KNEE
+        position = math.nan,
+        velocity = 0.5,
+        maximum_torque = 2.0,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+    hp_sinusoidal = PositionTemplate(servos[2].controller, ('stop_position',), # HIP
+        position = math.nan,
+        velocity = 0.5,
+        maximum_torque = 2.0,
+        feedforward_torque = -0.01,
+        watchdog_timeout = math.nan,
+        query = True)
+
     while True:
         # the 'cycle' method accepts a list of commands, each of which is created by
         # calling one of the 'make_foo' methods on Controller. The most command thing
@@ -153,47 +185,9 @@ async def main():
         # construct a pos command for each servo, each of which consists of a
         # sinusoidal velocity command starting from wherever the servo was at
         # to begin with
-        #
-        # 'make_position' accepts optional keyword arguments that correspond
-        # to each of the available position mode registers in the moteus
-        # reference manual
         commands_sinusoidal = [
-            servos[1].controller.make_position( # KNEE
-                position = math.nan,
-                velocity = 0.5,
-                maximum_torque = 2.0,
-                stop_position = MIN_POS_KN + half_kn + math.sin(now) * half_kn,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
-            servos[2].controller.make_position( # HIP
-                position = math.nan,
-                velocity = 0.5,
-                maximum_torque = 2.0,
-                stop_position = MIN_POS_HP + half_hp + math.sin(now + 1) * half_hp,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
-        ]
-
-        # position commands
-        commands_pos = [
-            servos[1].controller.make_position( # KNEE
-                position = math.nan,
-                velocity = 2.0,
-                maximum_torque = 2.0,
-                stop_position = MAX_POS_KN,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
-            servos[2].controller.make_position( # HIP
-                position = math.nan,
-                velocity = 2.0,
-                maximum_torque = 2.0,
-                stop_position = MAX_POS_HP,
-                feedforward_torque = -0.01,
-                watchdog_timeout = math.nan,
-                query = True),
+            kn_sinusoidal.make(MIN_POS_KN + half_kn + math.sin(now) * half_kn), # KNEE
+            hp_sinusoidal.make(MIN_POS_HP + half_hp + math.sin(now + 1) * half_hp), # HIP
         ]
 
         # By sending all commands to the transport in one go, the pi3hat
@@ -201,7 +195,7 @@ async def main():
         # from all ports. It can also pipeline commands and responses
         # for multiple servos on the same bus
         #results = await transport.cycle(commands_sinusoidal)
-        results = await transport.cycle(commands_sinusoidal)
+        results = await rate.io(transport.cycle(commands_sinusoidal))
 
         # The result is a list of 'moteus.Result' types, each of which
         # identifies the servo it came from, and has a 'values' field
@@ -210,22 +204,36 @@ async def main():
         # NOTE: it is possible to not receive responses from all servos
         #       for which a query was requested
         #
-        # Here, we'll just print the ID, position, and velocity of each
-        # servo for which a reply was returned
-        #print("\n".join(
-        #    f"({result.id}) " +
-        #    f"{result.values[moteus.Register.POSITION]} " +
-        #    f"{result.values[moteus.Register.VELOCITY]} "
-        #    for result in results
-        #), end='\r')
+        # Here, we log the commanded and the returned registers of each
+        # servo, printing them from the loop costs milliseconds per cycle
+        if tlm is not None:
+            tlm.log_cycle(time.monotonic(),
+                          [(math.nan, 0.5, -0.01), (math.nan, 0.5, -0.01)],
+                          results)
         print(now, end='\r')
 
-        # We will wait 20ms between cycles. By default, each servo has
+        # We will run a cycle every 20ms. By default, each servo has
         # a watchdog timeout, where if no CAN command is received for
         # 100mc the controller will enter a latched fault state
-        await asyncio.sleep(0.02)
+        await rate.sleep()
+
+
+
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--log', metavar='PATH',
+                        help='append per cycle telemetry to PATH')
+    args = parser.parse_args()
 
+    # per cycle telemetry, written to disk off the loop
+    tlm = Telemetry(args.log, servo_ids=[1, 2],
+                    servo_bus_map={1:[1], 2:[2]}) if args.log is not None else None
+    try:
+        asyncio.run(main(tlm))
+    finally:
+        if tlm is not None:
+            tlm.close()
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    run()
@@ -2,8 +2,9 @@
 
 # Programming for passively reading the joint angles on the monopod
 
-from moteus_ctrlr.src.two_d_leg_class import Leg
-from ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.moteus_ctrlr.two_d_leg_class import Leg
+from monopod.moteus_ctrlr.sim_transport import SimPi3HatRouter
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
 
 import numpy as np
 import asyncio
@@ -14,13 +15,16 @@ import argparse
 import sys
 
 
-async def main():
+async def main(sim=False):
     kn_id = 1
     hp_id = 2
     ctrlr_x = ctrlr_y = 0
 
     # create the leg class
-    monopod = Leg(kn_id, hp_id) # TODO: double check the motor port id's
+    transport = None
+    if sim:
+        transport = SimPi3HatRouter(servo_bus_map = {1:[kn_id], 2:[hp_id]})
+    monopod = Leg(kn_id, hp_id, transport) # TODO: double check the motor port id's
 
     # create controller class
     # l0 = ~100 mm
@@ -35,19 +39,18 @@ async def main():
     # to each servo_id in Leg.servos
     while True:
         # update the current pos to the closest one which is consistent with an output pos
-        await monopod.servos[monopod.hip_pitch].set_rezero(0.0, query=True)
-        await monopod.servos[monopod.knee].set_rezero(0.0, query=True)
-
-        result_kn = result_hp = None
-        while (result_hp and result_kn) is None:
-            result_hp = await monopod.servos[monopod.hip_pitch].query()
-            result_kn = await monopod.servos[monopod.knee].query()
+        # and read back all the joints, in one cycle for all servos
+        results = await monopod.query_all(rezero=True, partial='none')
+        result_kn = results[monopod.knee]
+        result_hp = results[monopod.hip_pitch]
+        if result_kn is None or result_hp is None:
+            continue
 
         # now we have all the info about the actual monopod's joint positions,
         # so now we must convert & feedback that info to the ctrlr
         ctrlr.theta0 = ctrlr.convert_enc_rad_hp(result_hp.values[moteus.Register.POSITION])
         ctrlr.theta1 = ctrlr.convert_enc_rad_kn(result_kn.values[moteus.Register.POSITION])
-        ctrlr_x, ctrlr_y = ctrlr.fwrd_kinematics()
+        ctrlr_x, ctrlr_y = ctrlr.fwrd_kinematics(ctrlr.theta0, ctrlr.theta1)
 
 
         print("hp pos: ", result_hp.values[moteus.Register.POSITION])
@@ -66,6 +69,14 @@ async def main():
 
 
 
-if __name__ == "__main__":
-    asyncio.run(main())
+def run():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sim', action='store_true',
+                        help='run against the simulated pi3hat transport')
+    args = parser.parse_args()
+
+    asyncio.run(main(args.sim))
 
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+# Headless planar dynamics of the monopod rig, many rollouts at once
+#
+# The hip is mounted on the carriage of the vertical 2020 linear slider, the
+# two-link leg (hip pitch theta0, knee theta1, same angles and forward
+# kinematics as sinIkHopCtrlr) hangs below it and touches a flat ground.
+#   generalized coords  q = [z, theta0, theta1]
+#   z                   height of the hip axis above the ground [m]
+#   foot                (l0 cos(t0) + l1 cos(t0 + t1), z + l0 sin(t0) + l1 sin(t0 + t1))
+#
+# Every state variable is an (n,) array, one entry per independent rollout,
+# and every parameter can be a scalar or an (n,) array, so a whole sweep of
+# gains/masses/set points steps together with a handful of numpy operations.
+#
+# The servos are modelled like the moteus position mode, in motor revs:
+#   torque = kp*kp_scale*(pos - p) + kd*kd_scale*(vel - v) + feedforward_torque
+# clamped to maximum_torque (and the torque_limit of the motor). Motor revs
+# map to joint angles through the same linear conversion as
+# sinIkHopCtrlr.convert_rad_enc_*, so set points computed for the hardware
+# are used unchanged.
+#
+# Ground contact is a penalty spring-damper with Coulomb friction, the
+# integrator is semi-implicit Euler with a fixed step, the 3x3 mass matrix
+# is solved in closed form for all rollouts at once.
+#
+# USAGE:
+#   sim = PlanarHopSim(n=64, kp=np.linspace(2.0, 8.0, 64))
+#   sim.reset(z=0.22, theta0=-1.9, theta1=-0.8)
+#   while sim.t < 5.0:
+#       sim.command(kn_pos, hp_pos, maximum_torque=1.0)
+#       sim.advance(0.02)
+#   print(sim.z_max)
+#
+
+import math
+
+import numpy as np
+
+
+HIP  = 0 # theta0, column 0 of the joint arrays
+KNEE = 1 # theta1, column 1 of the joint arrays
+
+GRAVITY = 9.81
+
+DEFAULTS = {
+    # leg, same link lengths as the controller
+    'l0': 0.1,              # thigh [m]
+    'l1': 0.15,             # shank [m]
+    'm_body': 0.8,          # carriage, hip and knee motors, controllers [kg]
+    'm0': 0.10,             # thigh [kg]
+    'm1': 0.05,             # shank [kg]
+    'armature': 2e-4,       # reflected rotor inertia per joint [kg m^2]
+    'joint_damping': 0.005, # [Nm s/rad]
+    'slider_damping': 1.0,  # viscous slider friction [N s/m]
+    'slider_friction': 0.5, # Coulomb slider friction [N]
+    'z_limits': (0.05, 0.6),# end stops of the slider [m]
+    'stop_stiffness': 5e4,  # [N/m]
+    'stop_damping': 200.0,  # [N s/m]
+
+    # servos, moteus position mode gains in motor revs
+    'kp': 20.0,             # [Nm/rev]
+    'kd': 0.5,              # [Nm s/rev]
+    'torque_limit': 1.7,    # motor peak torque [Nm]
+
+    # motor rev = enc_scale * theta + enc_offset, from sinIkHopCtrlr.convert_rad_enc_*
+    'hp_enc_scale': 0.88 / (2 * math.pi),
+    'hp_enc_offset': -0.04,
+    'kn_enc_scale': 0.9 / math.pi,
+    'kn_enc_offset': -0.05,
+
+    # joint limits [rad], the moteus servopos.position_min/max converted
+    'hp_limits': (-3.356, 0.428),
+    'kn_limits': (-2.094, -0.349),
+    'limit_stiffness': 50.0,  # [Nm/rad]
+    'limit_damping': 0.5,     # [Nm s/rad]
+
+    # ground
+    'ground_stiffness': 2e4,  # [N/m]
+    'ground_damping': 150.0,  # [N s/m]
+    'ground_mu': 0.8,
+}
+
+
+def _per_rollout(value):
+    return np.reshape(value, (-1, 1)) if np.ndim(value) == 1 else value
+
+
+class PlanarHopSim:
+    # n:  number of rollouts
+    # dt: integrator step [s]
+    # params: overrides of DEFAULTS, scalars or (n,) arrays
+    def __init__(self, n=1, dt=0.0005, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown sim parameters: {sorted(unknown)}")
+        self.n = n
+        self.dt = dt
+        self.p = dict(DEFAULTS)
+        self.p.update(params)
+        for name, value in self.p.items():
+            if name.endswith('_limits'):
+                self.p[name] = tuple(np.broadcast_to(np.asarray(v, dtype=float), (n,)) for v in value)
+            else:
+                self.p[name] = np.broadcast_to(np.asarray(value, dtype=float), (n,))
+
+        p = self.p
+        # constant parts of the mass matrix
+        self._a0 = p['l0'] / 2
+        self._a1 = p['l1'] / 2
+        self._m_total = p['m_body'] + p['m0'] + p['m1']
+        self._I0 = p['m0'] * p['l0']**2 / 12 + p['armature']
+        self._I1 = p['m1'] * p['l1']**2 / 12 + p['armature']
+
+        # per joint (n, 2) columns, [hip, knee]
+        self._enc_scale = np.stack([p['hp_enc_scale'], p['kn_enc_scale']], axis=1)
+        self._enc_offset = np.stack([p['hp_enc_offset'], p['kn_enc_offset']], axis=1)
+        self._tau_ratio = 2 * math.pi * self._enc_scale # motor torque -> joint torque
+        self._lim_lo = np.stack([p['hp_limits'][0], p['kn_limits'][0]], axis=1)
+        self._lim_hi = np.stack([p['hp_limits'][1], p['kn_limits'][1]], axis=1)
+        self._kp = np.broadcast_to(p['kp'][:, None], (n, 2))
+        self._kd = np.broadcast_to(p['kd'][:, None], (n, 2))
+        self._joint_damping = p['joint_damping'][:, None]
+        self._torque_limit = p['torque_limit'][:, None]
+
+        self.reset()
+
+
+    # initial state, scalars or (n,) arrays, at rest
+    def reset(self, z=0.25, theta0=-math.pi / 2 - 0.3, theta1=-0.6):
+        n = self.n
+        self.t = 0.0
+        self.z = np.empty(n)
+        self.z[:] = z
+        self.dz = np.zeros(n)
+        self.theta = np.empty((n, 2))
+        self.theta[:, HIP] = theta0
+        self.theta[:, KNEE] = theta1
+        self.dtheta = np.zeros((n, 2))
+
+        # servo command, hold the current pose with zero torque by default
+        self.pos_cmd = self.joint_to_rev(self.theta)
+        self.vel_cmd = np.zeros((n, 2))
+        self.ff_cmd = np.zeros((n, 2))
+        self.max_torque = np.broadcast_to(self.p['torque_limit'][:, None], (n, 2)).copy()
+        self.kp_scale = np.ones((n, 2))
+        self.kd_scale = np.ones((n, 2))
+
+        self.motor_torque = np.zeros((n, 2))
+        self.grf = np.zeros((n, 2))              # ground reaction force [x, y]
+        self.contact = np.zeros(n, dtype=bool)
+        self.touchdowns = np.zeros(n, dtype=int)
+        self.z_max = self.z.copy()
+        self.z_min = self.z.copy()
+        self.foot_max = self.foot()[1]           # highest foot clearance [m]
+        self.peak_torque = np.zeros((n, 2))
+
+
+    # joint angles [rad] (n, 2) -> motor positions [rev] (n, 2), and back
+    def joint_to_rev(self, theta):
+        return theta * self._enc_scale + self._enc_offset
+
+
+    def rev_to_joint(self, rev):
+        return (rev - self._enc_offset) / self._enc_scale
+
+
+    # measured motor positions [rev] and velocities [rev/s], like the moteus replies
+    def servo_position(self):
+        return self.joint_to_rev(self.theta)
+
+
+    def servo_velocity(self):
+        return self.dtheta * self._enc_scale
+
+
+    def foot(self):
+        p = self.p
+        t0 = self.theta[:, HIP]
+        t01 = t0 + self.theta[:, KNEE]
+        x = p['l0'] * np.cos(t0) + p['l1'] * np.cos(t01)
+        y = self.z + p['l0'] * np.sin(t0) + p['l1'] * np.sin(t01)
+        return x, y
+
+
+    # Position mode command per servo, scalars or (n,) arrays in motor revs,
+    # kept until the next command like on the moteus. A NaN position only
+    # applies the velocity and feedforward terms.
+    def command(self, kn_pos, hp_pos, kn_vel=0.0, hp_vel=0.0,
+                kn_torque=0.0, hp_torque=0.0, maximum_torque=None,
+                kp_scale=1.0, kd_scale=1.0):
+        self.pos_cmd[:, KNEE] = kn_pos
+        self.pos_cmd[:, HIP] = hp_pos
+        self.vel_cmd[:, KNEE] = kn_vel
+        self.vel_cmd[:, HIP] = hp_vel
+        self.ff_cmd[:, KNEE] = kn_torque
+        self.ff_cmd[:, HIP] = hp_torque
+        # (n,) arrays apply to both servos of a rollout
+        if maximum_torque is not None:
+            self.max_torque[:] = _per_rollout(maximum_torque)
+        self.kp_scale[:] = _per_rollout(kp_scale)
+        self.kd_scale[:] = _per_rollout(kd_scale)
+
+
+    # integrate for duration [s] with fixed steps
+    def advance(self, duration):
+        for _ in range(max(1, int(round(duration / self.dt)))):
+            self.step()
+
+
+    def step(self):
+        p = self.p
+        dt = self.dt
+        l0, l1, a0, a1 = p['l0'], p['l1'], self._a0, self._a1
+        m0, m1 = p['m0'], p['m1']
+
+        t0 = self.theta[:, HIP]
+        t1 = self.theta[:, KNEE]
+        w0 = self.dtheta[:, HIP]
+        w1 = self.dtheta[:, KNEE]
+        w01 = w0 + w1
+        c0, s0 = np.cos(t0), np.sin(t0)
+        c01, s01 = np.cos(t0 + t1), np.sin(t0 + t1)
+        c1 = np.cos(t1)
+
+        # servo torques, motor side then mapped to the joints
+        err = self.pos_cmd - (self.theta * self._enc_scale + self._enc_offset)
+        err[np.isnan(err)] = 0.0
+        torque = self._kp * self.kp_scale * err \
+            + self._kd * self.kd_scale * (self.vel_cmd - self.dtheta * self._enc_scale) \
+            + self.ff_cmd
+        limit = np.minimum(self.max_torque, self._torque_limit)
+        np.clip(torque, -limit, limit, out=torque)
+        self.motor_torque = torque
+        np.maximum(self.peak_torque, np.abs(torque), out=self.peak_torque)
+
+        # joint friction and soft joint limits
+        over = np.minimum(self.theta - self._lim_lo, 0.0) + np.maximum(self.theta - self._lim_hi, 0.0)
+        tau = torque * self._tau_ratio - self._joint_damping * self.dtheta \
+            - p['limit_stiffness'][:, None] * over \
+            - p['limit_damping'][:, None] * self.dtheta * (over != 0.0)
+        tau0 = tau[:, HIP]
+        tau1 = tau[:, KNEE]
+
+        # ground contact at the foot
+        fx = l0 * c0 + l1 * c01
+        fy = self.z + l0 * s0 + l1 * s01
+        jx0 = -l0 * s0 - l1 * s01
+        jx1 = -l1 * s01
+        jy0 = l0 * c0 + l1 * c01
+        jy1 = l1 * c01
+        vx = jx0 * w0 + jx1 * w1
+        vy = self.dz + jy0 * w0 + jy1 * w1
+        pen = -fy
+        contact = pen > 0.0
+        fn = np.where(contact, p['ground_stiffness'] * pen - p['ground_damping'] * vy, 0.0)
+        np.maximum(fn, 0.0, out=fn)
+        ft = np.clip(-p['ground_damping'] * vx, -p['ground_mu'] * fn, p['ground_mu'] * fn)
+        self.touchdowns += contact & ~self.contact
+        self.contact = contact
+        self.grf[:, 0] = ft
+        self.grf[:, 1] = fn
+
+        # generalized forces: actuation + contact (J^T f) + slider friction and end stops
+        z_lo, z_hi = p['z_limits']
+        z_over = np.minimum(self.z - z_lo, 0.0) + np.maximum(self.z - z_hi, 0.0)
+        Qz = fn - p['slider_damping'] * self.dz - p['slider_friction'] * np.tanh(self.dz / 0.01) \
+            - p['stop_stiffness'] * z_over - p['stop_damping'] * self.dz * (z_over != 0.0)
+        Q0 = tau0 + jx0 * ft + jy0 * fn
+        Q1 = tau1 + jx1 * ft + jy1 * fn
+
+        # velocity product and gravity terms, sum m J^T (dJ dq + [0, g])
+        ax1 = -a0 * c0 * w0 * w0
+        ay1 = -a0 * s0 * w0 * w0 + GRAVITY
+        ax2 = -l0 * c0 * w0 * w0 - a1 * c01 * w01 * w01
+        ay2 = -l0 * s0 * w0 * w0 - a1 * s01 * w01 * w01 + GRAVITY
+        Qz = Qz - p['m_body'] * GRAVITY - m0 * ay1 - m1 * ay2
+        Q0 = Q0 - m0 * (-a0 * s0 * ax1 + a0 * c0 * ay1) \
+                - m1 * ((-l0 * s0 - a1 * s01) * ax2 + (l0 * c0 + a1 * c01) * ay2)
+        Q1 = Q1 - m1 * (-a1 * s01 * ax2 + a1 * c01 * ay2)
+
+        # symmetric mass matrix
+        Mzz = self._m_total
+        Mz0 = m0 * a0 * c0 + m1 * (l0 * c0 + a1 * c01)
+        Mz1 = m1 * a1 * c01
+        M11 = m1 * a1 * a1 + self._I1
+        M01 = M11 + m1 * l0 * a1 * c1
+        M00 = m0 * a0 * a0 + self._I0 + m1 * (l0 * l0 + 2 * l0 * a1 * c1) + M11
+
+        # closed form solve of M ddq = Q for all rollouts
+        A00 = M00 * M11 - M01 * M01
+        A01 = Mz1 * M01 - Mz0 * M11
+        A02 = Mz0 * M01 - Mz1 * M00
+        A11 = Mzz * M11 - Mz1 * Mz1
+        A12 = Mz0 * Mz1 - Mzz * M01
+        A22 = Mzz * M00 - Mz0 * Mz0
+        det = Mzz * A00 + Mz0 * A01 + Mz1 * A02
+        ddz = (A00 * Qz + A01 * Q0 + A02 * Q1) / det
+        dd0 = (A01 * Qz + A11 * Q0 + A12 * Q1) / det
+        dd1 = (A02 * Qz + A12 * Q0 + A22 * Q1) / det
+
+        # semi-implicit Euler
+        self.dz += ddz * dt
+        self.dtheta[:, HIP] += dd0 * dt
+        self.dtheta[:, KNEE] += dd1 * dt
+        self.z += self.dz * dt
+        self.theta += self.dtheta * dt
+        self.t += dt
+
+        np.maximum(self.z_max, self.z, out=self.z_max)
+        np.minimum(self.z_min, self.z, out=self.z_min)
+        np.maximum(self.foot_max, fy, out=self.foot_max)
+
+
+    def energy(self):
+        p = self.p
+        t0 = self.theta[:, HIP]
+        t01 = t0 + self.theta[:, KNEE]
+        w0 = self.dtheta[:, HIP]
+        w01 = w0 + self.dtheta[:, KNEE]
+        a0, a1, l0 = self._a0, self._a1, p['l0']
+        v1x = -a0 * np.sin(t0) * w0
+        v1y = self.dz + a0 * np.cos(t0) * w0
+        v2x = -l0 * np.sin(t0) * w0 - a1 * np.sin(t01) * w01
+        v2y = self.dz + l0 * np.cos(t0) * w0 + a1 * np.cos(t01) * w01
+        kinetic = 0.5 * (p['m_body'] * self.dz**2
+                         + p['m0'] * (v1x**2 + v1y**2) + p['m1'] * (v2x**2 + v2y**2)
+                         + self._I0 * w0**2 + self._I1 * w01**2)
+        y1 = self.z + a0 * np.sin(t0)
+        y2 = self.z + l0 * np.sin(t0) + a1 * np.sin(t01)
+        potential = GRAVITY * (p['m_body'] * self.z + p['m0'] * y1 + p['m1'] * y2)
+        return kinetic + potential
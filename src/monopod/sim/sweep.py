@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+# Parameter sweep of the sinusoidal hop controller against the planar sim
+#
+# Every parameter set runs the crouch/extend loop of jumping.py (foot set
+# points -> sinIkHopCtrlr ik -> convert_rad_enc_* -> position commands at the
+# loop rate) on sim.planar_hop.PlanarHopSim. The sets are split in batches,
+# each batch is one vectorized sim run in a worker of a ProcessPoolExecutor,
+# so all cores and the sim's batching are used together.
+#
+# Results go to one CSV row per parameter set, appended as batches finish.
+# The sweep spec is stored next to it (<out>.json), rerunning the same
+# command resumes an interrupted sweep with the rows that are missing.
+#
+# USAGE (installed, or from src/):
+#   grid:   python3 -m monopod.sim.sweep --param Kp=10,25,40 --param maximum_torque=0.5,1,2 --out sweep.csv
+#   random: python3 -m monopod.sim.sweep --samples 500 --param Kp=5:50 --param period=0.3:1.0 --out sweep.csv
+#
+
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import json
+import math
+import os
+
+import numpy as np
+
+from monopod.ctrlrs.ik.sin_ik_hop_ctrlr import sinIkHopCtrlr
+from monopod.sim.planar_hop import PlanarHopSim
+
+
+# swept parameters and their defaults, the gains of jumping.py
+PARAMS = {
+    'Kp':             25.0,   # P gain of the ik loop
+    'dt':             0.015,  # time step of the ik loop
+    'crouch_x':       0.0,    # crouch foot point [m]
+    'crouch_y':      -0.15,
+    'extend_x':       0.0,    # extend foot point [m]
+    'extend_y':      -0.23,
+    'maximum_torque': 1.0,    # [Nm]
+    'velocity':       0.0,    # position mode velocity [rev/s]
+    'period':         0.5,    # crouch/extend period [s]
+}
+
+METRICS = [
+    'hop_height',       # highest foot clearance after the settle time [m]
+    'peak_torque_kn',   # [Nm]
+    'peak_torque_hp',   # [Nm]
+    'tracking_rms',     # commanded - measured position, both servos [rev]
+    'touchdowns',
+]
+
+COLUMNS = ['index'] + list(PARAMS) + METRICS + ['status']
+
+
+# Run one batch of parameter sets (list of (index, params dict)) as one
+# vectorized sim, returns one result row per set
+def evaluate_batch(batch, duration=5.0, rate_hz=50.0, settle=0.5,
+                   ik_mode='iter', des_eps=0.1):
+    n = len(batch)
+    cols = {name : np.array([row[name] for _, row in batch], dtype=float) for name in PARAMS}
+    status = ['ok'] * n
+
+    ctrlrs = [sinIkHopCtrlr(row['Kp'], row['dt'], 0.1, 0.15, False, ik_mode) for _, row in batch]
+    conv = ctrlrs[0]
+    crouch = np.stack([cols['crouch_x'], cols['crouch_y']], axis=1)
+    extend = np.stack([cols['extend_x'], cols['extend_y']], axis=1)
+
+    # foot points out of the leg's reach have no ik solution, such sets are
+    # not simulated
+    _, crouch_ok = conv.ik_batch(crouch, return_mask=True)
+    _, extend_ok = conv.ik_batch(extend, return_mask=True)
+    for i in np.flatnonzero(~(crouch_ok & extend_ok)):
+        status[i] = 'unreachable'
+
+    # the P-loop of the iterative ik only settles for 0 < Kp*dt < 2
+    if ik_mode == 'iter':
+        gain = cols['Kp'] * cols['dt']
+        for i in np.flatnonzero((gain <= 0.0) | (gain >= 2.0)):
+            if status[i] == 'ok':
+                status[i] = 'unstable Kp*dt'
+    active = np.array([s == 'ok' for s in status])
+    converged = np.ones(n, dtype=bool)
+
+    # start standing in the crouch pose, foot on the ground
+    theta = conv.ik_batch(crouch)
+    sim = PlanarHopSim(n=n)
+    sim.reset(z=np.maximum(-crouch[:, 1], 0.06), theta0=theta[:, 0], theta1=theta[:, 1])
+    theta0 = theta[:, 0].copy()
+    theta1 = theta[:, 1].copy()
+
+    tick = 1.0 / rate_hz
+    sq_err = np.zeros(n)
+    samples = 0
+    for k in range(int(round(duration * rate_hz))):
+        t = k * tick
+        target = np.where((np.sin(2 * math.pi * t / cols['period']) > 0)[:, None], crouch, extend)
+        for i, ctrlr in enumerate(ctrlrs):
+            if not active[i]:
+                continue
+            ctrlr.q[0], ctrlr.q[1] = target[i]
+            theta0[i], theta1[i] = ctrlr.two_link_leg_ik(
+                des_eps=des_eps, theta0=theta0[i], theta1=theta1[i])
+            converged[i] &= ctrlr.ik_converged
+
+        kn_pos = conv.convert_rad_enc_kn(theta1)
+        hp_pos = conv.convert_rad_enc_hp(theta0)
+        sim.command(kn_pos, hp_pos, cols['velocity'], cols['velocity'],
+                    -0.01, -0.01, maximum_torque=cols['maximum_torque'])
+        sim.advance(tick)
+
+        if t + tick <= settle:
+            # metrics start once the leg has settled
+            sim.peak_torque[:] = 0.0
+            sim.foot_max[:] = sim.foot()[1]
+            sim.touchdowns[:] = 0
+            continue
+        err = sim.pos_cmd - sim.servo_position()
+        sq_err += (err * err).sum(axis=1)
+        samples += 2
+
+    results = []
+    for i, (index, row) in enumerate(batch):
+        result = {'index': index}
+        result.update(row)
+        if active[i]:
+            result['hop_height'] = float(max(sim.foot_max[i], 0.0))
+            result['peak_torque_kn'] = float(sim.peak_torque[i, 1])
+            result['peak_torque_hp'] = float(sim.peak_torque[i, 0])
+            result['tracking_rms'] = float(math.sqrt(sq_err[i] / max(samples, 1)))
+            result['touchdowns'] = int(sim.touchdowns[i])
+        else:
+            result.update({name : math.nan for name in METRICS})
+        # simulated, but the iterative ik gave up on some of its set points
+        if active[i] and not converged[i]:
+            status[i] = 'ik not converged'
+        result['status'] = status[i]
+        results.append(result)
+    return results
+
+
+# grid: {name: [values]} -> every combination, in a fixed order
+def grid(values):
+    names = list(values)
+    for combo in itertools.product(*(values[name] for name in names)):
+        row = dict(PARAMS)
+        row.update(zip(names, combo))
+        yield row
+
+
+# random: {name: (lo, hi)} -> n uniform samples, repeatable with seed
+def random_sample(ranges, n, seed=0):
+    rng = np.random.default_rng(seed)
+    for _ in range(n):
+        row = dict(PARAMS)
+        for name, (lo, hi) in ranges.items():
+            row[name] = float(rng.uniform(lo, hi))
+        yield row
+
+
+def done_indices(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != COLUMNS:
+            raise ValueError(f"{path}: not a sweep result table of this version")
+        return {int(row['index']) for row in reader}
+
+
+def load_results(path):
+    return np.genfromtxt(path, delimiter=',', names=True, dtype=None, encoding='utf-8')
+
+
+# Runs the sweep, skipping the rows already in out, returns the number of rows run
+def run_sweep(rows, out, spec, batch_size=32, workers=None, **kwargs):
+    spec_path = out + '.json'
+    spec = json.loads(json.dumps(spec)) # as it reads back, tuples -> lists
+    if os.path.exists(spec_path):
+        with open(spec_path) as f:
+            if json.load(f) != spec:
+                raise ValueError(f"{out} holds a different sweep, pick another --out")
+    else:
+        with open(spec_path, 'w') as f:
+            json.dump(spec, f, indent=2)
+
+    done = done_indices(out)
+    todo = [(index, row) for index, row in enumerate(rows) if index not in done]
+    batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+    print(f"{len(rows)} parameter sets, {len(done)} done, {len(todo)} to run "
+          f"in {len(batches)} batches")
+
+    new_file = not os.path.exists(out)
+    finished = 0
+    with open(out, 'a', newline='') as f, \
+         concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if new_file:
+            writer.writeheader()
+        futures = [pool.submit(evaluate_batch, batch, **kwargs) for batch in batches]
+        for future in concurrent.futures.as_completed(futures):
+            writer.writerows(future.result())
+            # checkpoint, a finished batch survives an interruption
+            f.flush()
+            os.fsync(f.fileno())
+            finished += 1
+            print(f"batch {finished}/{len(batches)}", end='\r')
+    print()
+    return len(todo)
+
+
+def parse_param(text, ranged):
+    name, _, values = text.partition('=')
+    if name not in PARAMS:
+        raise argparse.ArgumentTypeError(f"unknown parameter '{name}', one of {list(PARAMS)}")
+    if ranged:
+        lo, _, hi = values.partition(':')
+        return name, (float(lo), float(hi))
+    return name, [float(v) for v in values.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--param', action='append', default=[],
+                        help='NAME=v1,v2,.. (grid) or NAME=lo:hi (with --samples)')
+    parser.add_argument('--samples', type=int, default=0,
+                        help='random sample of this many sets instead of a grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='sweep.csv')
+    parser.add_argument('--duration', type=float, default=5.0, help='sim time per set [s]')
+    parser.add_argument('--rate', type=float, default=50.0, help='control loop rate [Hz]')
+    parser.add_argument('--ik-mode', default='iter', choices=['iter', 'direct'])
+    parser.add_argument('--batch', type=int, default=32, help='sets per vectorized sim run')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    ranged = args.samples > 0
+    params = dict(parse_param(p, ranged) for p in args.param)
+    rows = list(random_sample(params, args.samples, args.seed) if ranged else grid(params))
+    spec = {'params': params, 'samples': args.samples, 'seed': args.seed,
+            'duration': args.duration, 'rate_hz': args.rate, 'ik_mode': args.ik_mode}
+
+    run_sweep(rows, args.out, spec, batch_size=args.batch, workers=args.workers,
+              duration=args.duration, rate_hz=args.rate, ik_mode=args.ik_mode)
+
+    results = load_results(args.out)
+    ok = results[results['status'] == 'ok']
+    if len(ok):
+        best = ok[np.argmax(ok['hop_height'])]
+        print("highest hop: " + ", ".join(f"{name}={best[name]:g}" for name in
+                                          list(PARAMS) + METRICS))
+
+
+if __name__ == "__main__":
+    main()